@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -121,3 +122,44 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Caches
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# The capacity plan report is cached per view type, date and planning-data version.
+# 'locmem' keeps one cache per process; 'file' shares it between worker processes.
+
+CAPACITY_CACHE_BACKEND = 'locmem'
+CAPACITY_CACHE_ALIAS = 'capacity'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    CAPACITY_CACHE_ALIAS: {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'capacity_plan',
+        'TIMEOUT': 60 * 60 * 24,
+    } if CAPACITY_CACHE_BACKEND == 'file' else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'capacity-plan',
+        'TIMEOUT': 60 * 60 * 24,
+    },
+}
+
+# Capacity plan snapshots (see `manage.py build_capacity_snapshots`).
+# A positive value starts a thread in each serving process (not in management
+# commands) that rebuilds stale snapshots every N seconds; 0 leaves refreshing to
+# page visits and the command (`--watch N` runs it as a dedicated worker).
+CAPACITY_SNAPSHOT_REFRESH_SECONDS = 0
+
+# Monte Carlo demand simulation (capacity plan 'simulation' mode).
+# Trial blocks are split across this many worker processes; 1 runs them in-process.
+DEMAND_SIMULATION_WORKERS = 1
+
+# What-if scenario comparison: scenarios are evaluated across this many worker
+# processes (each receives the base dataset once); 1 evaluates them in-process.
+SCENARIO_WORKERS = 1
+
+# Sales forecast upload API (called by the CRM export job): requests must send
+# this value in the X-Forecast-Upload-Token header. Empty disables the endpoint.
+FORECAST_UPLOAD_TOKEN = os.environ.get('FORECAST_UPLOAD_TOKEN', '')
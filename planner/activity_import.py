@@ -0,0 +1,160 @@
+# planner/activity_import.py
+
+import json
+from collections import defaultdict
+
+from django.db import transaction
+
+from .availability import employee_calendars
+from .batch_edit import MAX_DURATION
+from .forecast_import import parse_date, iter_csv_rows, MAX_REPORTED_ERRORS
+from .models import Activity, Employee, Holiday, Leave, Project
+from .utils import WorkingCalendar, EARLIEST_ACTIVITY_DATE, LATEST_ACTIVITY_DATE
+from .versioning import bump_planning_version, coalesced_version_bumps
+
+BULK_BATCH_SIZE = 1000
+
+# Header (CSV) or key (JSON) spellings accepted, matched case-insensitively.
+COLUMN_ALIASES = {
+    'project': 'project',
+    'project code': 'project',
+    'project id': 'project',
+    'project_id': 'project',
+    'activity': 'activity_name',
+    'activity name': 'activity_name',
+    'activity_name': 'activity_name',
+    'name': 'activity_name',
+    'assignee': 'assignee',
+    'start': 'start_date',
+    'start date': 'start_date',
+    'start_date': 'start_date',
+    'duration': 'duration',
+    'duration (days)': 'duration',
+    'remark': 'remark',
+    'remarks': 'remark',
+}
+
+class ActivityRowParser:
+    """Validates import rows against projects and employees looked up once, by code and by name."""
+
+    def __init__(self):
+        self.projects = dict(Project.objects.values_list('project_id', 'id'))
+        self.employees = defaultdict(list)
+        for pk, name in Employee.objects.values_list('id', 'name'):
+            self.employees[name.strip().lower()].append(pk)
+
+    def parse(self, item):
+        """Returns Activity field values for one row. Raises ValueError if the row cannot be used."""
+        project_code = str(item.get('project') or '').strip()
+        if not project_code:
+            raise ValueError("Missing project code.")
+        if project_code not in self.projects:
+            raise ValueError(f"Unknown project '{project_code}'.")
+        activity_name = str(item.get('activity_name') or '').strip()
+        if not activity_name:
+            raise ValueError("Missing activity name.")
+        if len(activity_name) > Activity._meta.get_field('activity_name').max_length:
+            raise ValueError("Activity name is too long.")
+
+        assignee_id = None
+        assignee = str(item.get('assignee') or '').strip()
+        if assignee:
+            matches = self.employees.get(assignee.lower(), [])
+            if not matches:
+                raise ValueError(f"Unknown assignee '{assignee}'.")
+            if len(matches) > 1:
+                raise ValueError(f"More than one employee is called '{assignee}'.")
+            assignee_id = matches[0]
+
+        start_date = parse_date(item.get('start_date'))
+        if start_date is None:
+            raise ValueError("Missing or invalid start date (use YYYY-MM-DD or DD-MM-YYYY).")
+        if not EARLIEST_ACTIVITY_DATE <= start_date <= LATEST_ACTIVITY_DATE:
+            raise ValueError(f"Start date must be between {EARLIEST_ACTIVITY_DATE} and {LATEST_ACTIVITY_DATE}.")
+        try:
+            # Spreadsheet cells may hold 3.0; 2.7 is an error, not 2 days.
+            raw_duration = float(str(item.get('duration') or '').strip())
+            duration = int(raw_duration)
+            if duration != raw_duration:
+                raise ValueError
+        except (ValueError, OverflowError):
+            raise ValueError("Duration must be a whole number of working days.")
+        if not 1 <= duration <= MAX_DURATION:
+            raise ValueError(f"Duration must be between 1 and {MAX_DURATION} working days.")
+
+        return {
+            'project_id': self.projects[project_code],
+            'activity_name': activity_name,
+            'assignee_id': assignee_id,
+            'start_date': start_date,
+            'duration': duration,
+            'remark': str(item.get('remark') or ''),
+        }
+
+def import_activity_rows(rows):
+    """
+    Imports (row number, row dict) pairs. Every row is validated first; the valid
+    ones get their end dates from one holiday calendar plus the leave of the
+    assignees in the file (loaded once), then are bulk_created in chunks inside
+    one transaction. Returns inserted and rejected counts plus the row errors.
+    """
+    parser = ActivityRowParser()
+    result = {'inserted': 0, 'rejected': 0, 'errors': []}
+    parsed = []
+    for row_number, item in rows:
+        try:
+            parsed.append(parser.parse(item))
+        except ValueError as e:
+            result['rejected'] += 1
+            if len(result['errors']) < MAX_REPORTED_ERRORS:
+                result['errors'].append({'row': row_number, 'error': str(e)})
+    if not parsed:
+        return result
+
+    work_calendar = WorkingCalendar(Holiday.objects.values_list('date', flat=True))
+    assignee_ids = {fields['assignee_id'] for fields in parsed if fields['assignee_id']}
+    leaves = Leave.objects.filter(employee_id__in=assignee_ids).order_by().values_list('employee_id', 'start_date', 'end_date')
+    calendars = employee_calendars(work_calendar, assignee_ids, leaves.iterator())
+
+    activities = []
+    for fields in parsed:
+        calendar = calendars.get(fields['assignee_id'], work_calendar)
+        activities.append(Activity(end_date=calendar.nth_working_day(fields['start_date'], fields['duration']), **fields))
+
+    with coalesced_version_bumps(), transaction.atomic():
+        for i in range(0, len(activities), BULK_BATCH_SIZE):
+            Activity.objects.bulk_create(activities[i:i + BULK_BATCH_SIZE])
+        # bulk_create sends no signals.
+        bump_planning_version()
+    result['inserted'] = len(activities)
+    return result
+
+def iter_json_rows(file_obj):
+    """(index, row dict) pairs from a JSON list of objects, or an object holding it under 'activities'."""
+    try:
+        data = json.load(file_obj)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("The uploaded file is not valid JSON.")
+    if isinstance(data, dict):
+        data = data.get('activities')
+    if not isinstance(data, list):
+        raise ValueError("Expected a JSON list of activities.")
+    for index, item in enumerate(data, start=1):
+        if not isinstance(item, dict):
+            yield index, {}
+            continue
+        yield index, {
+            COLUMN_ALIASES.get(' '.join(str(key).split()).lower()): value
+            for key, value in item.items()
+        }
+
+def import_activity_file(file_obj, filename):
+    """Imports a CSV or JSON activity plan. Raises ValueError for other types or unreadable files."""
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        rows = iter_csv_rows(file_obj, COLUMN_ALIASES)
+    elif name.endswith('.json'):
+        rows = iter_json_rows(file_obj)
+    else:
+        raise ValueError("Unsupported file type; upload a .csv or .json file.")
+    return import_activity_rows(rows)
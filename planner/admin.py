@@ -1,5 +1,7 @@
 from django.contrib import admin
 from .models import Employee, ProjectType, Segment, Category, Holiday, Project, Activity, GeneralSettings, CapacitySettings, EffortBracket, SalesForecast
+from .models import Scenario, ScenarioHeadcountChange, ScenarioForecastChange, ScenarioCapacitySettings
+from .forms import ActivityAdminForm
 
 admin.site.register(Employee)
 admin.site.register(ProjectType)
@@ -7,8 +9,30 @@ admin.site.register(Segment)
 admin.site.register(Category)
 admin.site.register(Holiday)
 admin.site.register(Project)
-admin.site.register(Activity)
 admin.site.register(GeneralSettings) 
 admin.site.register(CapacitySettings) 
 admin.site.register(EffortBracket)
-admin.site.register(SalesForecast)
\ No newline at end of file
+admin.site.register(SalesForecast)
+
+@admin.register(Activity)
+class ActivityAdmin(admin.ModelAdmin):
+    # Rejects predecessor links that would create a dependency loop.
+    form = ActivityAdminForm
+
+class ScenarioHeadcountChangeInline(admin.TabularInline):
+    model = ScenarioHeadcountChange
+    extra = 1
+
+class ScenarioForecastChangeInline(admin.TabularInline):
+    model = ScenarioForecastChange
+    raw_id_fields = ['forecast']
+    extra = 1
+
+class ScenarioCapacitySettingsInline(admin.TabularInline):
+    model = ScenarioCapacitySettings
+    extra = 0
+
+@admin.register(Scenario)
+class ScenarioAdmin(admin.ModelAdmin):
+    list_display = ('name', 'updated_at')
+    inlines = [ScenarioHeadcountChangeInline, ScenarioForecastChangeInline, ScenarioCapacitySettingsInline]
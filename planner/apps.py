@@ -1,6 +1,33 @@
+import os
+import sys
+
 from django.apps import AppConfig
 
 
+def _serves_requests():
+    """
+    False for management commands (migrate, shell, ...) and for the runserver
+    autoreloader parent, which only watches files; True for the runserver child
+    and for WSGI/ASGI server processes.
+    """
+    if os.path.basename(sys.argv[0]) not in ('manage.py', 'django-admin', '__main__.py'):
+        return True
+    if sys.argv[1:2] != ['runserver']:
+        return False
+    return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+
+
 class PlannerConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'planner'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (registers signal receivers)
+
+        from django.conf import settings
+        interval = getattr(settings, 'CAPACITY_SNAPSHOT_REFRESH_SECONDS', 0)
+        # Only processes that serve pages refresh in the background; elsewhere use
+        # `manage.py build_capacity_snapshots --watch N`.
+        if interval and _serves_requests():
+            from .capacity_snapshots import start_snapshot_refresher
+            start_snapshot_refresher(interval)
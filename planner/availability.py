@@ -0,0 +1,145 @@
+# planner/availability.py
+
+import heapq
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import date, timedelta
+
+from .leave_engine import coalesce_intervals
+from .models import Activity, Employee, Holiday, Leave
+from .utils import WorkingCalendar
+from .versioning import get_planning_version
+
+DEFAULT_CANDIDATES = 5
+MAX_CANDIDATES = 50
+MAX_DURATION = 2000
+
+def employee_calendars(work_calendar, employee_ids, leaves):
+    """
+    One WorkingCalendar per employee with their leave days off, the calendar
+    Activity.save uses for that assignee. leaves: (employee_id, start_date, end_date).
+    """
+    days_off = defaultdict(list)
+    for employee_id, start_date, end_date in leaves:
+        if employee_id in employee_ids:
+            days_off[employee_id].extend(start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1))
+    return {employee_id: work_calendar.with_days_off(days_off.get(employee_id)) for employee_id in employee_ids}
+
+class AvailabilityIndex:
+    """
+    Free time per active employee, precomputed from their bookings.
+
+    Each employee's activities are coalesced into busy intervals and stored as
+    the complementary list of free gaps (the last one open-ended). A staffing
+    query bisects to the first gap after the date floor and only tries gaps from
+    there; within a gap the start and end dates come from the employee's own
+    WorkingCalendar (holidays plus their leave), the same rule Activity.save
+    uses, so leave lengthens an activity rather than blocking it.
+    """
+
+    def __init__(self, work_calendar, employees, bookings, leaves):
+        """
+        Args:
+            work_calendar (WorkingCalendar): Calendar with the company holidays.
+            employees (iterable): (employee_id, name, designation) of active employees.
+            bookings (iterable): (employee_id, start_date, end_date) of assigned activities.
+            leaves (iterable): (employee_id, start_date, end_date) of leave.
+        """
+        self.employees = {pk: (name, designation) for pk, name, designation in employees}
+        busy = defaultdict(list)
+        for employee_id, start_date, end_date in bookings:
+            if employee_id in self.employees and start_date and end_date and start_date <= end_date:
+                busy[employee_id].append((start_date, end_date))
+        self.calendars = employee_calendars(work_calendar, self.employees, leaves)
+
+        self.free = {}
+        for employee_id in self.employees:
+            gaps, cursor = [], date.min
+            for start_date, end_date in coalesce_intervals(busy.get(employee_id, [])):
+                if start_date > cursor:
+                    gaps.append((cursor, start_date - timedelta(days=1)))
+                cursor = end_date + timedelta(days=1)
+            gaps.append((cursor, None))
+            self.free[employee_id] = (gaps, [gap_end or date.max for _, gap_end in gaps])
+
+    @classmethod
+    def load(cls):
+        """Builds the index from the database (active employees only)."""
+        work_calendar = WorkingCalendar(Holiday.objects.values_list('date', flat=True))
+        employees = Employee.objects.filter(is_active=True).values_list('id', 'name', 'designation')
+        bookings = Activity.objects.filter(assignee__is_active=True).order_by().values_list('assignee_id', 'start_date', 'end_date')
+        leaves = Leave.objects.filter(employee__is_active=True).order_by().values_list('employee_id', 'start_date', 'end_date')
+        return cls(work_calendar, employees, bookings.iterator(), leaves.iterator())
+
+    def earliest_slot(self, employee_id, duration, not_before):
+        """(start_date, end_date) of the first free run of `duration` working days on or after not_before."""
+        gaps, gap_ends = self.free[employee_id]
+        calendar = self.calendars[employee_id]
+        for gap_start, gap_end in gaps[bisect_left(gap_ends, not_before):]:
+            start_date = calendar.nth_working_day(max(gap_start, not_before), 1)
+            end_date = calendar.nth_working_day(start_date, duration)
+            if gap_end is None or end_date <= gap_end:
+                return start_date, end_date
+        return None
+
+    def candidates(self, duration, not_before, designation=None, limit=DEFAULT_CANDIDATES):
+        """The `limit` employees who can start earliest, ties broken by earliest finish then name."""
+        slots = []
+        for employee_id, (name, employee_designation) in self.employees.items():
+            if designation and employee_designation != designation:
+                continue
+            slot = self.earliest_slot(employee_id, duration, not_before)
+            if slot:
+                slots.append((slot[0], slot[1], name, employee_id, employee_designation))
+        return heapq.nsmallest(limit, slots)
+
+_index_lock = threading.Lock()
+_cached_index = {}
+
+def get_availability_index():
+    """The AvailabilityIndex for the current planning-data version, rebuilt only after a change."""
+    version, _ = get_planning_version()
+    with _index_lock:
+        if _cached_index.get('version') != version:
+            _cached_index.update(version=version, index=AvailabilityIndex.load())
+        return _cached_index['index']
+
+def find_available_candidates(params, today):
+    """
+    Top-k employees by earliest feasible start. Params: duration (working days,
+    required), designation (default ENGINEER; empty for any), start (date floor,
+    default today) and limit. Raises ValueError on bad parameters.
+    """
+    try:
+        duration = int(params.get('duration') or 0)
+        limit = min(max(int(params.get('limit') or DEFAULT_CANDIDATES), 1), MAX_CANDIDATES)
+    except ValueError:
+        raise ValueError("'duration' and 'limit' must be integers.")
+    if not 1 <= duration <= MAX_DURATION:
+        raise ValueError(f"'duration' must be between 1 and {MAX_DURATION} working days.")
+    try:
+        not_before = date.fromisoformat(params['start']) if params.get('start') else today
+    except ValueError:
+        raise ValueError("'start' must be a YYYY-MM-DD date.")
+    designation = params.get('designation', 'ENGINEER')
+    if designation and designation not in dict(Employee.DESIGNATION_CHOICES):
+        raise ValueError(f"Unknown designation '{designation}'.")
+
+    candidates = get_availability_index().candidates(duration, max(not_before, today), designation, limit)
+    return {
+        'duration': duration,
+        'not_before': max(not_before, today).isoformat(),
+        'designation': designation or None,
+        'candidates': [
+            {
+                'employee_id': employee_id,
+                'name': name,
+                'designation': employee_designation,
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat(),
+                'wait_days': (start_date - max(not_before, today)).days,
+            }
+            for start_date, end_date, name, employee_id, employee_designation in candidates
+        ],
+    }
@@ -0,0 +1,193 @@
+# planner/batch_edit.py
+
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Q
+
+from .availability import employee_calendars
+from .dependencies import propagate_dependencies
+from .models import Activity, Employee, Holiday, Leave, Project
+from .utils import WorkingCalendar, EARLIEST_ACTIVITY_DATE, LATEST_ACTIVITY_DATE, parse_int
+from .versioning import bump_planning_version, coalesced_version_bumps
+
+BULK_BATCH_SIZE = 1000
+MAX_SHIFT_DAYS = 5000
+MAX_DURATION = 2000
+
+class BatchEditError(ValueError):
+    """Raised when any change in a batch is invalid; nothing is applied. `errors` lists them all."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} change(s) are invalid; nothing was saved.")
+        self.errors = errors
+
+def _parse_change(item, employee_ids):
+    """Validated fields of one activity change: id plus any of shift_days, start_date, assignee_id, duration."""
+    if not isinstance(item, dict):
+        raise ValueError("Each change must be an object.")
+    change = {'id': parse_int(item.get('id'), 'id', 1, 2 ** 63 - 1)}
+    if 'shift_days' in item and 'start_date' in item:
+        raise ValueError("Give either 'shift_days' or 'start_date', not both.")
+    if 'shift_days' in item:
+        change['shift_days'] = parse_int(item['shift_days'], 'shift_days', -MAX_SHIFT_DAYS, MAX_SHIFT_DAYS)
+    if 'start_date' in item:
+        try:
+            change['start_date'] = date.fromisoformat(str(item['start_date']))
+        except ValueError:
+            raise ValueError("'start_date' must be a YYYY-MM-DD date.")
+        if not EARLIEST_ACTIVITY_DATE <= change['start_date'] <= LATEST_ACTIVITY_DATE:
+            raise ValueError(f"'start_date' must be between {EARLIEST_ACTIVITY_DATE} and {LATEST_ACTIVITY_DATE}.")
+    if 'assignee' in item:
+        if item['assignee'] in (None, ''):
+            change['assignee_id'] = None
+        else:
+            assignee_id = parse_int(item['assignee'], 'assignee', 1, 2 ** 63 - 1)
+            if assignee_id not in employee_ids:
+                raise ValueError(f"Unknown assignee {assignee_id}.")
+            change['assignee_id'] = assignee_id
+    if 'duration' in item:
+        change['duration'] = parse_int(item['duration'], 'duration', 1, MAX_DURATION)
+    if len(change) == 1:
+        raise ValueError("Nothing to change: give shift_days, start_date, assignee or duration.")
+    return change
+
+def _parse_project_shift(item, project_ids):
+    """(project ids, shift_days) of one project shift: {'project': id} or {'projects': [ids]}."""
+    if not isinstance(item, dict):
+        raise ValueError("Each project shift must be an object.")
+    raw_ids = item['projects'] if 'projects' in item else [item.get('project')]
+    if not isinstance(raw_ids, list) or not raw_ids:
+        raise ValueError("'projects' must be a non-empty list of ids.")
+    ids = [parse_int(pk, 'project', 1, 2 ** 63 - 1) for pk in raw_ids]
+    unknown = sorted(set(ids) - project_ids)
+    if unknown:
+        raise ValueError(f"Unknown project(s) {', '.join(map(str, unknown))}.")
+    return ids, parse_int(item.get('shift_days'), 'shift_days', -MAX_SHIFT_DAYS, MAX_SHIFT_DAYS)
+
+def parse_batch(data):
+    """
+    Validates a whole batch before anything is loaded or written. Returns
+    (activity changes by id, working-day shift by project id); raises
+    BatchEditError listing every invalid entry.
+    """
+    if not isinstance(data, dict):
+        raise BatchEditError([{'error': "Expected a JSON object with 'activities' and/or 'projects'."}])
+    raw_changes = data.get('activities') or []
+    raw_shifts = data.get('projects') or []
+    if not isinstance(raw_changes, list) or not isinstance(raw_shifts, list):
+        raise BatchEditError([{'error': "'activities' and 'projects' must be lists."}])
+    if not raw_changes and not raw_shifts:
+        raise BatchEditError([{'error': "The batch is empty."}])
+
+    errors = []
+    employee_ids = set(Employee.objects.values_list('id', flat=True)) if any(
+        isinstance(item, dict) and item.get('assignee') not in (None, '') for item in raw_changes) else set()
+    changes = {}
+    for index, item in enumerate(raw_changes):
+        try:
+            change = _parse_change(item, employee_ids)
+            if change['id'] in changes:
+                raise ValueError(f"Activity {change['id']} is changed more than once.")
+            changes[change['id']] = change
+        except ValueError as e:
+            errors.append({'activity_index': index, 'error': str(e)})
+
+    project_shifts = {}
+    project_ids = set(Project.objects.values_list('id', flat=True)) if raw_shifts else set()
+    for index, item in enumerate(raw_shifts):
+        try:
+            ids, shift_days = _parse_project_shift(item, project_ids)
+            for pk in ids:
+                if pk in project_shifts:
+                    raise ValueError(f"Project {pk} is shifted more than once.")
+                project_shifts[pk] = shift_days
+        except ValueError as e:
+            errors.append({'project_index': index, 'error': str(e)})
+
+    if changes and not errors:
+        missing = set(changes) - set(Activity.objects.filter(pk__in=changes).values_list('id', flat=True))
+        errors.extend({'activity_id': pk, 'error': f"Unknown activity {pk}."} for pk in sorted(missing))
+    if errors:
+        raise BatchEditError(errors)
+    return changes, project_shifts
+
+def apply_batch(changes, project_shifts, dry_run=False):
+    """
+    Applies validated changes. Project shifts move every activity of those
+    projects by working days of the company calendar; per-activity changes are
+    then applied on top. End dates are recomputed with one holiday calendar plus
+    the final assignees' leave, the rows that changed are written with one
+    bulk_update in a transaction, and their successors are pushed along their
+    dependencies. Returns the updated activities and the ids moved downstream.
+    Raises BatchEditError if a shift moves an activity outside the supported dates.
+    """
+    activities = list(
+        Activity.objects.filter(Q(pk__in=changes) | Q(project_id__in=project_shifts))
+        .order_by('pk').only('id', 'project_id', 'start_date', 'end_date', 'duration', 'assignee_id')
+    )
+    work_calendar = WorkingCalendar(Holiday.objects.values_list('date', flat=True))
+
+    before = {}
+    errors = []
+    for activity in activities:
+        before[activity.pk] = (activity.start_date, activity.end_date, activity.assignee_id, activity.duration)
+        change = changes.get(activity.pk, {})
+        try:
+            if activity.project_id in project_shifts:
+                activity.start_date = work_calendar.shift_working_days(activity.start_date, project_shifts[activity.project_id])
+            if 'shift_days' in change:
+                activity.start_date = work_calendar.shift_working_days(activity.start_date, change['shift_days'])
+        except (ValueError, OverflowError):
+            activity.start_date = None
+        if 'start_date' in change:
+            activity.start_date = change['start_date']
+        if 'assignee_id' in change:
+            activity.assignee_id = change['assignee_id']
+        if 'duration' in change:
+            activity.duration = change['duration']
+        # Shifts of existing dates are only checked here, once the final start is known.
+        if activity.start_date is None or not EARLIEST_ACTIVITY_DATE <= activity.start_date <= LATEST_ACTIVITY_DATE:
+            errors.append({'activity_id': activity.pk, 'error': (
+                f"The new start date falls outside {EARLIEST_ACTIVITY_DATE} to {LATEST_ACTIVITY_DATE}."
+            )})
+    if errors:
+        raise BatchEditError(errors)
+
+    assignee_ids = {activity.assignee_id for activity in activities if activity.assignee_id}
+    leaves = Leave.objects.filter(employee_id__in=assignee_ids).order_by().values_list('employee_id', 'start_date', 'end_date')
+    calendars = employee_calendars(work_calendar, assignee_ids, leaves.iterator())
+    updated = []
+    for activity in activities:
+        calendar = calendars.get(activity.assignee_id, work_calendar)
+        activity.end_date = calendar.nth_working_day(activity.start_date, activity.duration) if activity.duration > 0 else activity.start_date
+        if (activity.start_date, activity.end_date, activity.assignee_id, activity.duration) != before[activity.pk]:
+            updated.append(activity)
+
+    propagated = []
+    if updated and not dry_run:
+        with coalesced_version_bumps(), transaction.atomic():
+            Activity.objects.bulk_update(updated, ['start_date', 'end_date', 'assignee', 'duration'], batch_size=BULK_BATCH_SIZE)
+            # bulk_update sends no signals.
+            bump_planning_version()
+            propagated = propagate_dependencies([activity.pk for activity in updated])
+    return {
+        'updated': len(updated),
+        'dry_run': dry_run,
+        'activities': [
+            {
+                'id': activity.pk,
+                'start_date': activity.start_date.isoformat(),
+                'end_date': activity.end_date.isoformat(),
+                'assignee_id': activity.assignee_id,
+                'duration': activity.duration,
+            }
+            for activity in updated
+        ],
+        'propagated': propagated,
+    }
+
+def batch_edit_activities(data):
+    """Validates then applies a batch edit request body. Raises BatchEditError if any entry is invalid."""
+    changes, project_shifts = parse_batch(data)
+    return apply_batch(changes, project_shifts, dry_run=bool(isinstance(data, dict) and data.get('dry_run')))
@@ -0,0 +1,80 @@
+# planner/capacity_cache.py
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .capacity_engine import build_capacity_report, VIEW_TYPES
+from .demand_simulation import simulate_demand, DEFAULT_TRIALS, DEFAULT_SEED
+from .versioning import get_planning_version
+
+KEY_PREFIX = 'capacity-plan'
+
+def _cache():
+    return caches[settings.CAPACITY_CACHE_ALIAS]
+
+def capacity_cache_key(view_type, today, version):
+    # Any planning-data change bumps the version, so stale reports are simply never looked up again.
+    return f"{KEY_PREFIX}:{view_type}:{today.isoformat()}:v{version}"
+
+def _count(name):
+    cache = _cache()
+    key = f"{KEY_PREFIX}:stats:{name}"
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+def peek_capacity_report(view_type, today, version):
+    """The cached report for exactly this version, or None; never computes."""
+    report = _cache().get(capacity_cache_key(view_type, today, version))
+    if report is not None:
+        _count('hits')
+    return report
+
+def get_capacity_report(view_type, today):
+    """The capacity plan page data for one view type, computed at most once per date and data version."""
+    if view_type not in VIEW_TYPES:
+        view_type = 'month'
+    version, _ = get_planning_version()
+    key = capacity_cache_key(view_type, today, version)
+    cache = _cache()
+
+    report = cache.get(key)
+    if report is not None:
+        _count('hits')
+        return report
+    _count('misses')
+    report = build_capacity_report(view_type, today)
+    cache.set(key, report)
+    return report
+
+def get_simulation_report(view_type, today, trials=DEFAULT_TRIALS, seed=DEFAULT_SEED):
+    """The Monte Carlo demand report, cached like the capacity plan (per date, data version and trial settings)."""
+    if view_type not in VIEW_TYPES:
+        view_type = 'month'
+    version, _ = get_planning_version()
+    key = f"{KEY_PREFIX}:simulation:{view_type}:{trials}:{seed}:{today.isoformat()}:v{version}"
+    cache = _cache()
+
+    report = cache.get(key)
+    if report is not None:
+        _count('hits')
+        return report
+    _count('misses')
+    report = simulate_demand(view_type, today, trials, seed, workers=settings.DEMAND_SIMULATION_WORKERS)
+    cache.set(key, report)
+    return report
+
+def capacity_cache_stats():
+    """Hit/miss counters of the capacity plan cache since it was last cleared."""
+    cache = _cache()
+    hits = cache.get(f"{KEY_PREFIX}:stats:hits", 0)
+    misses = cache.get(f"{KEY_PREFIX}:stats:misses", 0)
+    lookups = hits + misses
+    return {
+        'backend': settings.CACHES[settings.CAPACITY_CACHE_ALIAS]['BACKEND'],
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / lookups, 3) if lookups else None,
+    }
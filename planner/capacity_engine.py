@@ -0,0 +1,431 @@
+# planner/capacity_engine.py
+
+import calendar
+import threading
+from datetime import date, timedelta
+
+import numpy as np
+
+from .models import (Employee, Holiday, Activity, GeneralSettings,
+                     CapacitySettings, SalesForecast, Segment)
+from .leave_engine import LeaveEngine
+from .utils import WorkingCalendar
+from .versioning import get_planning_version
+
+DESIGNATIONS = [value for value, _ in Employee.DESIGNATION_CHOICES]
+VIEW_TYPES = ('week', 'month', 'quarter')
+
+# Average number of calendar days in a month, used to pro-rate monthly settings.
+DAYS_PER_MONTH = 30.44
+
+def build_periods(view_type, today):
+    """
+    Returns the reporting periods for a capacity plan view.
+    Week: 24 weeks from this Monday, Quarter: 8 quarters, Month (default): 12 months.
+    """
+    periods = []
+    if view_type == 'week':
+        start_date = today - timedelta(days=today.weekday())
+        for i in range(24):
+            p_start = start_date + timedelta(weeks=i)
+            p_end = p_start + timedelta(days=6)
+            periods.append({
+                'start': p_start,
+                'end': p_end,
+                'key': p_start.strftime('%Y-W%W'),
+                'label': p_start.strftime('W%W %d %b')
+            })
+    elif view_type == 'quarter':
+        q_month = (today.month - 1) // 3 * 3 + 1
+        start_date = date(today.year, q_month, 1)
+        for i in range(8):
+            year_offset = (start_date.month + (i*3) - 1) // 12
+            month = (start_date.month + (i*3) - 1) % 12 + 1
+            year = start_date.year + year_offset
+            p_start = date(year, month, 1)
+
+            if month >= 10:
+                p_end = date(year + 1, 1, 1) - timedelta(days=1)
+            else:
+                p_end = date(year, month + 3, 1) - timedelta(days=1)
+
+            q_label = f"Q{(month-1)//3 + 1} {year}"
+            periods.append({'start': p_start, 'end': p_end, 'key': q_label, 'label': q_label})
+    else:
+        start_date = today.replace(day=1)
+        for i in range(12):
+            year_offset = (start_date.month + i - 1) // 12
+            month = (start_date.month + i - 1) % 12 + 1
+            year = start_date.year + year_offset
+            p_start = date(year, month, 1)
+            _, last_day = calendar.monthrange(year, month)
+            p_end = date(year, month, last_day)
+            periods.append({
+                'start': p_start,
+                'end': p_end,
+                'key': p_start.strftime('%Y-%m'),
+                'label': p_start.strftime('%b %Y')
+            })
+    return periods
+
+def build_horizon(today):
+    """Smallest (start, end) date range covering the periods of every view type."""
+    all_periods = [build_periods(view_type, today) for view_type in VIEW_TYPES]
+    return min(p[0]['start'] for p in all_periods), max(p[-1]['end'] for p in all_periods)
+
+class CapacityEngine:
+    """
+    Dense, day-indexed supply/demand cube over a fixed horizon.
+
+    Demand is held as difference arrays (one per designation, per segment and
+    for the global live/forecast totals). Each activity or forecast window is a
+    constant-rate range update: +hours at its first day, -hours after its last.
+    Leave supply comes from a LeaveEngine over coalesced per-employee intervals.
+
+    build() turns every series into daily values (cumsum masked by the
+    working-day vector) and then into prefix sums, and precomputes the ISO-week
+    table. Any list of contiguous periods inside the horizon - weeks, months,
+    quarters or a custom range - is then a cheap reduction via rollup().
+    """
+
+    def __init__(self, start_date, end_date, work_calendar, hours_per_day, capacity_settings,
+                 workforce_counts, leave_engine):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.work_calendar = work_calendar
+        self.hours_per_day = hours_per_day
+        self.capacity_settings = capacity_settings
+        self.workforce_counts = workforce_counts
+        self.leave_engine = leave_engine
+
+        self.num_days = (end_date - start_date).days + 1
+        days = [start_date + timedelta(days=i) for i in range(self.num_days)]
+        self.working_mask = np.array([work_calendar.is_working_day(d) for d in days], dtype=float)
+
+        self.demand = {des: self._new_series() for des in DESIGNATIONS}
+        self.live_total = self._new_series()
+        self.forecast_total = self._new_series()
+        self.segment_live = {}
+        self.segment_forecast = {}
+        self._prefix = None
+
+    def _new_series(self):
+        return np.zeros(self.num_days + 1)
+
+    def _clip(self, start_date, end_date):
+        """Returns the [lo, hi] day indexes of a window clipped to the horizon, or None."""
+        lo = max((start_date - self.start_date).days, 0)
+        hi = min((end_date - self.start_date).days, self.num_days - 1)
+        if lo > hi:
+            return None
+        return lo, hi
+
+    def _range_add(self, series, window, value):
+        lo, hi = window
+        series[lo] += value
+        series[hi + 1] -= value
+        self._prefix = None
+
+    # --- Loading ---
+
+    def add_activity(self, designation, segment_name, start_date, end_date):
+        """Books one working day of hours_per_day for every working day of an activity."""
+        window = self._clip(start_date, end_date)
+        if window is None:
+            return
+        hours = self.hours_per_day
+        self._range_add(self.demand[designation], window, hours)
+        self._range_add(self.live_total, window, hours)
+        if segment_name:
+            series = self.segment_live.setdefault(segment_name, self._new_series())
+            self._range_add(series, window, hours)
+
+    def add_forecast(self, segment_name, start_date, end_date, daily_hours_by_designation):
+        """Spreads a forecast's per-designation daily hours over its window."""
+        window = self._clip(start_date, end_date)
+        if window is None:
+            return
+        for designation, hours in daily_hours_by_designation.items():
+            self._range_add(self.demand[designation], window, hours)
+        total_daily_hours = sum(daily_hours_by_designation.values())
+        self._range_add(self.forecast_total, window, total_daily_hours)
+        if segment_name:
+            series = self.segment_forecast.setdefault(segment_name, self._new_series())
+            self._range_add(series, window, total_daily_hours)
+
+    # --- Cube ---
+
+    def _prefix_sum(self, series):
+        """Prefix sums of the masked daily values: P[i] = sum of days [0, i)."""
+        return np.concatenate(([0.0], np.cumsum(np.cumsum(series[:-1]) * self.working_mask)))
+
+    def build(self):
+        """Materialises the prefix-sum cube; cached until the next update."""
+        if self._prefix is not None:
+            return self
+        self._prefix = {
+            'working_days': np.concatenate(([0.0], np.cumsum(self.working_mask))),
+            'live': self._prefix_sum(self.live_total),
+            'forecast': self._prefix_sum(self.forecast_total),
+            'demand': {des: self._prefix_sum(s) for des, s in self.demand.items()},
+            'segment_live': {name: self._prefix_sum(s) for name, s in self.segment_live.items()},
+            'segment_forecast': {name: self._prefix_sum(s) for name, s in self.segment_forecast.items()},
+        }
+        return self
+
+    def _chunk_stats(self, starts, ends):
+        """
+        Working days, demand, effective capacity per person and headcount
+        requirement for each [start, end) day chunk, per designation.
+        """
+        prefix = self._prefix
+        working_days = prefix['working_days'][ends] - prefix['working_days'][starts]
+        stats = {'working_days': working_days, 'demand': {}, 'capacity_per_person': {}, 'required_headcount': {}}
+        for des in DESIGNATIONS:
+            demand = prefix['demand'][des][ends] - prefix['demand'][des][starts]
+            efficiency = 1 - self.capacity_settings[des].efficiency_loss_factor / 100
+            capacity_per_person = working_days * self.hours_per_day * efficiency
+            required = np.zeros(len(starts))
+            np.divide(demand, capacity_per_person, out=required, where=capacity_per_person > 0)
+            stats['demand'][des] = demand
+            stats['capacity_per_person'][des] = capacity_per_person
+            stats['required_headcount'][des] = required
+        return stats
+
+    def rollup(self, periods):
+        """Reduces the cube to a list of contiguous periods within the horizon."""
+        return CapacityRollup(self.build(), periods)
+
+class CapacityRollup:
+    """Per-period supply and demand arrays for one list of contiguous periods."""
+
+    def __init__(self, engine, periods):
+        self.engine = engine
+        self.periods = periods
+        origin = engine.start_date
+        self.starts = np.array([(p['start'] - origin).days for p in periods])
+        self.ends = np.array([(p['end'] - origin).days + 1 for p in periods])
+        if self.starts[0] < 0 or self.ends[-1] > engine.num_days:
+            raise ValueError("Periods fall outside the capacity engine horizon.")
+
+        period_days = (self.ends - self.starts).astype(float)
+        self.month_factors = period_days / DAYS_PER_MONTH
+        self.working_days = self._sum(engine._prefix['working_days'])
+        self.leave_days = engine.leave_engine.designation_man_days(periods, DESIGNATIONS)
+
+        # Split every period at ISO-week boundaries for the weekly-max requirement.
+        mondays = np.flatnonzero((np.arange(origin.toordinal(), origin.toordinal() + engine.num_days) - 1) % 7 == 0)
+        inside = mondays[(mondays > self.starts[0]) & (mondays < self.ends[-1])]
+        chunk_starts = np.union1d(self.starts, inside)
+        chunk_ends = np.r_[chunk_starts[1:], self.ends[-1]]
+        self.chunk_starts, self.chunk_ends = chunk_starts, chunk_ends
+        self.chunk_period = np.searchsorted(self.starts, chunk_starts, side='right') - 1
+        self.chunks = engine._chunk_stats(chunk_starts, chunk_ends)
+
+    def _sum(self, prefix):
+        return prefix[self.ends] - prefix[self.starts]
+
+    def live_workload(self):
+        return self._sum(self.engine._prefix['live'])
+
+    def forecasted_workload(self):
+        return self._sum(self.engine._prefix['forecast'])
+
+    def segment_live_workload(self, segment_name):
+        prefix = self.engine._prefix['segment_live'].get(segment_name)
+        return np.zeros(len(self.periods)) if prefix is None else self._sum(prefix)
+
+    def segment_forecasted_workload(self, segment_name):
+        prefix = self.engine._prefix['segment_forecast'].get(segment_name)
+        return np.zeros(len(self.periods)) if prefix is None else self._sum(prefix)
+
+    def leave_man_days(self, designation):
+        return self.leave_days[designation]
+
+    def available_hours(self, designation):
+        """Net project hours per period after leaves, meetings and efficiency loss."""
+        settings = self.engine.capacity_settings[designation]
+        count = self.engine.workforce_counts[designation]
+        gross_hours = (count * self.working_days - self.leave_man_days(designation)) * self.engine.hours_per_day
+        non_project_hours = count * (settings.monthly_meeting_hours + settings.monthly_leave_hours) * self.month_factors
+        efficiency_loss = (gross_hours - non_project_hours) * (settings.efficiency_loss_factor / 100)
+        return gross_hours - non_project_hours - efficiency_loss
+
+    def required_headcount(self, designation):
+        """
+        Peak weekly headcount requirement per period. Each ISO week inside a
+        period needs demand / (working days * hours per day * efficiency) people;
+        weeks without working days are ignored.
+        """
+        required = np.full(len(self.periods), -np.inf)
+        counted = self.chunks['working_days'] > 0
+        np.maximum.at(required, self.chunk_period[counted], self.chunks['required_headcount'][designation][counted])
+        required[np.isneginf(required)] = 0.0
+        return required
+
+    def required_hours(self, designation, available_hours, required_headcount):
+        """
+        Back-calculates required hours from the peak headcount and the period's
+        average capacity per person, so the variance reflects the headcount gap.
+        """
+        settings = self.engine.capacity_settings[designation]
+        headcount = self.engine.workforce_counts[designation]
+        if headcount > 0:
+            avg_hours_per_person = available_hours / headcount
+        else:
+            avg_hours_per_person = np.zeros(len(self.periods))
+
+        # Fallback when there is no headcount (or no hours) to derive period hours from
+        gross = self.working_days * self.engine.hours_per_day
+        deductions = (settings.monthly_meeting_hours + settings.monthly_leave_hours) * self.month_factors
+        fallback = (gross - deductions) * (1 - settings.efficiency_loss_factor / 100)
+        avg_hours_per_person = np.where(avg_hours_per_person == 0, fallback, avg_hours_per_person)
+        return required_headcount * avg_hours_per_person
+
+# Rows are streamed from the database in chunks of this size.
+STREAM_CHUNK_SIZE = 2000
+
+def _stream_activities(min_date, max_date):
+    """Yields (designation, segment name, start, end) for booked activities overlapping the window."""
+    return Activity.objects.filter(
+        assignee__isnull=False, start_date__lte=max_date, end_date__gte=min_date
+    ).values_list(
+        'assignee__designation', 'project__segment__name', 'start_date', 'end_date'
+    ).order_by().iterator(chunk_size=STREAM_CHUNK_SIZE)
+
+def _stream_forecasts(min_date, max_date):
+    """
+    Yields (segment, start, end, engineer, team lead, manager daily hours) for
+    forecasts overlapping the window that carry demand. The daily hours are
+    stored on each row by forecast_metrics, so this is a plain column scan.
+    """
+    return SalesForecast.objects.filter(
+        start_date__lte=max_date, end_date__gte=min_date,
+        project_type__isnull=False, effort_days__gt=0, window_working_days__gt=0,
+    ).values_list(
+        'segment', 'start_date', 'end_date',
+        'daily_engineer_hours', 'daily_team_lead_hours', 'daily_manager_hours',
+    ).order_by().iterator(chunk_size=STREAM_CHUNK_SIZE)
+
+def aggregate_demand(engine, include_forecasts=True):
+    """
+    Single streaming pass over Activity and SalesForecast. Each row is read
+    once and fed to the engine as one range update, which produces every
+    rollup the report needs (per designation per day, per segment and global
+    per period) at the same time.
+
+    Only rows overlapping the engine's horizon are loaded; the range filters
+    are served by the (start_date, end_date) indexes on both tables, so old
+    finished work never leaves the database. Without include_forecasts only
+    booked activities are loaded.
+    """
+    min_date, max_date = engine.start_date, engine.end_date
+    for designation, segment_name, start_date, end_date in _stream_activities(min_date, max_date):
+        engine.add_activity(designation, segment_name, start_date, end_date)
+    if not include_forecasts:
+        return
+
+    for segment, start_date, end_date, eng_hours, tl_hours, mgr_hours in _stream_forecasts(min_date, max_date):
+        engine.add_forecast(segment, start_date, end_date, {
+            'ENGINEER': eng_hours,
+            'TEAM_LEAD': tl_hours,
+            'MANAGER': mgr_hours,
+        })
+
+def build_capacity_engine(today, include_forecasts=True):
+    """
+    Loads supply and demand once for the horizon shared by all view types.
+    The returned engine serves week, month and quarter views via rollup().
+    """
+    start_date, end_date = build_horizon(today)
+    work_calendar = WorkingCalendar(Holiday.objects.values_list('date', flat=True))
+    general_settings, _ = GeneralSettings.objects.get_or_create(pk=1)
+    capacity_settings = {c: CapacitySettings.objects.get_or_create(designation=c)[0] for c in DESIGNATIONS}
+    workforce_counts = {
+        c: Employee.objects.filter(designation=c, is_active=True).count() for c in DESIGNATIONS
+    }
+
+    leave_engine = LeaveEngine.load(work_calendar, start_date, end_date)
+
+    engine = CapacityEngine(start_date, end_date, work_calendar, general_settings.working_hours_per_day,
+                            capacity_settings, workforce_counts, leave_engine)
+
+    aggregate_demand(engine, include_forecasts)
+    return engine.build()
+
+_engine_lock = threading.Lock()
+_cached_engines = {}
+
+def get_capacity_engine(today, include_forecasts=True):
+    """
+    The built engine for today and the current planning-data version, shared by
+    every view type, the snapshots, the simulation and the scenarios; rebuilt
+    only after a data change or on a new day. Callers must not modify it.
+    """
+    version, _ = get_planning_version()
+    key = (today, include_forecasts)
+    with _engine_lock:
+        cached = _cached_engines.get(key)
+        if cached is None or cached[0] != version:
+            for stale_key in [k for k, (v, _) in _cached_engines.items() if v != version or k[0] != today]:
+                del _cached_engines[stale_key]
+            _cached_engines[key] = (version, build_capacity_engine(today, include_forecasts))
+        return _cached_engines[key][1]
+
+def compute_capacity_plan(view_type, today):
+    """Returns the per-period rollup of the capacity cube for one view type."""
+    return get_capacity_engine(today).rollup(build_periods(view_type, today))
+
+def _workload_rows(periods, live_hours, forecast_hours):
+    return [
+        {
+            'month': p['label'],
+            'live_workload': round(live, 1),
+            'forecasted_workload': round(forecast, 1),
+            'total': round(live + forecast, 1)
+        }
+        for p, live, forecast in zip(periods, live_hours.tolist(), forecast_hours.tolist())
+    ]
+
+def build_capacity_report(view_type, today):
+    """
+    Computes the capacity plan page data for one view type: the per-designation
+    report, the overall workload chart and one chart per segment.
+    Values are plain floats so the result can be cached, stored or sent as JSON.
+    """
+    plan = compute_capacity_plan(view_type, today)
+    periods = plan.periods
+
+    chart_data = _workload_rows(periods, plan.live_workload(), plan.forecasted_workload())
+
+    segment_charts = []
+    for segment in Segment.objects.all().order_by('name'):
+        segment_charts.append({
+            'name': segment.name,
+            'data': _workload_rows(
+                periods, plan.segment_live_workload(segment.name), plan.segment_forecasted_workload(segment.name)
+            ),
+        })
+
+    report = []
+    for des_value, des_display in Employee.DESIGNATION_CHOICES:
+        des_data = {'designation': des_display, 'months': []}
+        headcount = plan.engine.workforce_counts[des_value]
+        available = plan.available_hours(des_value)
+        required_headcount = plan.required_headcount(des_value)
+        required = plan.required_hours(des_value, available, required_headcount)
+
+        for p, available_hours, required_hours, req_hc in zip(
+            periods, available.tolist(), required.tolist(), required_headcount.tolist()
+        ):
+            des_data['months'].append({
+                'month': p['label'],
+                'available_hours': available_hours,
+                'required_hours': required_hours,
+                'variance_hours': available_hours - required_hours,
+                'available_headcount': headcount,
+                'required_headcount': req_hc
+            })
+        report.append(des_data)
+
+    return {'report_data': report, 'chart_data': chart_data, 'segment_charts': segment_charts}
@@ -0,0 +1,114 @@
+# planner/capacity_snapshots.py
+
+import logging
+import threading
+from datetime import date
+
+from django.db import connection
+from django.utils import timezone
+
+from .capacity_cache import get_capacity_report, peek_capacity_report
+from .capacity_engine import VIEW_TYPES
+from .models import CapacitySnapshot
+from .versioning import get_planning_version
+
+logger = logging.getLogger(__name__)
+
+_refresh_lock = threading.Lock()
+_refresh_thread = None
+
+def build_capacity_snapshots(today=None, view_types=VIEW_TYPES):
+    """Computes and stores the report of each view type. Returns the saved snapshots."""
+    today = today or date.today()
+    # Read before computing: if data changes meanwhile, the snapshot is simply stale next time.
+    version, _ = get_planning_version()
+    snapshots = []
+    for view_type in view_types:
+        snapshot, _ = CapacitySnapshot.objects.update_or_create(
+            view_type=view_type,
+            defaults={
+                'report_date': today,
+                'data_version': version,
+                'data': get_capacity_report(view_type, today),
+                'computed_at': timezone.now(),
+            },
+        )
+        snapshots.append(snapshot)
+    return snapshots
+
+def is_stale(snapshot, version, today):
+    return snapshot.data_version != version or snapshot.report_date != today
+
+def _refresh(today):
+    try:
+        build_capacity_snapshots(today)
+    except Exception:
+        logger.exception("Background capacity snapshot refresh failed.")
+    finally:
+        # Threads get their own database connection; do not leave it open.
+        connection.close()
+
+def refresh_snapshots_in_background(today=None):
+    """Starts a snapshot rebuild in a daemon thread unless one is already running."""
+    global _refresh_thread
+    with _refresh_lock:
+        if _refresh_thread is not None and _refresh_thread.is_alive():
+            return False
+        _refresh_thread = threading.Thread(
+            target=_refresh, args=(today or date.today(),), name='capacity-snapshot-refresh', daemon=True
+        )
+        _refresh_thread.start()
+        return True
+
+def get_capacity_page_report(view_type, today):
+    """
+    Returns (report, snapshot, stale) for the capacity plan page, cheapest source first:
+    a current snapshot, the result cache, a stale snapshot (a rebuild is started in
+    the background), or - with nothing stored yet - a synchronous build.
+    snapshot is None when the report did not come from a snapshot.
+    """
+    if view_type not in VIEW_TYPES:
+        view_type = 'month'
+    version, _ = get_planning_version()
+    snapshot = CapacitySnapshot.objects.filter(view_type=view_type).first()
+
+    if snapshot and not is_stale(snapshot, version, today):
+        return snapshot.data, snapshot, False
+    report = peek_capacity_report(view_type, today, version)
+    if report is not None:
+        return report, None, False
+    if snapshot:
+        refresh_snapshots_in_background(today)
+        return snapshot.data, snapshot, True
+
+    snapshot = build_capacity_snapshots(today, [view_type])[0]
+    return snapshot.data, snapshot, False
+
+def refresh_stale_snapshots(today=None):
+    """Rebuilds all snapshots if any is missing or stale. Returns True if they were rebuilt."""
+    today = today or date.today()
+    version, _ = get_planning_version()
+    snapshots = list(CapacitySnapshot.objects.all())
+    if len(snapshots) < len(VIEW_TYPES) or any(is_stale(s, version, today) for s in snapshots):
+        build_capacity_snapshots(today)
+        return True
+    return False
+
+def start_snapshot_refresher(interval_seconds):
+    """
+    Starts a daemon thread that rebuilds stale snapshots every interval_seconds,
+    so the first visitor after an edit (or after midnight) gets a fresh report.
+    """
+    stop = threading.Event()
+
+    def run():
+        while not stop.wait(interval_seconds):
+            try:
+                refresh_stale_snapshots()
+            except Exception:
+                logger.exception("Periodic capacity snapshot refresh failed.")
+            finally:
+                connection.close()
+
+    threading.Thread(target=run, name='capacity-snapshot-refresher', daemon=True).start()
+    return stop
@@ -0,0 +1,249 @@
+# planner/conflicts.py
+
+from collections import defaultdict
+from datetime import date
+
+from .leave_engine import coalesce_intervals
+from .models import Activity, Leave, Holiday
+from .utils import WorkingCalendar
+
+ACTIVITY = 'activity'
+LEAVE = 'leave'
+DEFAULT_REPORT_LIMIT = 500
+MAX_REPORT_LIMIT = 5000
+
+class IntervalTree:
+    """
+    Static centered interval tree over closed (start, end, item) intervals.
+
+    Each node keeps the intervals that contain its center point twice, sorted
+    by start and by end (descending), so a query only scans intervals that
+    actually overlap plus one path per side: O(log n + k).
+    """
+
+    __slots__ = ('center', 'by_start', 'by_end', 'left', 'right')
+
+    def __init__(self, intervals):
+        points = sorted(p for start, end, _ in intervals for p in (start, end))
+        self.center = points[len(points) // 2]
+        here, left, right = [], [], []
+        for interval in intervals:
+            if interval[1] < self.center:
+                left.append(interval)
+            elif interval[0] > self.center:
+                right.append(interval)
+            else:
+                here.append(interval)
+        self.by_start = sorted(here, key=lambda iv: iv[0])
+        self.by_end = sorted(here, key=lambda iv: iv[1], reverse=True)
+        self.left = IntervalTree(left) if left else None
+        self.right = IntervalTree(right) if right else None
+
+    def overlapping(self, start, end, found=None):
+        """Items of every interval intersecting [start, end]."""
+        if found is None:
+            found = []
+        node = self
+        while node is not None:
+            if end < node.center:
+                for iv in node.by_start:
+                    if iv[0] > end:
+                        break
+                    found.append(iv)
+                node = node.left
+            elif start > node.center:
+                for iv in node.by_end:
+                    if iv[1] < start:
+                        break
+                    found.append(iv)
+                node = node.right
+            else:
+                found.extend(node.by_start)
+                if node.left is not None:
+                    node.left.overlapping(start, end, found)
+                node = node.right
+        return found
+
+class ConflictIndex:
+    """
+    Per-assignee interval trees over assigned activities and leave.
+
+    Dates are stored as ordinals. Intervals are (start, end, (kind, pk, label))
+    so a lookup returns enough to describe the clash without touching the database;
+    leave is stored coalesced, with no pk.
+    """
+
+    def __init__(self, work_calendar, activities, leaves):
+        """
+        Args:
+            work_calendar (WorkingCalendar): Used to ignore overlaps on non-working days.
+            activities (iterable): (pk, assignee_id, start_date, end_date, label) tuples.
+            leaves (iterable): (pk, employee_id, start_date, end_date, reason) tuples.
+        """
+        self.work_calendar = work_calendar
+        raw = defaultdict(list)
+        for pk, employee_id, start_date, end_date, label in activities:
+            if employee_id is None or start_date is None or end_date is None or start_date > end_date:
+                continue
+            raw[employee_id].append((start_date.toordinal(), end_date.toordinal(), (ACTIVITY, pk, label)))
+
+        # Overlapping Leave rows are merged first so one absence is reported once.
+        leave_rows = defaultdict(list)
+        for pk, employee_id, start_date, end_date, reason in leaves:
+            if start_date <= end_date:
+                leave_rows[employee_id].append((start_date, end_date))
+        for employee_id, intervals in leave_rows.items():
+            for start_date, end_date in coalesce_intervals(intervals):
+                raw[employee_id].append((start_date.toordinal(), end_date.toordinal(), (LEAVE, None, 'Leave')))
+        self.trees = {employee_id: IntervalTree(intervals) for employee_id, intervals in raw.items()}
+        self.activity_spans = {
+            item[1]: (employee_id, start, end)
+            for employee_id, intervals in raw.items()
+            for start, end, item in intervals if item[0] == ACTIVITY
+        }
+
+    @classmethod
+    def load(cls, work_calendar=None, start_date=None, end_date=None, employee_ids=None):
+        """Builds the index from the database, optionally limited to a window and to employees."""
+        if work_calendar is None:
+            work_calendar = WorkingCalendar(Holiday.objects.values_list('date', flat=True))
+        activities_qs = Activity.objects.filter(assignee__isnull=False)
+        leaves_qs = Leave.objects.all()
+        if start_date:
+            activities_qs = activities_qs.filter(end_date__gte=start_date)
+            leaves_qs = leaves_qs.filter(end_date__gte=start_date)
+        if end_date:
+            activities_qs = activities_qs.filter(start_date__lte=end_date)
+            leaves_qs = leaves_qs.filter(start_date__lte=end_date)
+        if employee_ids is not None:
+            activities_qs = activities_qs.filter(assignee_id__in=employee_ids)
+            leaves_qs = leaves_qs.filter(employee_id__in=employee_ids)
+        activities = activities_qs.order_by().values_list(
+            'id', 'assignee_id', 'start_date', 'end_date', 'activity_name'
+        )
+        leaves = leaves_qs.order_by().values_list('id', 'employee_id', 'start_date', 'end_date', 'reason')
+        return cls(work_calendar, activities.iterator(), leaves.iterator())
+
+    def overlapping(self, employee_id, start_date, end_date, exclude_activity=None):
+        """
+        Activities and leave of one employee that share at least one working day
+        with [start_date, end_date]: a list of dicts sorted by overlap start.
+        """
+        tree = self.trees.get(employee_id)
+        if tree is None or start_date is None or end_date is None:
+            return []
+        lo, hi = start_date.toordinal(), end_date.toordinal()
+        clashes = []
+        for start, end, (kind, pk, label) in tree.overlapping(lo, hi):
+            if kind == ACTIVITY and pk == exclude_activity:
+                continue
+            overlap_start, overlap_end = date.fromordinal(max(start, lo)), date.fromordinal(min(end, hi))
+            working_days = self.work_calendar.working_days_between(overlap_start, overlap_end)
+            if working_days:
+                clashes.append({
+                    'kind': kind,
+                    'pk': pk,
+                    'label': label,
+                    'start_date': date.fromordinal(start),
+                    'end_date': date.fromordinal(end),
+                    'overlap_start': overlap_start,
+                    'overlap_end': overlap_end,
+                    'working_days': working_days,
+                })
+        clashes.sort(key=lambda c: (c['overlap_start'], c['kind'], c['pk'] or 0))
+        return clashes
+
+    def scan(self):
+        """
+        Every conflict in the index: each overlapping pair of activities once
+        (lower pk first) and each activity/leave overlap.
+        """
+        conflicts = []
+        for activity_pk, (employee_id, start, end) in self.activity_spans.items():
+            for clash in self.overlapping(
+                employee_id, date.fromordinal(start), date.fromordinal(end), exclude_activity=activity_pk
+            ):
+                if clash['kind'] == ACTIVITY and clash['pk'] < activity_pk:
+                    continue
+                clash.update({'employee_id': employee_id, 'activity_pk': activity_pk})
+                conflicts.append(clash)
+        conflicts.sort(key=lambda c: (c['overlap_start'], c['employee_id'], c['activity_pk'], c['pk'] or 0))
+        return conflicts
+
+def activity_conflicts(activity, index=None):
+    """Bookings and leave that clash with a saved activity's assignee and dates."""
+    if activity.assignee_id is None or activity.end_date is None:
+        return []
+    if index is None:
+        index = ConflictIndex.load(
+            start_date=activity.start_date, end_date=activity.end_date, employee_ids=[activity.assignee_id]
+        )
+    return index.overlapping(activity.assignee_id, activity.start_date, activity.end_date, exclude_activity=activity.pk)
+
+def describe_conflict(clash):
+    """One-line warning text for a clash returned by ConflictIndex.overlapping."""
+    days = f"{clash['working_days']} working day{'s' if clash['working_days'] != 1 else ''}"
+    period = f"{clash['overlap_start']:%d %b %Y} to {clash['overlap_end']:%d %b %Y}"
+    if clash['kind'] == LEAVE:
+        return f"Assignee is on leave from {period} ({days})."
+    return f"Assignee is also booked on '{clash['label']}' from {period} ({days})."
+
+def _parse_params(params):
+    try:
+        start_date = date.fromisoformat(params['start']) if params.get('start') else None
+        end_date = date.fromisoformat(params['end']) if params.get('end') else None
+    except ValueError:
+        raise ValueError("'start' and 'end' must be YYYY-MM-DD dates.")
+    try:
+        employee_ids = [int(v) for v in params.getlist('employee')] or None
+        offset = max(int(params.get('offset') or 0), 0)
+        limit = min(max(int(params.get('limit') or DEFAULT_REPORT_LIMIT), 0), MAX_REPORT_LIMIT)
+    except ValueError:
+        raise ValueError("'employee', 'offset' and 'limit' must be integers.")
+    kind = params.get('kind')
+    if kind not in (None, '', ACTIVITY, LEAVE):
+        raise ValueError("'kind' must be 'activity' or 'leave'.")
+    return start_date, end_date, employee_ids, kind or None, offset, limit
+
+def build_conflicts_report(params):
+    """
+    Portfolio-wide over-allocation report. Params: start/end (only bookings
+    touching the window), employee (repeatable), kind (activity|leave),
+    offset/limit. Raises ValueError on bad parameters.
+    """
+    start_date, end_date, employee_ids, kind, offset, limit = _parse_params(params)
+    conflicts = ConflictIndex.load(start_date=start_date, end_date=end_date, employee_ids=employee_ids).scan()
+    if kind:
+        conflicts = [c for c in conflicts if c['kind'] == kind]
+
+    page = conflicts[offset:offset + limit]
+    activity_ids = {c['activity_pk'] for c in page} | {c['pk'] for c in page if c['kind'] == ACTIVITY}
+    activities = {
+        act.pk: act for act in
+        Activity.objects.filter(id__in=activity_ids).select_related('project', 'assignee')
+    }
+    rows = []
+    for clash in page:
+        activity = activities.get(clash['activity_pk'])
+        other = activities.get(clash['pk']) if clash['kind'] == ACTIVITY else None
+        rows.append({
+            'kind': clash['kind'],
+            'employee_id': clash['employee_id'],
+            'employee': activity.assignee.name if activity and activity.assignee else None,
+            'activity': {
+                'pk': clash['activity_pk'],
+                'name': activity.activity_name if activity else None,
+                'project_code': activity.project.project_id if activity else None,
+            },
+            'other': {
+                'pk': clash['pk'],
+                'name': clash['label'],
+                'project_code': other.project.project_id if other else None,
+                'start_date': clash['start_date'].isoformat(),
+                'end_date': clash['end_date'].isoformat(),
+            },
+            'overlap_start': clash['overlap_start'].isoformat(),
+            'overlap_end': clash['overlap_end'].isoformat(),
+            'working_days': clash['working_days'],
+        })
+    return {'total': len(conflicts), 'offset': offset, 'limit': limit, 'conflicts': rows}
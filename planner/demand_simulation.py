@@ -0,0 +1,185 @@
+# planner/demand_simulation.py
+
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from .capacity_engine import DESIGNATIONS, VIEW_TYPES, get_capacity_engine, build_periods, STREAM_CHUNK_SIZE
+from .models import Employee, SalesForecast
+
+DEFAULT_TRIALS = 10_000
+MAX_TRIALS = 100_000
+DEFAULT_SEED = 0
+# Trials are drawn and reduced in blocks of this size (bounds memory; one block per pool task).
+BLOCK_TRIALS = 2_000
+PERCENTILES = (50, 80, 95)
+
+FORECAST_HOUR_FIELDS = {
+    'ENGINEER': 'daily_engineer_hours',
+    'TEAM_LEAD': 'daily_team_lead_hours',
+    'MANAGER': 'daily_manager_hours',
+}
+
+class ForecastSet:
+    """
+    The sales forecasts that carry demand inside a horizon, as parallel arrays:
+    win probability (0-1), first and last day index relative to the horizon
+    start, and daily hours per designation (columns in DESIGNATIONS order).
+    """
+
+    def __init__(self, origin, rows):
+        """rows: (opportunity, probability %, start_date, end_date, *daily hours in DESIGNATIONS order)."""
+        rows = list(rows)
+        self.origin = origin
+        self.opportunities = [row[0] for row in rows]
+        self.probability = np.clip(np.array([row[1] or 0 for row in rows], dtype=float) / 100, 0, 1)
+        self.first_day = np.array([(row[2] - origin).days for row in rows], dtype=np.int64)
+        self.last_day = np.array([(row[3] - origin).days for row in rows], dtype=np.int64)
+        self.daily_hours = np.array([row[4:] for row in rows], dtype=float).reshape(len(rows), len(DESIGNATIONS))
+
+    def __len__(self):
+        return len(self.opportunities)
+
+    @classmethod
+    def load(cls, start_date, end_date, origin=None):
+        """
+        Forecasts overlapping [start_date, end_date] that carry demand (same filter
+        as the capacity plan). Day indexes count from origin (default start_date).
+        """
+        rows = SalesForecast.objects.filter(
+            start_date__lte=end_date, end_date__gte=start_date,
+            project_type__isnull=False, effort_days__gt=0, window_working_days__gt=0,
+        ).values_list(
+            'opportunity', 'probability', 'start_date', 'end_date', *(FORECAST_HOUR_FIELDS[des] for des in DESIGNATIONS)
+        ).order_by('opportunity').iterator(chunk_size=STREAM_CHUNK_SIZE)
+        return cls(origin or start_date, rows)
+
+    def working_days_in_chunks(self, working_prefix, chunk_starts, chunk_ends):
+        """(forecasts x chunks) working days of each forecast window inside each [start, end) day chunk."""
+        num_days = len(working_prefix) - 1
+        first = np.clip(self.first_day, 0, num_days)[:, None]
+        after_last = np.clip(self.last_day + 1, 0, num_days)[:, None]
+        lo = np.maximum(chunk_starts[None, :], first)
+        hi = np.minimum(chunk_ends[None, :], after_last)
+        return np.maximum(working_prefix[hi] - working_prefix[lo], 0)
+
+class DemandSimulation:
+    """
+    Monte Carlo model of the headcount requirement with uncertain sales.
+
+    The requirement of a period is its peak ISO-week headcount (see
+    CapacityRollup.required_headcount), and a week's headcount is linear in
+    its demand. So each forecast is reduced once to the headcount it adds to
+    every week chunk if it is won, and a batch of trials is one matrix product:
+    (trials x forecasts) win/loss draws times (forecasts x weeks) headcount,
+    plus the fixed headcount of booked activities, followed by a per-period
+    maximum. Only chunks with working days are kept.
+    """
+
+    def __init__(self, rollup, forecasts):
+        """
+        Args:
+            rollup (CapacityRollup): Periods of an engine loaded with booked activities only.
+            forecasts (ForecastSet): The uncertain demand.
+        """
+        self.periods = rollup.periods
+        self.probability = forecasts.probability
+        chunks = rollup.chunks
+        counted = chunks['working_days'] > 0
+        working_days = forecasts.working_days_in_chunks(
+            rollup.engine._prefix['working_days'], rollup.chunk_starts[counted], rollup.chunk_ends[counted]
+        )
+        self.live = {}
+        self.forecast = {}
+        for column, des in enumerate(DESIGNATIONS):
+            capacity_per_person = chunks['capacity_per_person'][des][counted]
+            per_hour = np.zeros(len(capacity_per_person))
+            np.divide(1.0, capacity_per_person, out=per_hour, where=capacity_per_person > 0)
+            self.live[des] = chunks['demand'][des][counted] * per_hour
+            self.forecast[des] = working_days * forecasts.daily_hours[:, column:column + 1] * per_hour
+        self.group_periods, self.group_starts = np.unique(rollup.chunk_period[counted], return_index=True)
+
+    def required_headcount(self, weights):
+        """Peak weekly headcount per period (rows x periods) per designation, for rows of forecast weights."""
+        weights = np.atleast_2d(weights)
+        result = {}
+        for des in DESIGNATIONS:
+            weekly = self.live[des] + weights @ self.forecast[des]
+            peaks = np.zeros((len(weights), len(self.periods)))
+            if weekly.shape[1]:
+                peaks[:, self.group_periods] = np.maximum.reduceat(weekly, self.group_starts, axis=1)
+            result[des] = peaks
+        return result
+
+    def run(self, trials, seed=DEFAULT_SEED, workers=1):
+        """
+        Samples win/loss for every forecast from its probability in `trials`
+        trials and returns the (trials x periods) requirement per designation.
+        Each block of trials has its own child seed, so results depend on the
+        seed but not on how many worker processes share the blocks.
+        """
+        blocks = [min(BLOCK_TRIALS, trials - i) for i in range(0, trials, BLOCK_TRIALS)]
+        seeds = np.random.SeedSequence(seed).spawn(len(blocks))
+        if workers > 1 and len(blocks) > 1:
+            with ProcessPoolExecutor(max_workers=min(workers, len(blocks))) as pool:
+                results = list(pool.map(_run_block, [self] * len(blocks), seeds, blocks))
+        else:
+            results = [_run_block(self, block_seed, size) for block_seed, size in zip(seeds, blocks)]
+        return {des: np.concatenate([block[des] for block in results]) for des in DESIGNATIONS}
+
+def _run_block(simulation, seed, trials):
+    # Module level so a process pool can pickle it.
+    rng = np.random.default_rng(seed)
+    won = rng.random((trials, len(simulation.probability))) < simulation.probability
+    return simulation.required_headcount(won.astype(float))
+
+def simulate_demand(view_type, today, trials=DEFAULT_TRIALS, seed=DEFAULT_SEED, workers=1):
+    """
+    Probability-weighted capacity plan for one view type. Per designation and
+    period: the requirement if every forecast is won (today's plan), the
+    requirement of the expected (probability-weighted) demand, the P50/P80/P95
+    of the simulated requirement and the share of trials short of the current
+    headcount. Values are plain floats so the result can be cached or sent as JSON.
+    """
+    if view_type not in VIEW_TYPES:
+        view_type = 'month'
+    if not 1 <= trials <= MAX_TRIALS:
+        raise ValueError(f"'trials' must be between 1 and {MAX_TRIALS}.")
+    engine = get_capacity_engine(today, include_forecasts=False)
+    rollup = engine.rollup(build_periods(view_type, today))
+    forecasts = ForecastSet.load(engine.start_date, engine.end_date)
+    simulation = DemandSimulation(rollup, forecasts)
+
+    samples = simulation.run(trials, seed, workers)
+    all_won = simulation.required_headcount(np.ones(len(forecasts)))
+    expected = simulation.required_headcount(forecasts.probability)
+
+    report = []
+    for des_value, des_display in Employee.DESIGNATION_CHOICES:
+        headcount = engine.workforce_counts[des_value]
+        p50, p80, p95 = np.percentile(samples[des_value], PERCENTILES, axis=0).tolist()
+        shortage = (samples[des_value] > headcount).mean(axis=0).tolist()
+        rows = zip(rollup.periods, all_won[des_value][0].tolist(), expected[des_value][0].tolist(), p50, p80, p95, shortage)
+        report.append({
+            'designation': des_display,
+            'months': [
+                {
+                    'month': period['label'],
+                    'available_headcount': headcount,
+                    'all_won_headcount': all_won_hc,
+                    'expected_headcount': expected_hc,
+                    'p50_headcount': p50_hc,
+                    'p80_headcount': p80_hc,
+                    'p95_headcount': p95_hc,
+                    'shortage_probability': shortage_share,
+                }
+                for period, all_won_hc, expected_hc, p50_hc, p80_hc, p95_hc, shortage_share in rows
+            ],
+        })
+    return {
+        'view_type': view_type,
+        'trials': trials,
+        'seed': seed,
+        'opportunities': len(forecasts),
+        'simulation_data': report,
+    }
@@ -0,0 +1,192 @@
+# planner/dependencies.py
+
+from collections import defaultdict, deque
+from datetime import timedelta
+
+from django.db import transaction
+
+from .availability import employee_calendars
+from .models import Activity, Holiday, Leave
+from .utils import WorkingCalendar
+from .versioning import bump_planning_version
+
+BULK_BATCH_SIZE = 1000
+
+Dependency = Activity.predecessors.through
+
+def _links(field, activity_ids):
+    # (predecessor_id, successor_id) links whose `field` is in activity_ids, in batches.
+    activity_ids = list(activity_ids)
+    for i in range(0, len(activity_ids), BULK_BATCH_SIZE):
+        yield from Dependency.objects.filter(**{f'{field}__in': activity_ids[i:i + BULK_BATCH_SIZE]}).values_list(
+            'to_activity_id', 'from_activity_id'
+        )
+
+def predecessor_links(activity_ids):
+    """Every (predecessor_id, successor_id) link into activity_ids."""
+    return list(_links('from_activity_id', activity_ids))
+
+def _successor_map(edges):
+    successors = defaultdict(list)
+    for predecessor_id, successor_id in edges:
+        successors[predecessor_id].append(successor_id)
+    return successors
+
+def downstream_activities(activity_ids):
+    """Ids of every activity that directly or transitively waits for activity_ids (one query per level)."""
+    downstream, frontier = set(), set(activity_ids)
+    while frontier:
+        successor_ids = {successor_id for _, successor_id in _links('to_activity_id', frontier)}
+        frontier = successor_ids - downstream
+        downstream |= frontier
+    return downstream
+
+def looping_predecessors(activity_id, predecessor_ids):
+    """The predecessor_ids that would close a loop if linked as predecessors of activity_id."""
+    downstream = downstream_activities([activity_id]) if activity_id else set()
+    return [pk for pk in predecessor_ids if pk == activity_id or pk in downstream]
+
+def would_create_cycle(predecessor_id, successor_id):
+    """True if making predecessor_id a predecessor of successor_id closes a loop."""
+    return bool(looping_predecessors(successor_id, [predecessor_id]))
+
+def topological_order(node_ids, edges):
+    """Kahn's order of node_ids under the edges between them; nodes on a cycle are left out."""
+    node_ids = set(node_ids)
+    successors = defaultdict(list)
+    indegree = dict.fromkeys(node_ids, 0)
+    for predecessor_id, successor_id in edges:
+        if predecessor_id in node_ids and successor_id in node_ids:
+            successors[predecessor_id].append(successor_id)
+            indegree[successor_id] += 1
+    queue = deque(sorted(pk for pk, degree in indegree.items() if degree == 0))
+    order = []
+    while queue:
+        pk = queue.popleft()
+        order.append(pk)
+        for successor_id in successors[pk]:
+            indegree[successor_id] -= 1
+            if indegree[successor_id] == 0:
+                queue.append(successor_id)
+    return order
+
+def _calendars_for(assignee_ids):
+    work_calendar = WorkingCalendar(Holiday.objects.values_list('date', flat=True))
+    leaves = Leave.objects.filter(employee_id__in=assignee_ids).order_by().values_list('employee_id', 'start_date', 'end_date')
+    return work_calendar, employee_calendars(work_calendar, set(assignee_ids), leaves.iterator())
+
+def propagate_dependencies(changed_ids):
+    """
+    Pushes every activity downstream of changed_ids so it starts no earlier than
+    the working day after all of its predecessors finish. Only the links of the
+    downstream subgraph are read (filtered queries, level by level) and only its
+    activities are loaded and visited, in topological order; a node is only
+    re-evaluated when one of its predecessors actually moved. Rows whose dates
+    change are written with one bulk_update. Dates only move later: a predecessor
+    finishing early leaves its successors where they are. Returns the ids that moved.
+    """
+    affected = downstream_activities(changed_ids)
+    if not affected:
+        return []
+
+    # Every link into the subgraph: its internal order plus the outside predecessors it waits for.
+    edges = predecessor_links(affected)
+    predecessors = defaultdict(list)
+    for predecessor_id, successor_id in edges:
+        predecessors[successor_id].append(predecessor_id)
+    needed = affected.union(*predecessors.values())
+    activities = Activity.objects.in_bulk(needed)
+    work_calendar, calendars = _calendars_for(
+        {activities[pk].assignee_id for pk in affected if pk in activities and activities[pk].assignee_id}
+    )
+
+    moved = []
+    moved_ids = set(changed_ids)
+    for pk in topological_order(affected, edges):
+        activity = activities.get(pk)
+        if activity is None or moved_ids.isdisjoint(predecessors[pk]):
+            continue
+        calendar = calendars.get(activity.assignee_id, work_calendar)
+        finishes = [activities[p].end_date for p in predecessors[pk] if p in activities and activities[p].end_date]
+        if not finishes:
+            continue
+        earliest = calendar.nth_working_day(max(finishes) + timedelta(days=1), 1)
+        if activity.start_date < earliest:
+            activity.start_date = earliest
+            activity.end_date = calendar.nth_working_day(earliest, activity.duration) if activity.duration > 0 else earliest
+            moved.append(activity)
+            moved_ids.add(pk)
+
+    if moved:
+        with transaction.atomic():
+            Activity.objects.bulk_update(moved, ['start_date', 'end_date'], batch_size=BULK_BATCH_SIZE)
+            # bulk_update sends no signals.
+            bump_planning_version()
+    return [activity.pk for activity in moved]
+
+def critical_path(project):
+    """
+    Critical-path analysis of a project's activities as currently scheduled,
+    in working days of the company calendar. Links to activities of other
+    projects are treated as fixed. For each activity: its latest start that
+    does not delay the project's finish, its total slack, and whether it is critical.
+    Activities on (or waiting behind) a dependency loop cannot be analysed: they
+    are listed with no slack and their ids are reported under 'loop'.
+    """
+    rows = list(
+        Activity.objects.filter(project=project).order_by('start_date', 'pk')
+        .values('id', 'activity_name', 'start_date', 'end_date', 'assignee__name')
+    )
+    if not rows:
+        return {'project': project.project_id, 'finish_date': None, 'activities': [], 'critical_path': [], 'loop': []}
+    ids = {row['id'] for row in rows}
+    edges = [(p, s) for p, s in Dependency.objects.filter(from_activity_id__in=ids, to_activity_id__in=ids)
+             .values_list('to_activity_id', 'from_activity_id')]
+    work_calendar = WorkingCalendar(Holiday.objects.values_list('date', flat=True))
+
+    by_id = {}
+    for row in rows:
+        end_date = row['end_date'] or row['start_date']
+        start_rank = work_calendar.working_days_before(row['start_date'])
+        # Span in company working days; leave inside the activity counts as occupied.
+        span = max(work_calendar.working_days_between(row['start_date'], end_date), 1)
+        by_id[row['id']] = dict(row, end_date=end_date, start_rank=start_rank, end_rank=start_rank + span - 1, span=span)
+
+    successors = _successor_map(edges)
+    predecessors = defaultdict(list)
+    for predecessor_id, successor_id in edges:
+        predecessors[successor_id].append(predecessor_id)
+    finish_rank = max(info['end_rank'] for info in by_id.values())
+    order = topological_order(ids, edges)
+    loop = ids.difference(order)
+    for pk in reversed(order):
+        info = by_id[pk]
+        latest_finish = min(
+            (by_id[s]['latest_start_rank'] - 1 for s in successors.get(pk, ()) if s not in loop), default=finish_rank
+        )
+        info['latest_start_rank'] = latest_finish - info['span'] + 1
+
+    activities = []
+    for pk in order + sorted(loop):
+        info = by_id[pk]
+        slack = info['latest_start_rank'] - info['start_rank'] if pk not in loop else None
+        activities.append({
+            'id': pk,
+            'name': info['activity_name'],
+            'assignee': info['assignee__name'],
+            'start_date': info['start_date'].isoformat(),
+            'end_date': info['end_date'].isoformat(),
+            'latest_start': work_calendar.nth_working_day(work_calendar.nth_working_day(info['start_date'], 1), slack + 1).isoformat()
+            if slack is not None and slack >= 0 else None,
+            'slack_days': slack,
+            'critical': slack is not None and slack <= 0,
+            'predecessors': sorted(predecessors.get(pk, ())),
+        })
+    activities.sort(key=lambda a: (a['start_date'], a['id']))
+    return {
+        'project': project.project_id,
+        'finish_date': max(info['end_date'] for info in by_id.values()).isoformat(),
+        'activities': activities,
+        'critical_path': [a['id'] for a in activities if a['critical']],
+        'loop': sorted(loop),
+    }
@@ -0,0 +1,44 @@
+# planner/effort_curves.py
+
+import threading
+
+from .models import ProjectType
+from .utils import EffortCurve
+
+# Process-wide cache of compiled curves; rebuilt lazily after invalidation.
+_lock = threading.Lock()
+_cache = None
+
+EMPTY_CURVE = EffortCurve([])
+
+def _build_cache():
+    curves = {}
+    project_types = {}
+    for pt in ProjectType.objects.select_related('segment', 'category').prefetch_related('effort_brackets'):
+        curves[pt.id] = EffortCurve.from_brackets(pt.effort_brackets.all())
+        project_types[(pt.segment.name, pt.category.name)] = pt
+    return {'curves': curves, 'project_types': project_types}
+
+def _get_cache():
+    global _cache
+    cache = _cache
+    if cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = _build_cache()
+            cache = _cache
+    return cache
+
+def get_effort_curve(project_type_id):
+    """Compiled EffortCurve of a ProjectType (an empty curve if it has no brackets)."""
+    return _get_cache()['curves'].get(project_type_id, EMPTY_CURVE)
+
+def get_project_type_lookup():
+    """Maps (segment name, category name) -> ProjectType, as used by forecast rows."""
+    return _get_cache()['project_types']
+
+def invalidate_effort_curves():
+    """Drops the cached curves; call whenever EffortBracket or ProjectType rows change."""
+    global _cache
+    with _lock:
+        _cache = None
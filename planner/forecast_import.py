@@ -0,0 +1,254 @@
+# planner/forecast_import.py
+
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+
+from django.db import transaction
+
+from .models import SalesForecast
+from .forecast_metrics import ForecastMetricsContext, apply_forecast_metrics, METRIC_FIELDS
+from .utils import CR
+from .versioning import bump_planning_version, coalesced_version_bumps
+
+# Rows are inserted, updated and deleted in chunks of this size.
+BULK_BATCH_SIZE = 1000
+
+DATE_FORMATS = ('%Y-%m-%d', '%d-%m-%Y')
+
+DATA_FIELDS = ['total_amount', 'probability', 'segment', 'category', 'solution', 'start_date', 'end_date']
+
+def parse_date(value):
+    """Parses 'YYYY-MM-DD' or 'DD-MM-YYYY'; returns None for blank or unparseable values."""
+    if not value:
+        return None
+    # Spreadsheet cells may already hold a date or datetime.
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), fmt).date()
+        except ValueError:
+            continue
+    return None
+
+def parse_forecast_row(item):
+    """
+    Converts one uploaded row (keyed by the spreadsheet column names) into
+    SalesForecast field values. Raises ValueError if the row cannot be used.
+    """
+    opportunity_id = str(item.get('Opportunity', '') or '').strip()
+    if not opportunity_id:
+        raise ValueError("Missing Opportunity.")
+
+    try:
+        amount_str = str(item.get('Total Amount (in Cr)', item.get('Total Amount', '0'))).replace(',', '')
+        total_amount = float(amount_str) * CR if amount_str else 0.0
+        prob_str = str(item.get('Probability(%)', '0')).replace('%', '')
+        probability = float(prob_str) if prob_str else 0.0
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid amount or probability for '{opportunity_id}'.")
+
+    return {
+        'opportunity': opportunity_id,
+        'total_amount': total_amount,
+        'probability': probability,
+        'segment': item.get('Segment', '') or '',
+        'category': item.get('Category', '') or '',
+        'solution': item.get('Solution', '') or '',
+        'start_date': parse_date(item.get('Start Date', '')),
+        'end_date': parse_date(item.get('End date', '')),
+    }
+
+def parse_forecast_rows(items):
+    """
+    Validates every row up front. Returns ({opportunity: fields}, errors);
+    a later row for the same opportunity replaces an earlier one.
+    """
+    parsed = {}
+    errors = []
+    for index, item in enumerate(items, start=1):
+        try:
+            fields = parse_forecast_row(item)
+        except ValueError as e:
+            errors.append({'row': index, 'error': str(e)})
+            continue
+        parsed[fields['opportunity']] = fields
+    return parsed, errors
+
+def _chunks(items, size=BULK_BATCH_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def _upsert_batch(parsed, context):
+    """Inserts new and updates changed forecasts for one batch of parsed rows."""
+    existing = SalesForecast.objects.in_bulk(list(parsed), field_name='opportunity')
+    to_create, to_update = [], []
+    for opportunity_id, fields in parsed.items():
+        forecast = existing.get(opportunity_id)
+        if forecast is None:
+            to_create.append(apply_forecast_metrics(SalesForecast(**fields), context))
+        elif any(getattr(forecast, name) != fields[name] for name in DATA_FIELDS):
+            for name in DATA_FIELDS:
+                setattr(forecast, name, fields[name])
+            to_update.append(apply_forecast_metrics(forecast, context))
+
+    SalesForecast.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+    SalesForecast.objects.bulk_update(to_update, DATA_FIELDS + METRIC_FIELDS, batch_size=BULK_BATCH_SIZE)
+    # bulk_create/bulk_update send no signals; deletes do.
+    if to_create or to_update:
+        bump_planning_version()
+    return len(to_create), len(to_update)
+
+def _delete_missing(seen_opportunities):
+    """Deletes stored forecasts whose opportunity was not in the upload, in chunks."""
+    stale_ids = [
+        pk for pk, opportunity_id in SalesForecast.objects.values_list('id', 'opportunity').iterator()
+        if opportunity_id not in seen_opportunities
+    ]
+    deleted = 0
+    for chunk in _chunks(stale_ids):
+        deleted += SalesForecast.objects.filter(id__in=chunk).delete()[0]
+    return deleted
+
+def apply_forecast_sync(parsed, delete_missing=True):
+    """
+    Diffs parsed rows against the stored forecasts and applies the inserts,
+    updates and (optionally) deletes in chunks inside one transaction, so
+    readers never see a half-loaded pipeline. Returns the counts.
+    """
+    context = ForecastMetricsContext()
+    inserted = updated = deleted = 0
+    items = list(parsed.items())
+
+    with coalesced_version_bumps(), transaction.atomic():
+        for chunk in _chunks(items):
+            created_count, updated_count = _upsert_batch(dict(chunk), context)
+            inserted += created_count
+            updated += updated_count
+        if delete_missing:
+            deleted = _delete_missing(parsed.keys())
+
+    return {'inserted': inserted, 'updated': updated, 'deleted': deleted}
+
+def sync_sales_forecasts(items):
+    """
+    Replaces the sales pipeline with the uploaded rows: parses and validates
+    everything first, then applies a diff-based bulk sync.
+    Returns counts of inserted, updated, deleted and rejected rows plus the row errors.
+    """
+    parsed, errors = parse_forecast_rows(items)
+    result = apply_forecast_sync(parsed)
+    result.update({'rejected': len(errors), 'errors': errors})
+    return result
+
+# --- Streaming file ingestion ---
+
+# Header spellings accepted in uploaded files, matched case-insensitively.
+COLUMN_ALIASES = {
+    'opportunity': 'Opportunity',
+    'total amount (in cr)': 'Total Amount (in Cr)',
+    'total amount': 'Total Amount',
+    'probability(%)': 'Probability(%)',
+    'probability (%)': 'Probability(%)',
+    'segment': 'Segment',
+    'category': 'Category',
+    'solution': 'Solution',
+    'start date': 'Start Date',
+    'end date': 'End date',
+}
+
+# At most this many row errors are returned; the rejected count is always exact.
+MAX_REPORTED_ERRORS = 500
+
+def _normalise_headers(header_row, aliases=COLUMN_ALIASES):
+    return [aliases.get(' '.join(str(h or '').split()).lower()) for h in header_row]
+
+def iter_csv_rows(file_obj, aliases=COLUMN_ALIASES):
+    """Yields (line number, row dict) from a CSV upload without loading it all."""
+    text = io.TextIOWrapper(file_obj, encoding='utf-8-sig', newline='')
+    reader = csv.reader(text)
+    headers = _normalise_headers(next(reader, []), aliases)
+    for values in reader:
+        if not any(values):
+            continue
+        yield reader.line_num, {h: v for h, v in zip(headers, values) if h}
+
+def iter_xlsx_rows(file_obj):
+    """Yields (row number, row dict) from the first sheet of an XLSX upload in read-only mode."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("XLSX uploads need the openpyxl package; upload a .csv file instead.")
+
+    try:
+        workbook = load_workbook(file_obj, read_only=True, data_only=True)
+    except (zipfile.BadZipFile, KeyError, OSError):
+        raise ValueError("The uploaded file is not a valid .xlsx workbook.")
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        headers = _normalise_headers(next(rows, []))
+        for row_number, values in enumerate(rows, start=2):
+            if not any(v not in (None, '') for v in values):
+                continue
+            item = {h: v for h, v in zip(headers, values) if h}
+            # Spreadsheets often store 45% as 0.45; the browser upload treats it the same way.
+            probability = item.get('Probability(%)')
+            if isinstance(probability, (int, float)) and probability <= 1:
+                item['Probability(%)'] = probability * 100
+            yield row_number, item
+    finally:
+        workbook.close()
+
+def import_forecast_stream(rows, delete_missing=False):
+    """
+    Imports (row number, row dict) pairs in batches inside one transaction.
+    Only one batch of parsed rows is held at a time; with delete_missing the
+    opportunities seen are remembered so stale forecasts can be removed at the end.
+    """
+    context = ForecastMetricsContext()
+    result = {'inserted': 0, 'updated': 0, 'deleted': 0, 'rejected': 0, 'errors': []}
+    seen = set()
+    batch = {}
+
+    def flush():
+        created_count, updated_count = _upsert_batch(batch, context)
+        result['inserted'] += created_count
+        result['updated'] += updated_count
+        batch.clear()
+
+    with coalesced_version_bumps(), transaction.atomic():
+        for row_number, item in rows:
+            try:
+                fields = parse_forecast_row(item)
+            except ValueError as e:
+                result['rejected'] += 1
+                if len(result['errors']) < MAX_REPORTED_ERRORS:
+                    result['errors'].append({'row': row_number, 'error': str(e)})
+                continue
+            if fields['opportunity'] in batch:
+                # Same opportunity twice in a batch: the later row wins.
+                del batch[fields['opportunity']]
+            batch[fields['opportunity']] = fields
+            seen.add(fields['opportunity'])
+            if len(batch) >= BULK_BATCH_SIZE:
+                flush()
+        if batch:
+            flush()
+        if delete_missing:
+            result['deleted'] = _delete_missing(seen)
+    return result
+
+def import_forecast_file(file_obj, filename, delete_missing=False):
+    """Streams a CSV or XLSX forecast file into the database. Raises ValueError for other types."""
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        rows = iter_csv_rows(file_obj)
+    elif name.endswith('.xlsx'):
+        rows = iter_xlsx_rows(file_obj)
+    else:
+        raise ValueError("Unsupported file type; upload a .csv or .xlsx file.")
+    return import_forecast_stream(rows, delete_missing=delete_missing)
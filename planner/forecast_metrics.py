@@ -0,0 +1,74 @@
+# planner/forecast_metrics.py
+
+from django.db import transaction
+
+from .models import SalesForecast, Holiday, GeneralSettings
+from .effort_curves import get_effort_curve, get_project_type_lookup
+from .utils import WorkingCalendar
+from .versioning import bump_planning_version
+
+# Rows are written back with bulk_update in batches of this size.
+BULK_BATCH_SIZE = 1000
+
+METRIC_FIELDS = [
+    'project_type', 'effort_days', 'window_working_days',
+    'daily_engineer_hours', 'daily_team_lead_hours', 'daily_manager_hours',
+]
+
+class ForecastMetricsContext:
+    """Everything needed to derive a forecast's stored metrics, loaded once per batch."""
+
+    def __init__(self, work_calendar=None, hours_per_day=None):
+        if work_calendar is None:
+            work_calendar = WorkingCalendar(Holiday.objects.values_list('date', flat=True))
+        if hours_per_day is None:
+            hours_per_day = GeneralSettings.objects.get_or_create(pk=1)[0].working_hours_per_day
+        self.work_calendar = work_calendar
+        self.hours_per_day = hours_per_day
+        self.pt_lookup = get_project_type_lookup()
+
+def apply_forecast_metrics(forecast, context):
+    """
+    Resolves the forecast's ProjectType from its segment/category names and
+    stores its effort, window working days and per-designation daily hours
+    on the instance (without saving).
+    """
+    p_type = context.pt_lookup.get((forecast.segment, forecast.category))
+    forecast.project_type = p_type
+    forecast.effort_days = get_effort_curve(p_type.id).evaluate(forecast.total_amount) if p_type else 0
+    forecast.window_working_days = 0
+    forecast.daily_engineer_hours = forecast.daily_team_lead_hours = forecast.daily_manager_hours = 0
+
+    if not p_type or not forecast.start_date or not forecast.end_date:
+        return forecast
+    forecast.window_working_days = context.work_calendar.working_days_between(forecast.start_date, forecast.end_date)
+    if forecast.effort_days <= 0 or forecast.window_working_days <= 0:
+        return forecast
+
+    daily_effort_factor = forecast.effort_days / forecast.window_working_days
+    hours_per_day = context.hours_per_day
+    forecast.daily_engineer_hours = hours_per_day * (p_type.engineer_involvement / 100) * daily_effort_factor
+    forecast.daily_team_lead_hours = hours_per_day * (p_type.team_lead_involvement / 100) * daily_effort_factor
+    forecast.daily_manager_hours = hours_per_day * (p_type.manager_involvement / 100) * daily_effort_factor
+    return forecast
+
+def refresh_forecast_metrics(queryset=None):
+    """
+    Recomputes the stored metrics of the given forecasts (all by default)
+    against the current brackets, involvement percentages, holidays and
+    working hours, and writes them back in bulk. Returns the number of rows.
+    """
+    if queryset is None:
+        queryset = SalesForecast.objects.all()
+    # Fetched up front (only the input columns) because the same table is written below.
+    forecasts = list(queryset.only('id', 'segment', 'category', 'total_amount', 'start_date', 'end_date').order_by())
+    if not forecasts:
+        return 0
+
+    context = ForecastMetricsContext()
+    for forecast in forecasts:
+        apply_forecast_metrics(forecast, context)
+    with transaction.atomic():
+        SalesForecast.objects.bulk_update(forecasts, METRIC_FIELDS, batch_size=BULK_BATCH_SIZE)
+        bump_planning_version()
+    return len(forecasts)
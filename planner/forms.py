@@ -2,6 +2,7 @@
 
 from django import forms
 from .models import Project, Activity, Employee, Leave
+from .dependencies import looping_predecessors
 
 class ProjectForm(forms.ModelForm):
     class Meta:
@@ -30,11 +31,17 @@ class ActivityForm(forms.ModelForm):
         required=False
     )
     
+    predecessors = forms.ModelMultipleChoiceField(
+        queryset=Activity.objects.none(),
+        required=False,
+        help_text="This activity starts after all of these have finished."
+    )
+    
     class Meta:
         model = Activity
         fields = [
             'project', 'activity_name', 'assignee', 
-            'remark', 'start_date', 'duration'
+            'remark', 'start_date', 'duration', 'predecessors'
         ]
         widgets = {
             'start_date': forms.DateInput(
@@ -54,6 +61,41 @@ class ActivityForm(forms.ModelForm):
             if isinstance(field.widget, forms.Textarea):
                 field.widget.attrs['rows'] = 3
 
+        # Predecessors are picked from the same project once the activity exists.
+        if self.instance.pk:
+            self.fields['predecessors'].queryset = (
+                Activity.objects.filter(project_id=self.instance.project_id).exclude(pk=self.instance.pk)
+            )
+            self.fields['predecessors'].widget.attrs['size'] = 6
+
+    def clean_predecessors(self):
+        return clean_predecessors(self.instance, self.cleaned_data['predecessors'], self.cleaned_data.get('project'))
+
+class ActivityAdminForm(forms.ModelForm):
+    class Meta:
+        model = Activity
+        fields = '__all__'
+
+    def clean_predecessors(self):
+        return clean_predecessors(self.instance, self.cleaned_data['predecessors'], self.cleaned_data.get('project'))
+
+def clean_predecessors(activity, predecessors, project=None):
+    """
+    Rejects predecessors from another project than `project` (when given) and
+    ones that already depend on the activity (the link would close a loop).
+    """
+    if project is not None:
+        foreign = [p.activity_name for p in predecessors if p.project_id != project.pk]
+        if foreign:
+            raise forms.ValidationError(f"{', '.join(foreign)} belongs to another project.")
+    if activity.pk and predecessors:
+        loops = set(looping_predecessors(activity.pk, [p.pk for p in predecessors]))
+        if loops:
+            raise forms.ValidationError(
+                f"{', '.join(p.activity_name for p in predecessors if p.pk in loops)} already depends on this activity."
+            )
+    return predecessors
+
 class LeaveForm(forms.ModelForm):
     class Meta:
         model = Leave
@@ -0,0 +1,263 @@
+# planner/gantt.py
+
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db.models import Count, Min, Max, Q
+from django.urls import reverse
+
+from .leave_engine import coalesce_intervals
+from .models import Activity, Project, Employee, Holiday, Leave
+from .utils import parse_int
+
+GROUPINGS = ('project', 'engineer', 'none')
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# Width of one lazily loaded date window; the API refuses anything wider than MAX_WINDOW_DAYS.
+WINDOW_DAYS = 91
+MAX_WINDOW_DAYS = 366
+UNASSIGNED = 'unassigned'
+
+def chart_bounds(activities_qs, today):
+    """Gantt date range: earliest start minus 7 days to latest end plus 60 days."""
+    bounds = activities_qs.aggregate(first=Min('start_date'), last=Max('end_date'))
+    start_date = (bounds['first'] or today) - timedelta(days=7)
+    end_date = (bounds['last'] or today) + timedelta(days=60)
+    return start_date, end_date
+
+def base_activities(project_id=None):
+    """Activities shown on a chart: one project's, or every activity for the consolidated planner."""
+    activities_qs = Activity.objects.all()
+    if project_id is not None:
+        activities_qs = activities_qs.filter(project_id=project_id)
+    return activities_qs
+
+def filter_activities(activities_qs, params):
+    """Applies the planner's search box, checkbox filters and column filters."""
+    search = params.get('q', '').strip()
+    if search:
+        activities_qs = activities_qs.filter(
+            Q(project__project_id__icontains=search) | Q(project__customer_name__icontains=search) |
+            Q(project__segment__name__icontains=search) | Q(project__team_lead__name__icontains=search) |
+            Q(assignee__name__icontains=search) | Q(activity_name__icontains=search)
+        )
+    if params.getlist('segment'):
+        activities_qs = activities_qs.filter(project__segment_id__in=params.getlist('segment'))
+    if params.getlist('team_lead'):
+        activities_qs = activities_qs.filter(project__team_lead_id__in=params.getlist('team_lead'))
+    if params.getlist('assignee'):
+        activities_qs = activities_qs.filter(assignee_id__in=params.getlist('assignee'))
+    if params.get('f_project'):
+        activities_qs = activities_qs.filter(project__project_id__icontains=params['f_project'])
+    if params.get('f_activity'):
+        activities_qs = activities_qs.filter(activity_name__icontains=params['f_activity'])
+    if params.get('f_assignee'):
+        activities_qs = activities_qs.filter(assignee__name__icontains=params['f_assignee'])
+    if params.get('f_start'):
+        activities_qs = activities_qs.filter(start_date__gte=_parse_iso(params['f_start'], 'f_start'))
+    if params.get('f_end'):
+        activities_qs = activities_qs.filter(end_date__lte=_parse_iso(params['f_end'], 'f_end'))
+    return activities_qs
+
+def is_filtered(params):
+    return any(params.get(name) for name in (
+        'q', 'segment', 'team_lead', 'assignee', 'f_project', 'f_activity', 'f_assignee', 'f_start', 'f_end'
+    ))
+
+def _parse_iso(value, name):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be a YYYY-MM-DD date.")
+
+def _iso(day):
+    return day.isoformat() if day else None
+
+def _clip_intervals(intervals, window_start, window_end):
+    """Coalesced parts of (start, end) intervals that fall inside the window."""
+    clipped = [
+        (max(start, window_start), min(end, window_end))
+        for start, end in intervals
+        if start and end and start <= window_end and end >= window_start
+    ]
+    return [[_iso(start), _iso(end)] for start, end in coalesce_intervals(clipped)]
+
+# --- Rows ---
+
+def _group_key(grouping):
+    return 'project_id' if grouping == 'project' else 'assignee_id'
+
+def group_rows(activities_qs, grouping, params, window_start, window_end, offset, limit):
+    """
+    One page of group header rows with their activity counts, overall span and
+    the merged activity intervals inside the window (for the summary bar).
+    """
+    key = _group_key(grouping)
+    stats = {
+        row[key]: row for row in
+        activities_qs.order_by().values(key).annotate(count=Count('id'), first=Min('start_date'), last=Max('end_date'))
+    }
+
+    if grouping == 'project':
+        # Without filters every project gets a header, even one with no activities yet.
+        projects = Project.objects.order_by('project_id').values_list('id', 'project_id')
+        if is_filtered(params):
+            projects = projects.filter(id__in=stats.keys())
+        groups = [(pk, label) for pk, label in projects]
+    else:
+        names = dict(Employee.objects.filter(id__in=[k for k in stats if k is not None]).values_list('id', 'name'))
+        groups = sorted(((pk, names.get(pk, "Unassigned")) for pk in stats), key=lambda g: (g[1], g[0] or 0))
+
+    page = groups[offset:offset + limit]
+    page_keys = [pk for pk, _ in page if pk is not None]
+    spans = defaultdict(list)
+    in_window = activities_qs.filter(start_date__lte=window_end, end_date__gte=window_start).order_by()
+    if grouping == 'engineer' and any(pk is None for pk, _ in page):
+        in_window = in_window.filter(Q(assignee_id__in=page_keys) | Q(assignee__isnull=True))
+    else:
+        in_window = in_window.filter(**{f'{key}__in': page_keys})
+    for group_pk, start_date, end_date in in_window.values_list(key, 'start_date', 'end_date'):
+        spans[group_pk].append((start_date, end_date))
+
+    rows = []
+    for pk, label in page:
+        group_stats = stats.get(pk, {})
+        rows.append({
+            'type': 'group',
+            'id': pk if pk is not None else UNASSIGNED,
+            'label': label,
+            'count': group_stats.get('count', 0),
+            'start_date': _iso(group_stats.get('first')),
+            'end_date': _iso(group_stats.get('last')),
+            'spans': _clip_intervals(spans.get(pk, []), window_start, window_end),
+        })
+    return rows, len(groups)
+
+def _order_activities(activities_qs, grouping, sort):
+    if grouping == 'none' and sort == 'desc':
+        return activities_qs.order_by('-start_date', '-id')
+    return activities_qs.order_by('start_date', 'id')
+
+def activity_rows(activities_qs, overlap_base_qs, grouping, sort, window_start, window_end, offset, limit):
+    """
+    One page of activity rows. Each row carries the windowed intervals on which
+    its assignee also works another activity of the chart (an over-allocation).
+    """
+    total = activities_qs.count()
+    page = list(
+        _order_activities(activities_qs, grouping, sort)
+        .select_related('project__segment', 'project__team_lead', 'assignee')[offset:offset + limit]
+    )
+
+    # Every chart activity of the page's assignees that touches the window.
+    assignee_ids = {act.assignee_id for act in page if act.assignee_id}
+    by_assignee = defaultdict(list)
+    others = (
+        overlap_base_qs.filter(assignee_id__in=assignee_ids, start_date__lte=window_end, end_date__gte=window_start)
+        .order_by().values_list('id', 'assignee_id', 'start_date', 'end_date')
+    )
+    for pk, assignee_id, start_date, end_date in others:
+        by_assignee[assignee_id].append((pk, start_date, end_date))
+
+    rows = []
+    for act in page:
+        overlaps = []
+        if act.assignee_id and act.end_date:
+            overlaps = [
+                (max(act.start_date, start_date), min(act.end_date, end_date))
+                for pk, start_date, end_date in by_assignee.get(act.assignee_id, [])
+                if pk != act.pk and start_date <= act.end_date and end_date >= act.start_date
+            ]
+        project = act.project
+        rows.append({
+            'type': 'activity',
+            'pk': act.pk,
+            'name': act.activity_name,
+            'project_code': project.project_id,
+            'customer': project.customer_name,
+            'segment': project.segment.name if project.segment else '',
+            'team_lead': project.team_lead.name if project.team_lead else '',
+            'assignee': act.assignee.name if act.assignee else None,
+            'assignee_id': act.assignee_id,
+            'start_date': _iso(act.start_date),
+            'end_date': _iso(act.end_date),
+            'overlaps': _clip_intervals(overlaps, window_start, window_end),
+            'edit_url': reverse('planner_edit_activity', args=[act.pk]),
+            'delete_url': reverse('planner_delete_activity', args=[act.pk]),
+        })
+    return rows, total
+
+# --- Window data ---
+
+def window_holidays(window_start, window_end):
+    return {
+        day.isoformat(): description for day, description in
+        Holiday.objects.filter(date__range=(window_start, window_end)).values_list('date', 'description')
+    }
+
+def window_leaves(employee_ids, window_start, window_end):
+    """
+    Leave of the given employees inside the window as merged intervals:
+    {employee id: [[start, end], ...]}, sorted and disjoint.
+    """
+    intervals = defaultdict(list)
+    leaves_qs = (
+        Leave.objects.filter(employee_id__in=employee_ids, start_date__lte=window_end, end_date__gte=window_start)
+        .order_by().values_list('employee_id', 'start_date', 'end_date')
+    )
+    for employee_id, start_date, end_date in leaves_qs:
+        intervals[employee_id].append((start_date, end_date))
+    return {
+        employee_id: _clip_intervals(employee_intervals, window_start, window_end)
+        for employee_id, employee_intervals in intervals.items()
+    }
+
+def build_gantt_payload(params, today):
+    """
+    Gantt API response for one row page and one date window.
+
+    Params: project, group_by, sort, group (a group id to list its activities),
+    start/end (the window, at most MAX_WINDOW_DAYS), offset/limit and the
+    planner filters. Raises ValueError on bad parameters.
+    """
+    project_id = parse_int(params['project'], 'project', 1, 2 ** 63 - 1) if params.get('project') else None
+    grouping = 'none' if project_id else params.get('group_by', 'project')
+    if grouping not in GROUPINGS:
+        grouping = 'project'
+    sort = 'desc' if params.get('sort') == 'desc' else 'asc'
+    offset = parse_int(params.get('offset') or 0, 'offset', 0, 2 ** 31)
+    limit = parse_int(params.get('limit') or DEFAULT_PAGE_SIZE, 'limit', 0, MAX_PAGE_SIZE)
+
+    window_start = _parse_iso(params.get('start') or today.isoformat(), 'start')
+    window_end = _parse_iso(params.get('end') or (window_start + timedelta(days=WINDOW_DAYS - 1)).isoformat(), 'end')
+    if window_end < window_start:
+        raise ValueError("'end' must not be before 'start'.")
+    if (window_end - window_start).days + 1 > MAX_WINDOW_DAYS:
+        raise ValueError(f"The date window may span at most {MAX_WINDOW_DAYS} days.")
+
+    chart_qs = base_activities(project_id)
+    activities_qs = filter_activities(chart_qs, params)
+    group = params.get('group')
+
+    if grouping != 'none' and not group:
+        rows, total = group_rows(activities_qs, grouping, params, window_start, window_end, offset, limit)
+    else:
+        if group:
+            if group == UNASSIGNED and grouping == 'engineer':
+                activities_qs = activities_qs.filter(assignee__isnull=True)
+            else:
+                group_pk = parse_int(group, 'group', 1, 2 ** 63 - 1)
+                activities_qs = activities_qs.filter(**{_group_key(grouping): group_pk})
+        rows, total = activity_rows(activities_qs, chart_qs, grouping, sort, window_start, window_end, offset, limit)
+
+    assignee_ids = {row['assignee_id'] for row in rows if row.get('assignee_id')}
+    return {
+        'start': window_start.isoformat(),
+        'end': window_end.isoformat(),
+        'offset': offset,
+        'limit': limit,
+        'total': total,
+        'rows': rows,
+        'holidays': window_holidays(window_start, window_end),
+        'leaves': window_leaves(assignee_ids, window_start, window_end),
+    }
@@ -0,0 +1,111 @@
+# planner/leave_engine.py
+
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import timedelta
+
+import numpy as np
+
+from .models import Leave
+
+def coalesce_intervals(intervals):
+    """
+    Merges overlapping or touching (start, end) date intervals.
+    Returns a sorted list of disjoint intervals.
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1] + timedelta(days=1):
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+class LeaveEngine:
+    """
+    Coalesced leave intervals per employee.
+
+    Overlapping Leave rows for the same employee are merged first, so a day
+    is never counted twice. Man-days are working days measured with the
+    WorkingCalendar index, never by walking individual dates.
+    """
+
+    def __init__(self, work_calendar, leaves):
+        """
+        Args:
+            work_calendar (WorkingCalendar): Calendar used to count working days.
+            leaves (iterable): (employee_id, designation, start_date, end_date) tuples.
+        """
+        self.work_calendar = work_calendar
+        raw = defaultdict(list)
+        self.designations = {}
+        for employee_id, designation, start_date, end_date in leaves:
+            if start_date > end_date:
+                continue
+            raw[employee_id].append((start_date, end_date))
+            self.designations[employee_id] = designation
+        self.intervals = {emp_id: coalesce_intervals(ivs) for emp_id, ivs in raw.items()}
+        self._starts = {emp_id: [iv[0] for iv in ivs] for emp_id, ivs in self.intervals.items()}
+
+    @classmethod
+    def load(cls, work_calendar, start_date=None, end_date=None, employee_ids=None):
+        """Builds the engine from Leave rows, optionally limited to a window and to employees."""
+        leaves_qs = Leave.objects.all()
+        if start_date:
+            leaves_qs = leaves_qs.filter(end_date__gte=start_date)
+        if end_date:
+            leaves_qs = leaves_qs.filter(start_date__lte=end_date)
+        if employee_ids is not None:
+            leaves_qs = leaves_qs.filter(employee_id__in=employee_ids)
+        rows = leaves_qs.values_list('employee_id', 'employee__designation', 'start_date', 'end_date').order_by()
+        return cls(work_calendar, rows.iterator())
+
+    def employee_intervals(self, employee_id, start_date, end_date):
+        """Coalesced leave intervals of one employee that overlap [start_date, end_date]."""
+        intervals = self.intervals.get(employee_id, [])
+        # Intervals are disjoint and sorted, so ends are sorted too; skip those ending before start_date.
+        first = bisect_left(intervals, (start_date,)) - 1
+        first = max(first, 0)
+        last = bisect_right(self._starts.get(employee_id, []), end_date)
+        return [iv for iv in intervals[first:last] if iv[1] >= start_date]
+
+    def employee_man_days(self, employee_id, start_date, end_date):
+        """Working days the employee is on leave within [start_date, end_date]."""
+        return sum(
+            self.work_calendar.working_days_between(max(s, start_date), min(e, end_date))
+            for s, e in self.employee_intervals(employee_id, start_date, end_date)
+        )
+
+    def man_days_by_period(self, periods):
+        """
+        Leave man-days per period for every employee, in one sorted sweep.
+        Periods must be sorted and non-overlapping dicts with 'start'/'end'.
+        Returns {employee_id: np.array of len(periods)}.
+        """
+        period_starts = [p['start'] for p in periods]
+        period_ends = [p['end'] for p in periods]
+        result = {}
+        for employee_id, intervals in self.intervals.items():
+            totals = np.zeros(len(periods))
+            # Both lists are sorted, so each interval resumes where the previous one left off.
+            idx = 0
+            for start, end in intervals:
+                idx = max(idx, bisect_left(period_ends, start))
+                j = idx
+                while j < len(periods) and period_starts[j] <= end:
+                    totals[j] += self.work_calendar.working_days_between(
+                        max(start, period_starts[j]), min(end, period_ends[j])
+                    )
+                    j += 1
+            result[employee_id] = totals
+        return result
+
+    def designation_man_days(self, periods, designations):
+        """Leave man-days per period summed per designation: {designation: np.array}."""
+        totals = {des: np.zeros(len(periods)) for des in designations}
+        for employee_id, days in self.man_days_by_period(periods).items():
+            designation = self.designations[employee_id]
+            if designation in totals:
+                totals[designation] += days
+        return totals
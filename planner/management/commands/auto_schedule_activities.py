@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.models import Activity, Employee
+from planner.scheduler import auto_schedule_activities
+
+
+class Command(BaseCommand):
+    help = "Assigns employees and start dates to unassigned activities without double-booking anyone."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--project', type=int, action='append', help="Only activities of this project pk (repeatable).")
+        parser.add_argument(
+            '--designation', default='ENGINEER', choices=[code for code, _ in Employee.DESIGNATION_CHOICES],
+            help="Designation of the employees to assign (default ENGINEER).",
+        )
+        parser.add_argument('--improve', type=int, default=0, help="Local search rounds after the greedy pass.")
+        parser.add_argument('--dry-run', action='store_true', help="Plan and report without saving.")
+
+    def handle(self, *args, **options):
+        activities_qs = Activity.objects.all()
+        if options['project']:
+            activities_qs = activities_qs.filter(project_id__in=options['project'])
+        if not Employee.objects.filter(is_active=True, designation=options['designation']).exists():
+            raise CommandError(f"There are no active employees with designation {options['designation']}.")
+
+        result = auto_schedule_activities(
+            activities_qs, designation=options['designation'],
+            improve_rounds=options['improve'], dry_run=options['dry_run'],
+        )
+        for activity_id, employee_id, start_date, end_date in result['plan']:
+            self.stdout.write(f"Activity {activity_id}: employee {employee_id}, {start_date} to {end_date}")
+        verb = "Planned" if options['dry_run'] else "Scheduled"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {result['scheduled']} of {result['unassigned']} unassigned activities; "
+            f"total delay {result['total_delay_days']} days, max {result['max_delay_days']} days, "
+            f"last finish {result['finish_date']}."
+        ))
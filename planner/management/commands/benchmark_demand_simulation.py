@@ -0,0 +1,63 @@
+import random
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from planner.capacity_engine import DESIGNATIONS, CapacityEngine, build_horizon, build_periods
+from planner.demand_simulation import DemandSimulation, ForecastSet, PERCENTILES
+from planner.leave_engine import LeaveEngine
+from planner.models import CapacitySettings
+from planner.utils import WorkingCalendar
+
+
+class Command(BaseCommand):
+    help = "Times the Monte Carlo demand simulation on a synthetic pipeline (nothing is read from or written to the database)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--trials', type=int, default=10_000)
+        parser.add_argument('--opportunities', type=int, default=500)
+        parser.add_argument('--activities', type=int, default=5000)
+        parser.add_argument('--view-type', default='month', choices=['week', 'month', 'quarter'])
+        parser.add_argument('--workers', type=int, default=1, help="Worker processes for the trial blocks.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        today = date.today()
+        start_date, end_date = build_horizon(today)
+        work_calendar = WorkingCalendar(today + timedelta(days=rnd.randint(0, 700)) for _ in range(30))
+        capacity_settings = {des: CapacitySettings(designation=des, efficiency_loss_factor=10) for des in DESIGNATIONS}
+        engine = CapacityEngine(start_date, end_date, work_calendar, 8, capacity_settings,
+                                {'ENGINEER': 200, 'TEAM_LEAD': 30, 'MANAGER': 10}, LeaveEngine(work_calendar, []))
+        for _ in range(options['activities']):
+            start = today + timedelta(days=rnd.randint(-30, 365))
+            engine.add_activity(rnd.choice(DESIGNATIONS), None, start, start + timedelta(days=rnd.randint(1, 60)))
+        rows = []
+        for i in range(options['opportunities']):
+            start = today + timedelta(days=rnd.randint(0, 365))
+            rows.append((f'OPP-{i}', rnd.choice([10, 25, 50, 75, 90]), start, start + timedelta(days=rnd.randint(30, 180)),
+                         rnd.uniform(2, 16), rnd.uniform(0, 4), rnd.uniform(0, 2)))
+
+        started = time.perf_counter()
+        rollup = engine.rollup(build_periods(options['view_type'], today))
+        forecasts = ForecastSet(start_date, rows)
+        simulation = DemandSimulation(rollup, forecasts)
+        prepared = time.perf_counter()
+        samples = simulation.run(options['trials'], options['seed'], options['workers'])
+        simulated = time.perf_counter()
+        percentiles = {des: np.percentile(samples[des], PERCENTILES, axis=0) for des in DESIGNATIONS}
+        finished = time.perf_counter()
+
+        self.stdout.write(
+            f"{options['trials']} trials, {len(forecasts)} opportunities, {len(rollup.periods)} periods "
+            f"({options['view_type']}), {options['workers']} worker(s)"
+        )
+        self.stdout.write(f"Prepare:     {prepared - started:.3f}s")
+        self.stdout.write(f"Simulate:    {simulated - prepared:.3f}s")
+        self.stdout.write(f"Percentiles: {finished - simulated:.3f}s")
+        p50, p80, p95 = percentiles['ENGINEER'].max(axis=1)
+        self.stdout.write(self.style.SUCCESS(
+            f"Peak engineer headcount: P50 {p50:.1f}, P80 {p80:.1f}, P95 {p95:.1f}."
+        ))
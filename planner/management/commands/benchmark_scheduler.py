@@ -0,0 +1,58 @@
+import random
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from planner.scheduler import ActivityScheduler, build_timelines
+
+
+class Command(BaseCommand):
+    help = "Times the auto-scheduler on a synthetic workload (nothing is read from or written to the database)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--activities', type=int, default=5000)
+        parser.add_argument('--employees', type=int, default=300)
+        parser.add_argument('--improve', type=int, default=1, help="Local search rounds to time after the greedy pass.")
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options['seed'])
+        today = date.today()
+        employee_ids = list(range(1, options['employees'] + 1))
+        holidays = [today + timedelta(days=rnd.randint(0, 700)) for _ in range(30)]
+        bookings = []
+        for employee_id in employee_ids:
+            for _ in range(rnd.randint(0, 10)):
+                start = today + timedelta(days=rnd.randint(-50, 400))
+                bookings.append((employee_id, start, start + timedelta(days=rnd.randint(1, 40))))
+        leaves = []
+        for _ in range(2 * len(employee_ids)):
+            start = today + timedelta(days=rnd.randint(0, 500))
+            leaves.append((rnd.choice(employee_ids), start, start + timedelta(days=rnd.randint(0, 6))))
+        activities = [
+            (pk, today + timedelta(days=rnd.randint(-30, 200)), rnd.randint(1, 30))
+            for pk in range(1, options['activities'] + 1)
+        ]
+
+        started = time.perf_counter()
+        timelines = build_timelines(employee_ids, bookings, leaves, holidays)
+        built = time.perf_counter()
+        scheduler = ActivityScheduler(timelines, today)
+        scheduler.schedule(activities)
+        greedy = time.perf_counter()
+        moved = scheduler.improve(rounds=options['improve']) if options['improve'] else 0
+        improved = time.perf_counter()
+
+        stats = scheduler.stats()
+        self.stdout.write(
+            f"{len(activities)} activities, {len(employee_ids)} employees, "
+            f"{len(bookings)} existing bookings, {len(leaves)} leaves"
+        )
+        self.stdout.write(f"Build timelines: {built - started:.3f}s")
+        self.stdout.write(f"Greedy pass:     {greedy - built:.3f}s")
+        self.stdout.write(f"Local search:    {improved - greedy:.3f}s ({moved} moves)")
+        self.stdout.write(self.style.SUCCESS(
+            f"Scheduled {stats['scheduled']}; total delay {stats['total_delay_days']} days, "
+            f"max {stats['max_delay_days']} days, last finish {stats['finish_date']}."
+        ))
@@ -0,0 +1,24 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from planner.capacity_snapshots import build_capacity_snapshots, refresh_stale_snapshots
+
+
+class Command(BaseCommand):
+    help = "Precomputes the week, month and quarter capacity plan reports and stores them as snapshots."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--watch', type=int, default=0, metavar='SECONDS',
+                            help="Keep running and rebuild stale snapshots every SECONDS (for a dedicated worker).")
+
+    def handle(self, *args, **options):
+        if options['watch'] > 0:
+            self.stdout.write(f"Refreshing stale capacity snapshots every {options['watch']}s.")
+            while True:
+                if refresh_stale_snapshots():
+                    self.stdout.write("Capacity snapshots rebuilt.")
+                time.sleep(options['watch'])
+        for snapshot in build_capacity_snapshots():
+            self.stdout.write(f"{snapshot.view_type}: data version {snapshot.data_version}, {snapshot.report_date}")
+        self.stdout.write(self.style.SUCCESS("Capacity snapshots rebuilt."))
@@ -0,0 +1,41 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.capacity_engine import VIEW_TYPES
+from planner.models import Scenario
+from planner.scenarios import compare_scenarios
+
+
+class Command(BaseCommand):
+    help = "Prints the peak headcount shortage per designation of the baseline and the named scenarios (all by default)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help="Scenario names.")
+        parser.add_argument('--view-type', default='month', choices=VIEW_TYPES)
+        parser.add_argument('--workers', type=int, default=1, help="Worker processes to evaluate the scenarios in.")
+
+    def handle(self, *args, **options):
+        scenarios = Scenario.objects.all()
+        if options['names']:
+            scenarios = scenarios.filter(name__in=options['names'])
+            missing = set(options['names']) - set(scenarios.values_list('name', flat=True))
+            if missing:
+                raise CommandError(f"Unknown scenario(s): {', '.join(sorted(missing))}")
+        started = time.perf_counter()
+        try:
+            result = compare_scenarios(list(scenarios.values_list('id', flat=True)), options['view_type'],
+                                       date.today(), options['workers'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+
+        for scenario in result['scenarios']:
+            shortages = ', '.join(
+                f"{designation['designation']} {designation['peak_shortage']:.1f}" for designation in scenario['designations']
+            )
+            self.stdout.write(f"{scenario['name']}: peak shortage {shortages}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Compared {len(result['scenarios'])} plan(s) over {len(result['periods'])} {result['view_type']} periods in {elapsed:.2f}s."
+        ))
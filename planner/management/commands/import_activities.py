@@ -0,0 +1,26 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.activity_import import import_activity_file
+
+
+class Command(BaseCommand):
+    help = "Bulk-imports activities from a CSV or JSON plan (project code, activity name, assignee, start date, duration, remark)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to a .csv or .json file.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as f:
+                result = import_activity_file(f, path)
+        except (OSError, ValueError, csv.Error) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Inserted {result['inserted']} activities, rejected {result['rejected']}."
+        ))
@@ -0,0 +1,31 @@
+import csv
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.forecast_import import import_forecast_file
+
+
+class Command(BaseCommand):
+    help = "Streams a CSV or XLSX sales forecast extract into the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Path to a .csv or .xlsx file.")
+        parser.add_argument(
+            '--replace', action='store_true',
+            help="Delete forecasts that are not in the file (by default they are kept).",
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with open(path, 'rb') as f:
+                result = import_forecast_file(f, path, delete_missing=options['replace'])
+        except (OSError, ValueError, csv.Error) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Inserted {result['inserted']}, updated {result['updated']}, "
+            f"deleted {result['deleted']}, rejected {result['rejected']} sales forecasts."
+        ))
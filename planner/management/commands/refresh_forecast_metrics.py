@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from planner.forecast_metrics import refresh_forecast_metrics
+
+
+class Command(BaseCommand):
+    help = "Recomputes the stored ProjectType, effort and daily hours of every SalesForecast."
+
+    def handle(self, *args, **options):
+        updated = refresh_forecast_metrics()
+        self.stdout.write(self.style.SUCCESS(f"Refreshed metrics for {updated} sales forecasts."))
@@ -0,0 +1,24 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from planner.rescheduling import reschedule_activities
+
+
+class Command(BaseCommand):
+    help = "Recomputes activity end dates from the current holidays and leave, writing only the ones that changed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help="Only activities running on or after this date (YYYY-MM-DD).")
+        parser.add_argument('--to', dest='end', help="Only activities starting on or before this date (YYYY-MM-DD).")
+        parser.add_argument('--employee', type=int, action='append', help="Only this assignee's activities (repeatable).")
+
+    def handle(self, *args, **options):
+        try:
+            start_date = date.fromisoformat(options['start']) if options['start'] else None
+            end_date = date.fromisoformat(options['end']) if options['end'] else None
+        except ValueError:
+            raise CommandError("--from and --to must be YYYY-MM-DD dates.")
+
+        changed = reschedule_activities(start_date, end_date, options['employee'])
+        self.stdout.write(self.style.SUCCESS(f"Updated the end date of {len(changed)} activities."))
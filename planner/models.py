@@ -3,7 +3,7 @@
 from django.db import models
 from django.utils import timezone
 from datetime import timedelta
-from .utils import calculate_end_date
+from .utils import calculate_end_date, WorkingCalendar
 
 class Segment(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -53,13 +53,15 @@ class Activity(models.Model):
     start_date = models.DateField(default=timezone.now)
     duration = models.PositiveIntegerField(default=1, help_text="Duration in working days")
     end_date = models.DateField(blank=True, null=True)
+    # Finish-to-start: this activity cannot start before each predecessor has finished.
+    predecessors = models.ManyToManyField('self', symmetrical=False, related_name='successors', blank=True)
     
     def __str__(self):
         return f"{self.project.project_id} - {self.activity_name}"
         
     def save(self, *args, **kwargs):
         # 1. Get Global Holidays
-        holidays = list(Holiday.objects.values_list('date', flat=True))
+        holidays = WorkingCalendar(Holiday.objects.values_list('date', flat=True))
         
         # 2. Get Assignee Leaves (if assigned)
         assignee_leaves = []
@@ -79,6 +81,7 @@ class Activity(models.Model):
         
     class Meta:
         ordering = ['start_date']
+        indexes = [models.Index(fields=['start_date', 'end_date'])]
 
 class Employee(models.Model):
     DESIGNATION_CHOICES = [
@@ -137,10 +140,28 @@ class SalesForecast(models.Model):
     solution = models.CharField(max_length=200, blank=True)
     start_date = models.DateField(null=True, blank=True)
     end_date = models.DateField(null=True, blank=True)
+
+    # Derived at import time and refreshed in bulk by forecast_metrics when
+    # brackets, involvement percentages, holidays or working hours change.
+    project_type = models.ForeignKey(ProjectType, on_delete=models.SET_NULL, null=True, blank=True, related_name='sales_forecasts')
+    effort_days = models.FloatField(default=0, help_text="Effort in working days from the project type's brackets.")
+    window_working_days = models.PositiveIntegerField(default=0)
+    daily_engineer_hours = models.FloatField(default=0)
+    daily_team_lead_hours = models.FloatField(default=0)
+    daily_manager_hours = models.FloatField(default=0)
+
     def __str__(self):
         return self.opportunity
+
+    def save(self, *args, **kwargs):
+        # Keep the derived effort columns in step with single-row saves;
+        # bulk paths use forecast_metrics directly with one shared context.
+        from .forecast_metrics import ForecastMetricsContext, apply_forecast_metrics
+        apply_forecast_metrics(self, ForecastMetricsContext())
+        super().save(*args, **kwargs)
     class Meta:
         ordering = ['opportunity']
+        indexes = [models.Index(fields=['start_date', 'end_date'])]
 
 class EffortBracket(models.Model):
     project_type = models.ForeignKey(ProjectType, on_delete=models.CASCADE, related_name='effort_brackets')
@@ -152,4 +173,78 @@ class EffortBracket(models.Model):
 
     class Meta:
         ordering = ['project_value']
-        unique_together = ('project_type', 'project_value')
\ No newline at end of file
+        unique_together = ('project_type', 'project_value')
+
+class PlanningDataVersion(models.Model):
+    """Single row bumped whenever planning data changes; views derive their ETag/Last-Modified from it."""
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Planning data version {self.version}"
+
+class CapacitySnapshot(models.Model):
+    """Latest precomputed capacity plan report of one view type."""
+    view_type = models.CharField(max_length=10, unique=True)
+    report_date = models.DateField(help_text="The date the report's periods were built for.")
+    data_version = models.PositiveBigIntegerField(help_text="Planning data version the report was computed from.")
+    data = models.JSONField()
+    computed_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"Capacity snapshot ({self.view_type}) at {self.computed_at:%Y-%m-%d %H:%M}"
+
+class Scenario(models.Model):
+    """A saved what-if: overrides applied in memory on top of the live planning data, never written to it."""
+    name = models.CharField(max_length=100, unique=True)
+    description = models.TextField(blank=True)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        self.updated_at = timezone.now()
+        super().save(*args, **kwargs)
+
+    class Meta:
+        ordering = ['name']
+
+class ScenarioHeadcountChange(models.Model):
+    scenario = models.ForeignKey(Scenario, on_delete=models.CASCADE, related_name='headcount_changes')
+    designation = models.CharField(max_length=10, choices=Employee.DESIGNATION_CHOICES)
+    effective_date = models.DateField(help_text="First day the change applies.")
+    delta = models.IntegerField(help_text="People added (positive) or leaving (negative) from the effective date.")
+
+    def __str__(self):
+        return f"{self.scenario}: {self.delta:+d} {self.get_designation_display()} from {self.effective_date}"
+
+    class Meta:
+        ordering = ['effective_date']
+
+class ScenarioForecastChange(models.Model):
+    scenario = models.ForeignKey(Scenario, on_delete=models.CASCADE, related_name='forecast_changes')
+    forecast = models.ForeignKey(SalesForecast, on_delete=models.CASCADE, related_name='scenario_changes')
+    shift_days = models.IntegerField(default=0, help_text="Calendar days the forecast window moves (negative: earlier).")
+    probability = models.FloatField(null=True, blank=True, help_text="Win probability override in percent; blank keeps the forecast's own.")
+
+    def __str__(self):
+        return f"{self.scenario}: {self.forecast}"
+
+    class Meta:
+        unique_together = ('scenario', 'forecast')
+
+class ScenarioCapacitySettings(models.Model):
+    """Per-designation CapacitySettings tweaks; blank fields keep the live value."""
+    scenario = models.ForeignKey(Scenario, on_delete=models.CASCADE, related_name='capacity_settings')
+    designation = models.CharField(max_length=10, choices=Employee.DESIGNATION_CHOICES)
+    monthly_meeting_hours = models.FloatField(null=True, blank=True)
+    monthly_leave_hours = models.FloatField(null=True, blank=True)
+    efficiency_loss_factor = models.FloatField(null=True, blank=True, help_text="Percentage, e.g., 10 for 10%")
+
+    def __str__(self):
+        return f"{self.scenario}: {self.get_designation_display()} settings"
+
+    class Meta:
+        verbose_name_plural = "Scenario capacity settings"
+        unique_together = ('scenario', 'designation')
@@ -0,0 +1,72 @@
+# planner/rescheduling.py
+
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Q
+
+from .availability import employee_calendars
+from .dependencies import propagate_dependencies
+from .models import Activity, Holiday, Leave
+from .utils import WorkingCalendar
+from .versioning import bump_planning_version, coalesced_version_bumps
+
+BULK_BATCH_SIZE = 1000
+
+def as_date(value):
+    """Model instances created from form strings (e.g. Holiday get_or_create) may still hold an ISO string."""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value
+
+def affected_activities(start_date=None, end_date=None, employee_ids=None):
+    """
+    Activities whose end date can depend on non-working days in [start_date, end_date]:
+    those whose current window overlaps it, optionally only of some assignees.
+    Without a range every activity (of those assignees) is returned.
+    """
+    activities_qs = Activity.objects.all()
+    if end_date:
+        activities_qs = activities_qs.filter(start_date__lte=end_date)
+    if start_date:
+        activities_qs = activities_qs.filter(Q(end_date__gte=start_date) | Q(end_date__isnull=True))
+    if employee_ids is not None:
+        activities_qs = activities_qs.filter(assignee_id__in=employee_ids)
+    return activities_qs
+
+def reschedule_activities(start_date=None, end_date=None, employee_ids=None):
+    """
+    Recomputes end dates after holidays or leave changed in [start_date, end_date]
+    (for leave, pass the employee). Every affected activity is evaluated against
+    one shared holiday calendar plus its assignee's leave, only the rows whose
+    end date changes are written with bulk_update in one transaction, and
+    successors of moved activities are then pushed along their dependencies.
+    Returns the ids whose end date changed.
+    """
+    rows = list(
+        affected_activities(start_date, end_date, employee_ids)
+        .order_by().only('id', 'start_date', 'duration', 'end_date', 'assignee_id')
+    )
+    if not rows:
+        return []
+
+    work_calendar = WorkingCalendar(Holiday.objects.values_list('date', flat=True))
+    assignee_ids = {activity.assignee_id for activity in rows if activity.assignee_id}
+    leaves = Leave.objects.filter(employee_id__in=assignee_ids).order_by().values_list('employee_id', 'start_date', 'end_date')
+    calendars = employee_calendars(work_calendar, assignee_ids, leaves.iterator())
+
+    changed = []
+    for activity in rows:
+        calendar = calendars.get(activity.assignee_id, work_calendar)
+        new_end = calendar.nth_working_day(activity.start_date, activity.duration) if activity.duration > 0 else activity.start_date
+        if new_end != activity.end_date:
+            activity.end_date = new_end
+            changed.append(activity)
+
+    if changed:
+        with coalesced_version_bumps(), transaction.atomic():
+            Activity.objects.bulk_update(changed, ['end_date'], batch_size=BULK_BATCH_SIZE)
+            # bulk_update sends no signals.
+            bump_planning_version()
+            propagate_dependencies([activity.pk for activity in changed])
+    return [activity.pk for activity in changed]
@@ -0,0 +1,320 @@
+# planner/scenarios.py
+
+import copy
+import math
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+from django.db import transaction
+
+from .capacity_engine import DESIGNATIONS, VIEW_TYPES, CapacityRollup, get_capacity_engine, build_periods
+from .demand_simulation import DemandSimulation, ForecastSet
+from .models import (CapacitySettings, Employee, SalesForecast, Scenario, ScenarioCapacitySettings,
+                     ScenarioForecastChange, ScenarioHeadcountChange)
+from .utils import parse_int
+
+MAX_COMPARED_SCENARIOS = 8
+# Bounds of the saved overrides; a forecast shift is in calendar days.
+MAX_FORECAST_SHIFT_DAYS = 3660
+MAX_HEADCOUNT_CHANGE = 10_000
+SETTINGS_FIELDS = ('monthly_meeting_hours', 'monthly_leave_hours', 'efficiency_loss_factor')
+
+# Overrides of the live data as it is.
+BASELINE = {'id': None, 'name': 'Baseline', 'headcount': [], 'forecasts': {}, 'capacity_settings': {}}
+
+def scenario_overrides(scenario):
+    """
+    The overrides of a saved Scenario as plain, picklable data (prefetch its
+    related rows). Raises ValueError if a change is out of range (e.g. entered in the admin).
+    """
+    out_of_range = [c for c in scenario.headcount_changes.all() if abs(c.delta) > MAX_HEADCOUNT_CHANGE]
+    out_of_range += [c for c in scenario.forecast_changes.all() if abs(c.shift_days) > MAX_FORECAST_SHIFT_DAYS]
+    if out_of_range:
+        raise ValueError(
+            f"Scenario '{scenario.name}' has changes out of range (headcount change up to {MAX_HEADCOUNT_CHANGE}, "
+            f"forecast shift up to {MAX_FORECAST_SHIFT_DAYS} days)."
+        )
+    return {
+        'id': scenario.pk,
+        'name': scenario.name,
+        'headcount': [(c.designation, c.effective_date, c.delta) for c in scenario.headcount_changes.all()],
+        'forecasts': {c.forecast.opportunity: (c.shift_days, c.probability) for c in scenario.forecast_changes.all()},
+        'capacity_settings': {
+            c.designation: {field: getattr(c, field) for field in SETTINGS_FIELDS if getattr(c, field) is not None}
+            for c in scenario.capacity_settings.all()
+        },
+    }
+
+class ScenarioRollup(CapacityRollup):
+    """
+    CapacityRollup whose headcount changes on given dates. Supply is counted
+    in person-working-days, so someone joining mid-period only adds the
+    working days from their start; with no changes it equals CapacityRollup.
+    """
+
+    def __init__(self, engine, periods, headcount_changes=()):
+        super().__init__(engine, periods)
+        working_prefix = engine._prefix['working_days']
+        self.person_days = {des: engine.workforce_counts[des] * self.working_days for des in DESIGNATIONS}
+        self.closing_headcount = {des: np.full(len(periods), float(engine.workforce_counts[des])) for des in DESIGNATIONS}
+        for designation, effective_date, delta in headcount_changes:
+            first = min(max((effective_date - engine.start_date).days, 0), engine.num_days)
+            from_day = np.maximum(self.starts, first)
+            self.person_days[designation] += delta * np.maximum(working_prefix[self.ends] - working_prefix[from_day], 0)
+            self.closing_headcount[designation] += delta * (self.ends > first)
+        for des in DESIGNATIONS:
+            np.maximum(self.person_days[des], 0, out=self.person_days[des])
+            np.maximum(self.closing_headcount[des], 0, out=self.closing_headcount[des])
+
+    def average_headcount(self, designation):
+        average = self.closing_headcount[designation].copy()
+        np.divide(self.person_days[designation], self.working_days, out=average, where=self.working_days > 0)
+        return average
+
+    def available_hours(self, designation):
+        """Net project hours per period after leaves, meetings and efficiency loss."""
+        settings = self.engine.capacity_settings[designation]
+        gross_hours = (self.person_days[designation] - self.leave_man_days(designation)) * self.engine.hours_per_day
+        non_project_hours = self.average_headcount(designation) * (
+            settings.monthly_meeting_hours + settings.monthly_leave_hours) * self.month_factors
+        efficiency_loss = (gross_hours - non_project_hours) * (settings.efficiency_loss_factor / 100)
+        return gross_hours - non_project_hours - efficiency_loss
+
+    def required_hours(self, designation, available_hours, required_headcount):
+        """As CapacityRollup.required_hours, with the period's average headcount."""
+        settings = self.engine.capacity_settings[designation]
+        headcount = self.average_headcount(designation)
+        avg_hours_per_person = np.zeros(len(self.periods))
+        np.divide(available_hours, headcount, out=avg_hours_per_person, where=headcount > 0)
+
+        gross = self.working_days * self.engine.hours_per_day
+        deductions = (settings.monthly_meeting_hours + settings.monthly_leave_hours) * self.month_factors
+        fallback = (gross - deductions) * (1 - settings.efficiency_loss_factor / 100)
+        avg_hours_per_person = np.where(avg_hours_per_person == 0, fallback, avg_hours_per_person)
+        return required_headcount * avg_hours_per_person
+
+class ScenarioDataset:
+    """
+    The base data every scenario is evaluated against, loaded once: a capacity
+    engine with the booked activities, holidays, leave, settings and headcount,
+    the sales forecasts and the working calendar. Scenarios only copy the parts
+    they override, so evaluating one runs no queries, and the dataset is
+    pickled once per worker process rather than once per scenario.
+    """
+
+    def __init__(self, engine, forecasts, periods):
+        self.engine = engine
+        self.forecasts = forecasts
+        self.periods = periods
+        self.forecast_index = {opportunity: i for i, opportunity in enumerate(forecasts.opportunities)}
+
+    @classmethod
+    def load(cls, view_type, today, margin_days=0):
+        """margin_days widens the forecast window so forecasts shifted into the horizon are included."""
+        engine = get_capacity_engine(today, include_forecasts=False)
+        margin = timedelta(days=margin_days)
+        forecasts = ForecastSet.load(engine.start_date - margin, engine.end_date + margin, origin=engine.start_date)
+        return cls(engine, forecasts, build_periods(view_type, today))
+
+    def _engine_for(self, capacity_settings):
+        if not capacity_settings:
+            return self.engine
+        settings = {}
+        for des in DESIGNATIONS:
+            values = {field: getattr(self.engine.capacity_settings[des], field) for field in SETTINGS_FIELDS}
+            values.update(capacity_settings.get(des, {}))
+            settings[des] = CapacitySettings(designation=des, **values)
+        # The built cube does not depend on the settings, so the copy shares it.
+        engine = copy.copy(self.engine)
+        engine.capacity_settings = settings
+        return engine
+
+    def _forecasts_for(self, changes):
+        if not changes:
+            return self.forecasts
+        base = self.forecasts
+        forecasts = copy.copy(base)
+        forecasts.probability = base.probability.copy()
+        forecasts.first_day = base.first_day.copy()
+        forecasts.last_day = base.last_day.copy()
+        forecasts.daily_hours = base.daily_hours.copy()
+        work_calendar = self.engine.work_calendar
+        for opportunity, (shift_days, probability) in changes.items():
+            i = self.forecast_index.get(opportunity)
+            if i is None:
+                continue
+            if probability is not None:
+                forecasts.probability[i] = min(max(probability / 100, 0), 1)
+            if shift_days:
+                start = base.origin + timedelta(days=int(base.first_day[i]))
+                end = base.origin + timedelta(days=int(base.last_day[i]))
+                shift = timedelta(days=shift_days)
+                before = work_calendar.working_days_between(start, end)
+                after = work_calendar.working_days_between(start + shift, end + shift)
+                forecasts.first_day[i] += shift_days
+                forecasts.last_day[i] += shift_days
+                # The same effort, spread over the working days of the moved window.
+                forecasts.daily_hours[i] *= before / after if after else 0
+        return forecasts
+
+    def evaluate(self, overrides):
+        """Capacity plan of one scenario: per designation and period, supply, demand and headcount."""
+        engine = self._engine_for(overrides['capacity_settings'])
+        rollup = ScenarioRollup(engine, self.periods, overrides['headcount'])
+        forecasts = self._forecasts_for(overrides['forecasts'])
+        simulation = DemandSimulation(rollup, forecasts)
+        all_won = simulation.required_headcount(np.ones(len(forecasts)))
+        expected = simulation.required_headcount(forecasts.probability)
+
+        designations = []
+        for des_value, des_display in Employee.DESIGNATION_CHOICES:
+            available = rollup.available_hours(des_value)
+            required_headcount = all_won[des_value][0]
+            required = rollup.required_hours(des_value, available, required_headcount)
+            headcount = rollup.closing_headcount[des_value]
+            rows = zip(self.periods, headcount.tolist(), available.tolist(), required.tolist(),
+                       required_headcount.tolist(), expected[des_value][0].tolist())
+            designations.append({
+                'designation': des_display,
+                'peak_shortage': max(float((required_headcount - headcount).max(initial=0)), 0.0),
+                'months': [
+                    {
+                        'month': period['label'],
+                        'available_headcount': available_hc,
+                        'available_hours': available_hours,
+                        'required_hours': required_hours,
+                        'variance_hours': available_hours - required_hours,
+                        'required_headcount': required_hc,
+                        'expected_headcount': expected_hc,
+                    }
+                    for period, available_hc, available_hours, required_hours, required_hc, expected_hc in rows
+                ],
+            })
+        return {'id': overrides['id'], 'name': overrides['name'], 'designations': designations}
+
+_worker_dataset = None
+
+def _init_worker(dataset):
+    global _worker_dataset
+    _worker_dataset = dataset
+
+def _evaluate_in_worker(overrides):
+    return _worker_dataset.evaluate(overrides)
+
+def evaluate_scenarios(dataset, overrides_list, workers=1):
+    """Evaluates scenarios in order; with workers > 1 across a process pool that receives the dataset once per process."""
+    if workers > 1 and len(overrides_list) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(overrides_list)),
+                                 initializer=_init_worker, initargs=(dataset,)) as pool:
+            return list(pool.map(_evaluate_in_worker, overrides_list))
+    return [dataset.evaluate(overrides) for overrides in overrides_list]
+
+def compare_scenarios(scenario_ids, view_type, today, workers=1):
+    """
+    The baseline and the given saved scenarios side by side for one view type.
+    Raises ValueError for unknown or too many scenarios.
+    """
+    if view_type not in VIEW_TYPES:
+        view_type = 'month'
+    scenario_ids = list(dict.fromkeys(scenario_ids))
+    if len(scenario_ids) > MAX_COMPARED_SCENARIOS:
+        raise ValueError(f"Compare at most {MAX_COMPARED_SCENARIOS} scenarios at a time.")
+    scenarios = Scenario.objects.filter(pk__in=scenario_ids).prefetch_related(
+        'headcount_changes', 'forecast_changes__forecast', 'capacity_settings'
+    ).in_bulk()
+    missing = [pk for pk in scenario_ids if pk not in scenarios]
+    if missing:
+        raise ValueError(f"Unknown scenario(s) {', '.join(map(str, missing))}.")
+
+    overrides_list = [BASELINE] + [scenario_overrides(scenarios[pk]) for pk in scenario_ids]
+    margin_days = max((abs(shift) for o in overrides_list for shift, _ in o['forecasts'].values()), default=0)
+    dataset = ScenarioDataset.load(view_type, today, margin_days)
+    return {
+        'view_type': view_type,
+        'periods': [period['label'] for period in dataset.periods],
+        'scenarios': evaluate_scenarios(dataset, overrides_list, workers),
+    }
+
+def _parse_number(value, name):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"'{name}' must be a number.")
+    if not math.isfinite(number):
+        raise ValueError(f"'{name}' must be a finite number.")
+    return number
+
+@transaction.atomic
+def save_scenario(data):
+    """
+    Creates or replaces (by name) a scenario from a dict: name, description,
+    headcount [{designation, effective_date, delta}], forecasts [{opportunity,
+    shift_days, probability}] and capacity_settings {designation: {field: value}}.
+    Raises ValueError, saving nothing, if any part is invalid.
+    """
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object.")
+    name = str(data.get('name') or '').strip()
+    if not name or len(name) > Scenario._meta.get_field('name').max_length:
+        raise ValueError("A scenario needs a name of at most 100 characters.")
+    designations = dict(Employee.DESIGNATION_CHOICES)
+
+    items = {key: data.get(key) or [] for key in ('headcount', 'forecasts')}
+    if any(not isinstance(rows, list) or not all(isinstance(item, dict) for item in rows) for rows in items.values()):
+        raise ValueError("'headcount' and 'forecasts' must be lists of objects.")
+    if not isinstance(data.get('capacity_settings') or {}, dict):
+        raise ValueError("'capacity_settings' must be an object keyed by designation.")
+
+    headcount = []
+    for item in items['headcount']:
+        if item.get('designation') not in designations:
+            raise ValueError(f"Unknown designation '{item.get('designation')}'.")
+        try:
+            effective_date = date.fromisoformat(str(item.get('effective_date')))
+        except ValueError:
+            raise ValueError("'effective_date' must be a YYYY-MM-DD date.")
+        headcount.append(ScenarioHeadcountChange(
+            designation=item['designation'], effective_date=effective_date,
+            delta=parse_int(item.get('delta'), 'delta', -MAX_HEADCOUNT_CHANGE, MAX_HEADCOUNT_CHANGE),
+        ))
+
+    opportunities = {str(item.get('opportunity')) for item in items['forecasts']}
+    forecast_ids = dict(SalesForecast.objects.filter(opportunity__in=opportunities).values_list('opportunity', 'id'))
+    forecast_changes = {}
+    for item in items['forecasts']:
+        opportunity = str(item.get('opportunity'))
+        if opportunity not in forecast_ids:
+            raise ValueError(f"Unknown opportunity '{opportunity}'.")
+        probability = item.get('probability')
+        if probability is not None:
+            probability = _parse_number(probability, 'probability')
+            if not 0 <= probability <= 100:
+                raise ValueError("'probability' must be between 0 and 100.")
+        forecast_changes[opportunity] = ScenarioForecastChange(
+            forecast_id=forecast_ids[opportunity],
+            shift_days=parse_int(item.get('shift_days') or 0, 'shift_days', -MAX_FORECAST_SHIFT_DAYS, MAX_FORECAST_SHIFT_DAYS),
+            probability=probability,
+        )
+
+    settings = []
+    for designation, values in (data.get('capacity_settings') or {}).items():
+        if designation not in designations or not isinstance(values, dict):
+            raise ValueError(f"Unknown designation '{designation}'.")
+        settings.append(ScenarioCapacitySettings(designation=designation, **{
+            field: _parse_number(values[field], field) for field in SETTINGS_FIELDS if values.get(field) is not None
+        }))
+
+    scenario, _ = Scenario.objects.get_or_create(name=name)
+    scenario.description = str(data.get('description') or '')
+    scenario.save()
+    scenario.headcount_changes.all().delete()
+    scenario.forecast_changes.all().delete()
+    scenario.capacity_settings.all().delete()
+    for rows in (headcount, forecast_changes.values(), settings):
+        for row in rows:
+            row.scenario = scenario
+    ScenarioHeadcountChange.objects.bulk_create(headcount)
+    ScenarioForecastChange.objects.bulk_create(forecast_changes.values())
+    ScenarioCapacitySettings.objects.bulk_create(settings)
+    return scenario
@@ -0,0 +1,366 @@
+# planner/scheduler.py
+
+import heapq
+from bisect import bisect_left, insort
+from collections import defaultdict
+from datetime import date, timedelta
+
+from django.db import transaction
+
+from .availability import employee_calendars
+from .dependencies import predecessor_links, propagate_dependencies, topological_order
+from .models import Activity, Employee, Holiday, Leave
+from .utils import WorkingCalendar
+from .versioning import bump_planning_version
+
+BULK_BATCH_SIZE = 1000
+
+class EmployeeTimeline:
+    """
+    Busy time of one employee as merged, disjoint (start, end) ordinal intervals
+    kept in two parallel sorted lists, plus their leave-aware WorkingCalendar.
+    Placements never overlap existing busy time, so a placement can be removed
+    again by cutting it out of the interval that absorbed it.
+    """
+
+    __slots__ = ('employee_id', 'calendar', 'starts', 'ends', 'booked_days')
+
+    def __init__(self, employee_id, calendar, bookings):
+        self.employee_id = employee_id
+        self.calendar = calendar
+        self.starts, self.ends = [], []
+        merged = []
+        for start, end in sorted(bookings):
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1][1] = max(merged[-1][1], end)
+            else:
+                merged.append([start, end])
+        for start, end in merged:
+            self.starts.append(start)
+            self.ends.append(end)
+        self.booked_days = sum(end - start + 1 for start, end in merged)
+
+    def lower_bound(self, not_before):
+        """A start no placement on or after not_before can precede: the end of the busy run covering it, if any."""
+        i = bisect_left(self.ends, not_before)
+        if i < len(self.starts) and self.starts[i] <= not_before:
+            return self.ends[i] + 1
+        return not_before
+
+    def earliest_slot(self, duration, not_before):
+        """(start, end) ordinals of the first run of `duration` working days free of bookings."""
+        calendar = self.calendar
+        i = bisect_left(self.ends, not_before)
+        cursor = not_before
+        while True:
+            start = calendar.nth_working_day(date.fromordinal(cursor), 1).toordinal()
+            end = calendar.nth_working_day(date.fromordinal(start), duration).toordinal() if duration > 0 else start
+            # Skip busy runs that finish before this candidate start.
+            while i < len(self.ends) and self.ends[i] < start:
+                i += 1
+            if i == len(self.starts) or end < self.starts[i]:
+                return start, end
+            cursor = self.ends[i] + 1
+            i += 1
+            # Gaps with fewer calendar days than the duration cannot fit it either.
+            while i < len(self.starts) and self.starts[i] - cursor < duration:
+                cursor = self.ends[i] + 1
+                i += 1
+
+    def book(self, start, end):
+        """Marks [start, end] busy; it must not overlap existing busy time."""
+        i = bisect_left(self.starts, start)
+        # Merge with touching neighbours so the lists stay disjoint.
+        if i > 0 and self.ends[i - 1] + 1 == start:
+            i -= 1
+            start = self.starts[i]
+            del self.starts[i], self.ends[i]
+        if i < len(self.starts) and self.starts[i] == end + 1:
+            end = self.ends[i]
+            del self.starts[i], self.ends[i]
+        insort(self.starts, start)
+        self.ends.insert(bisect_left(self.starts, start), end)
+        self.booked_days += end - start + 1
+
+    def release(self, start, end):
+        """Removes a placement booked earlier with book()."""
+        i = bisect_left(self.ends, start)
+        run_start, run_end = self.starts[i], self.ends[i]
+        del self.starts[i], self.ends[i]
+        if end < run_end:
+            self.starts.insert(i, end + 1)
+            self.ends.insert(i, run_end)
+        if run_start < start:
+            self.starts.insert(i, run_start)
+            self.ends.insert(i, start - 1)
+        self.booked_days -= end - start + 1
+
+class ActivityScheduler:
+    """
+    Assigns employees and start dates to activities without double-booking anyone.
+
+    Activities are taken in priority order (requested start, then longest first).
+    Each one goes to the employee who can start (then finish) it earliest, ties
+    going to the least-loaded employee so work is spread evenly. Employees sit
+    in a priority queue per duration keyed by their last known earliest slot,
+    so usually only the top one or two need re-checking. Optional local search
+    then re-places the most delayed activities, which can now use time freed by
+    earlier moves.
+    """
+
+    def __init__(self, timelines, not_before):
+        """
+        Args:
+            timelines (dict): employee_id -> EmployeeTimeline of the candidate employees.
+            not_before (date): Nothing is scheduled before this date (usually today).
+        """
+        self.timelines = timelines
+        self.not_before = not_before.toordinal()
+        self.placements = {}
+        # Activities other placements were floored on (their predecessors); local search never makes them finish later.
+        self.pinned = set()
+
+    def _floor(self, requested_start):
+        return max(requested_start.toordinal() if requested_start else self.not_before, self.not_before)
+
+    def _place(self, activity_id, employee_id, start, end, floor, duration):
+        self.timelines[employee_id].book(start, end)
+        self.placements[activity_id] = (employee_id, start, end, floor, duration)
+
+    def _unplace(self, activity_id):
+        employee_id, start, end, _, _ = self.placements.pop(activity_id)
+        self.timelines[employee_id].release(start, end)
+
+    def _may_finish_at(self, activity_id, old_end, new_end):
+        # Pinned activities floor other placements on their end, which must not move later.
+        return activity_id not in self.pinned or new_end <= old_end
+
+    def _best_slot(self, duration, floor, employee_ids):
+        best = None
+        for employee_id in employee_ids:
+            start, end = self.timelines[employee_id].earliest_slot(duration, floor)
+            candidate = (start, end, self.timelines[employee_id].booked_days, employee_id)
+            if best is None or candidate < best:
+                best = candidate
+        return best
+
+    def schedule(self, activities):
+        """
+        Greedy pass. activities: (activity_id, requested_start, duration) tuples.
+        Returns the number placed.
+        """
+        if not self.timelines:
+            return 0
+        queue = sorted(
+            ((self._floor(requested_start), -(duration or 0), activity_id, duration or 0)
+             for activity_id, requested_start, duration in activities)
+        )
+        # One lazy heap per duration, keyed by (start, end, load, employee) of each
+        # employee's earliest slot. Floors only rise and bookings only grow, so a
+        # stored key never overstates a slot: recompute the top until it is current.
+        heaps = {}
+        for floor, _, activity_id, duration in queue:
+            heap = heaps.get(duration)
+            if heap is None:
+                heap = heaps[duration] = [
+                    (self.not_before, self.not_before, timeline.booked_days, employee_id)
+                    for employee_id, timeline in self.timelines.items()
+                ]
+                heapq.heapify(heap)
+            while True:
+                key = heap[0]
+                timeline = self.timelines[key[3]]
+                start, end = timeline.earliest_slot(duration, floor)
+                fresh = (start, end, timeline.booked_days, key[3])
+                if fresh == key:
+                    break
+                heapq.heapreplace(heap, fresh)
+            self._place(activity_id, key[3], start, end, floor, duration)
+            heapq.heapreplace(heap, (start, end, timeline.booked_days, key[3]))
+        return len(queue)
+
+    def _cost(self, activity_ids):
+        return sum(self.placements[pk][1] - self.placements[pk][3] for pk in activity_ids)
+
+    def _try_eject(self, activity_id, blocker_id, employee_ids):
+        """
+        Gives the blocker's employee to the delayed activity and re-places the
+        blocker wherever is best. Keeps the change only if total delay drops.
+        """
+        before = {pk: self.placements[pk] for pk in (activity_id, blocker_id)}
+        old_cost = self._cost(before)
+        self._unplace(activity_id)
+        self._unplace(blocker_id)
+        employee_id, _, _, floor, duration = before[activity_id]
+        blocker_employee, _, _, blocker_floor, blocker_duration = before[blocker_id]
+
+        start, end = self.timelines[blocker_employee].earliest_slot(duration, floor)
+        if start < before[activity_id][1] and self._may_finish_at(activity_id, before[activity_id][2], end):
+            self._place(activity_id, blocker_employee, start, end, floor, duration)
+            new_start, new_end, _, new_employee = self._best_slot(blocker_duration, blocker_floor, employee_ids)
+            self._place(blocker_id, new_employee, new_start, new_end, blocker_floor, blocker_duration)
+            if self._cost(before) < old_cost:
+                return True
+            self._unplace(activity_id)
+            self._unplace(blocker_id)
+        for pk, (employee_id, start, end, floor, duration) in before.items():
+            self._place(pk, employee_id, start, end, floor, duration)
+        return False
+
+    def improve(self, rounds=1, limit=100, tries=4):
+        """
+        Local search over the `limit` most delayed activities. Each is first
+        re-placed on whichever employee now gives the earliest start; failing
+        that, up to `tries` scheduled activities at least as long sitting in its
+        way (starting between its requested start and its current start) are
+        bumped elsewhere if that lowers the total delay. Returns the number of improving moves.
+        """
+        moved = 0
+        employee_ids = list(self.timelines)
+        for _ in range(rounds):
+            delayed = sorted(self.placements, key=lambda pk: self.placements[pk][1] - self.placements[pk][3], reverse=True)
+            round_moves = 0
+            for activity_id in delayed[:limit]:
+                employee_id, start, end, floor, duration = self.placements[activity_id]
+                if start == floor:
+                    break
+                self._unplace(activity_id)
+                new_start, new_end, _, new_employee_id = self._best_slot(duration, floor, employee_ids)
+                if (new_start, new_end) < (start, end) and self._may_finish_at(activity_id, end, new_end):
+                    self._place(activity_id, new_employee_id, new_start, new_end, floor, duration)
+                    round_moves += 1
+                    continue
+                self._place(activity_id, employee_id, start, end, floor, duration)
+
+                blockers = sorted(
+                    (placement[1], pk) for pk, placement in self.placements.items()
+                    if pk != activity_id and pk not in self.pinned and floor <= placement[1] < start and placement[4] >= duration
+                )
+                for _, blocker_id in blockers[:tries]:
+                    if self._try_eject(activity_id, blocker_id, employee_ids):
+                        round_moves += 1
+                        break
+            moved += round_moves
+            if not round_moves:
+                break
+        return moved
+
+    def stats(self):
+        delays = [start - floor for _, start, _, floor, _ in self.placements.values()]
+        return {
+            'scheduled': len(self.placements),
+            'total_delay_days': sum(delays),
+            'max_delay_days': max(delays, default=0),
+            'finish_date': date.fromordinal(max(end for _, _, end, _, _ in self.placements.values())).isoformat()
+            if self.placements else None,
+        }
+
+def _dependency_waves(activity_ids, links):
+    """
+    activity_ids split into waves: each activity comes after every wave holding
+    one of its predecessors among them. Activities on a loop form the last wave.
+    """
+    predecessors = defaultdict(list)
+    for predecessor_id, successor_id in links:
+        if predecessor_id in activity_ids and successor_id in activity_ids:
+            predecessors[successor_id].append(predecessor_id)
+    wave = {}
+    for pk in topological_order(activity_ids, links):
+        wave[pk] = 1 + max((wave[p] for p in predecessors[pk]), default=-1)
+    last = max(wave.values(), default=-1) + 1
+    waves = defaultdict(list)
+    for pk in activity_ids:
+        waves[wave.get(pk, last)].append(pk)
+    return [waves[number] for number in sorted(waves)]
+
+def build_timelines(employees, bookings, leaves, holidays):
+    """employee_id -> EmployeeTimeline from (employee_id, start, end) bookings and leave."""
+    employee_ids = set(employees)
+    calendars = employee_calendars(WorkingCalendar(holidays), employee_ids, leaves)
+    busy = {employee_id: [] for employee_id in employee_ids}
+    for employee_id, start_date, end_date in bookings:
+        if employee_id in busy and start_date and end_date and start_date <= end_date:
+            busy[employee_id].append((start_date.toordinal(), end_date.toordinal()))
+    return {
+        employee_id: EmployeeTimeline(employee_id, calendars[employee_id], busy[employee_id])
+        for employee_id in employee_ids
+    }
+
+def auto_schedule_activities(activities_qs=None, designation='ENGINEER', today=None, improve_rounds=0, dry_run=False):
+    """
+    Assigns every unassigned activity in activities_qs (default: all) to an active
+    employee of the designation, on the earliest dates that avoid their existing
+    bookings, leave and holidays, and no earlier than the working day after
+    their predecessors finish. Saves the result with one bulk_update, then
+    pushes booked successors of the scheduled activities (propagate_dependencies).
+    improve_rounds > 0 adds local search passes after the greedy one.
+    Returns the scheduler stats plus the planned (activity_id, employee_id, start, end) rows.
+    """
+    today = today or date.today()
+    if activities_qs is None:
+        activities_qs = Activity.objects.all()
+    pending = list(activities_qs.filter(assignee__isnull=True).order_by('pk'))
+
+    employees_qs = Employee.objects.filter(is_active=True)
+    if designation:
+        employees_qs = employees_qs.filter(designation=designation)
+    employee_ids = list(employees_qs.values_list('id', flat=True))
+    bookings = Activity.objects.filter(assignee_id__in=employee_ids, end_date__gte=today).order_by()
+    leaves = Leave.objects.filter(employee_id__in=employee_ids, end_date__gte=today).order_by()
+    timelines = build_timelines(
+        employee_ids,
+        bookings.values_list('assignee_id', 'start_date', 'end_date').iterator(),
+        leaves.values_list('employee_id', 'start_date', 'end_date').iterator(),
+        Holiday.objects.values_list('date', flat=True),
+    )
+
+    # Activities wait for their predecessors: ones already booked give a fixed
+    # floor; unassigned ones are scheduled in an earlier wave and floor on their placement.
+    by_id = {act.pk: act for act in pending}
+    links = predecessor_links(by_id)
+    predecessors = defaultdict(list)
+    for predecessor_id, successor_id in links:
+        predecessors[successor_id].append(predecessor_id)
+    booked_ends = dict(
+        Activity.objects.filter(pk__in={p for p, _ in links}.difference(by_id)).values_list('pk', 'end_date')
+    )
+
+    scheduler = ActivityScheduler(timelines, today)
+    for wave in _dependency_waves(set(by_id), links):
+        requests = []
+        for pk in wave:
+            act = by_id[pk]
+            finishes = [booked_ends[p] for p in predecessors[pk] if booked_ends.get(p)]
+            finishes += [date.fromordinal(scheduler.placements[p][2]) for p in predecessors[pk] if p in scheduler.placements]
+            scheduler.pinned.update(p for p in predecessors[pk] if p in scheduler.placements)
+            requested = max([act.start_date] + [finish + timedelta(days=1) for finish in finishes])
+            requests.append((pk, requested, act.duration))
+        scheduler.schedule(requests)
+    moved = scheduler.improve(rounds=improve_rounds) if improve_rounds else 0
+
+    plan = []
+    for act in pending:
+        if act.pk not in scheduler.placements:
+            continue
+        employee_id, start, end, _, _ = scheduler.placements[act.pk]
+        act.assignee_id = employee_id
+        act.start_date = date.fromordinal(start)
+        act.end_date = date.fromordinal(end)
+        plan.append(act)
+
+    if plan and not dry_run:
+        with transaction.atomic():
+            Activity.objects.bulk_update(plan, ['assignee', 'start_date', 'end_date'], batch_size=BULK_BATCH_SIZE)
+            # bulk_update sends no signals.
+            bump_planning_version()
+        # Booked successors of the newly scheduled activities move after them.
+        propagate_dependencies([act.pk for act in plan])
+
+    result = scheduler.stats()
+    result.update({
+        'unassigned': len(pending),
+        'moved_by_local_search': moved,
+        'dry_run': dry_run,
+        'plan': [(act.pk, act.assignee_id, act.start_date, act.end_date) for act in plan],
+    })
+    return result
@@ -0,0 +1,122 @@
+# planner/signals.py
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.dispatch import receiver
+
+from .models import (EffortBracket, ProjectType, Segment, Category, Holiday,
+                     GeneralSettings, CapacitySettings, SalesForecast, Activity,
+                     Leave, Employee, Project)
+from .dependencies import propagate_dependencies, looping_predecessors, would_create_cycle
+from .effort_curves import invalidate_effort_curves
+from .forecast_metrics import refresh_forecast_metrics
+from .rescheduling import reschedule_activities, as_date
+from .versioning import bump_planning_version
+
+# --- Effort curve cache ---
+# Brackets define the curves; project types, segments and categories define
+# the (segment, category) -> ProjectType lookup cached alongside them.
+@receiver([post_save, post_delete], sender=EffortBracket)
+@receiver([post_save, post_delete], sender=ProjectType)
+@receiver([post_save, post_delete], sender=Segment)
+@receiver([post_save, post_delete], sender=Category)
+def reset_effort_curves(sender, **kwargs):
+    invalidate_effort_curves()
+
+# --- Stored SalesForecast metrics ---
+# Registered after the curve cache receivers so refreshes see the new curves.
+@receiver([post_save, post_delete], sender=EffortBracket)
+def refresh_bracket_forecasts(sender, instance, **kwargs):
+    refresh_forecast_metrics(SalesForecast.objects.filter(project_type_id=instance.project_type_id))
+
+@receiver([post_save, post_delete], sender=ProjectType)
+@receiver([post_save, post_delete], sender=Segment)
+@receiver([post_save, post_delete], sender=Category)
+@receiver(post_save, sender=GeneralSettings)
+def refresh_all_forecasts(sender, **kwargs):
+    refresh_forecast_metrics()
+
+# A moved holiday changes the working days of forecasts around its old date too;
+# remember_holiday_date (pre_save, below) has stored that date by post_save.
+@receiver([post_save, post_delete], sender=Holiday)
+def refresh_holiday_forecasts(sender, instance, **kwargs):
+    overlapping = Q()
+    for day in {as_date(instance.date), *getattr(instance, '_previous_dates', [])}:
+        overlapping |= Q(start_date__lte=day, end_date__gte=day)
+    refresh_forecast_metrics(SalesForecast.objects.filter(overlapping))
+
+# --- Planning data version (ETag / Last-Modified) ---
+# Bulk writes send no signals; forecast_import and forecast_metrics bump the version themselves.
+@receiver([post_save, post_delete], sender=Activity)
+@receiver([post_save, post_delete], sender=Leave)
+@receiver([post_save, post_delete], sender=Holiday)
+@receiver([post_save, post_delete], sender=SalesForecast)
+@receiver([post_save, post_delete], sender=EffortBracket)
+@receiver([post_save, post_delete], sender=ProjectType)
+@receiver([post_save, post_delete], sender=GeneralSettings)
+@receiver([post_save, post_delete], sender=CapacitySettings)
+@receiver([post_save, post_delete], sender=Employee)
+@receiver([post_save, post_delete], sender=Project)
+@receiver([post_save, post_delete], sender=Segment)
+@receiver([post_save, post_delete], sender=Category)
+def bump_version_on_change(sender, **kwargs):
+    bump_planning_version()
+
+# --- Finish-to-start dependencies ---
+# Moves successors after an activity is saved; propagation itself uses bulk_update, so it does not recurse.
+@receiver(post_save, sender=Activity)
+def propagate_activity_dates(sender, instance, raw=False, **kwargs):
+    if not raw:
+        propagate_dependencies([instance.pk])
+
+@receiver(m2m_changed, sender=Activity.predecessors.through)
+def reject_dependency_loops(sender, instance, action, reverse, pk_set, **kwargs):
+    # Last line of defence for code paths that add links without validating them first.
+    if action != 'pre_add' or not pk_set:
+        return
+    if reverse:
+        loops = [pk for pk in pk_set if would_create_cycle(instance.pk, pk)]
+    else:
+        loops = looping_predecessors(instance.pk, pk_set)
+    if loops:
+        raise ValidationError(f"Linking activities {sorted(loops)} to activity {instance.pk} would create a dependency loop.")
+
+@receiver(m2m_changed, sender=Activity.predecessors.through)
+def propagate_new_links(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    bump_planning_version()
+    if action == 'post_add':
+        # Forward: instance gained predecessors pk_set. Reverse: instance gained successors.
+        propagate_dependencies([instance.pk] if reverse else pk_set)
+
+# --- End dates after holiday and leave changes ---
+# pre_save remembers the old dates so moving a holiday or leave also fixes activities around the old dates.
+@receiver(pre_save, sender=Holiday)
+def remember_holiday_date(sender, instance, raw=False, **kwargs):
+    instance._previous_dates = [] if raw or not instance.pk else list(
+        Holiday.objects.filter(pk=instance.pk).values_list('date', flat=True)
+    )
+
+@receiver(pre_save, sender=Leave)
+def remember_leave_dates(sender, instance, raw=False, **kwargs):
+    instance._previous_dates = [] if raw or not instance.pk else list(
+        Leave.objects.filter(pk=instance.pk).values_list('employee_id', 'start_date', 'end_date')
+    )
+
+@receiver([post_save, post_delete], sender=Holiday)
+def reschedule_for_holiday(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    dates = [as_date(instance.date)] + getattr(instance, '_previous_dates', [])
+    reschedule_activities(min(dates), max(dates))
+
+@receiver([post_save, post_delete], sender=Leave)
+def reschedule_for_leave(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    ranges = [(instance.employee_id, as_date(instance.start_date), as_date(instance.end_date))]
+    ranges += getattr(instance, '_previous_dates', [])
+    for employee_id, start_date, end_date in ranges:
+        reschedule_activities(start_date, end_date, [employee_id])
@@ -1,3 +1,584 @@
-from django.test import TestCase
+import io
+import json
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.messages.storage.fallback import FallbackStorage
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+
+from . import apps, capacity_engine
+from .activity_import import import_activity_rows
+from .batch_edit import BatchEditError, MAX_DURATION, batch_edit_activities
+from .capacity_engine import (DESIGNATIONS, VIEW_TYPES, build_capacity_report, build_periods,
+                              compute_capacity_plan, get_capacity_engine)
+from .dependencies import Dependency, critical_path, propagate_dependencies, would_create_cycle
+from .forms import ActivityAdminForm
+from .models import (Activity, CapacitySettings, Category, Employee, GeneralSettings, Holiday, Leave,
+                     PlanningDataVersion, Project, ProjectType, SalesForecast, Scenario,
+                     ScenarioForecastChange, Segment)
+from .scenarios import MAX_FORECAST_SHIFT_DAYS, compare_scenarios, save_scenario
+from .scheduler import ActivityScheduler, auto_schedule_activities, build_timelines
+from .utilization import build_utilization_report
+from .utils import EffortCurve, WorkingCalendar, parse_int
+from .versioning import planning_etag
+from .views import consolidated_planner_view
+
+TODAY = date(2026, 10, 14)  # a Wednesday
+
+
+def walk_nth_working_day(calendar, start, n):
+    day, counted = start, 0
+    while True:
+        if calendar.is_working_day(day):
+            counted += 1
+            if counted == n:
+                return day
+        day += timedelta(days=1)
+
+
+def walk_shift(calendar, day, n):
+    # The working day n working days after (or before) day's rank, counted one day at a time.
+    rank = calendar.working_days_before(day) + n
+    probe = date(2000, 1, 1)
+    while calendar.working_days_before(probe) < rank or not calendar.is_working_day(probe):
+        probe += timedelta(days=1)
+    return probe
+
+
+class PlannerTestCase(TestCase):
+    """Clears the per-process caches that are keyed by the planning-data version, which restarts with every test."""
+
+    def setUp(self):
+        capacity_engine._cached_engines.clear()
+        caches[settings.CAPACITY_CACHE_ALIAS].clear()
+        GeneralSettings.objects.update_or_create(pk=1, defaults={'working_hours_per_day': 8})
+        for designation in DESIGNATIONS:
+            CapacitySettings.objects.update_or_create(designation=designation, defaults={
+                'monthly_meeting_hours': 4, 'monthly_leave_hours': 2, 'efficiency_loss_factor': 10,
+            })
+        self.segment = Segment.objects.create(name='Rail')
+        self.project = Project.objects.create(project_id='P-1', customer_name='Customer', segment=self.segment)
+        self.engineers = [Employee.objects.create(name=f'Engineer {i}', designation='ENGINEER') for i in range(3)]
+        self.lead = Employee.objects.create(name='Lead', designation='TEAM_LEAD')
+
+    def activity(self, name, start, duration, assignee=None, project=None):
+        return Activity.objects.create(project=project or self.project, activity_name=name, start_date=start,
+                                       duration=duration, assignee=assignee)
+
+
+# --- Calendar and effort curves ---
+
+class WorkingCalendarTests(SimpleTestCase):
+    def setUp(self):
+        # Weekday holidays, a weekend holiday and a run spanning a weekend.
+        self.calendar = WorkingCalendar([date(2026, 12, 25), date(2026, 12, 26), date(2027, 1, 1),
+                                         date(2026, 12, 31), date(2027, 1, 4)])
+
+    def test_nth_working_day_matches_a_day_walk(self):
+        start = date(2026, 12, 20)
+        for offset in range(20):
+            for n in range(1, 15):
+                day = start + timedelta(days=offset)
+                self.assertEqual(self.calendar.nth_working_day(day, n), walk_nth_working_day(self.calendar, day, n))
+
+    def test_nth_working_day_of_zero_or_less_is_the_start(self):
+        self.assertEqual(self.calendar.nth_working_day(date(2026, 12, 26), 0), date(2026, 12, 26))
+        self.assertEqual(self.calendar.nth_working_day(date(2026, 12, 26), -3), date(2026, 12, 26))
+
+    def test_working_days_between(self):
+        self.assertEqual(self.calendar.working_days_between(date(2026, 12, 21), date(2027, 1, 8)), 11)
+        self.assertEqual(self.calendar.working_days_between(date(2026, 12, 26), date(2026, 12, 27)), 0)
+        self.assertEqual(self.calendar.working_days_between(date(2027, 1, 8), date(2027, 1, 1)), 0)
+
+    def test_weekend_holidays_are_ignored(self):
+        self.assertEqual(WorkingCalendar([date(2026, 12, 26)]).working_days_between(date(2026, 12, 21), date(2026, 12, 31)),
+                         WorkingCalendar().working_days_between(date(2026, 12, 21), date(2026, 12, 31)))
+
+    def test_shift_working_days_matches_a_day_walk(self):
+        for offset in range(16):
+            day = date(2026, 12, 20) + timedelta(days=offset)
+            for n in (-7, -1, 0, 1, 3, 9):
+                self.assertEqual(self.calendar.shift_working_days(day, n), walk_shift(self.calendar, day, n))
+
+    def test_with_days_off_adds_to_the_holidays(self):
+        calendar = self.calendar.with_days_off([date(2027, 1, 5)])
+        self.assertFalse(calendar.is_working_day(date(2027, 1, 5)))
+        self.assertTrue(self.calendar.is_working_day(date(2027, 1, 5)))
+
+
+class EffortCurveTests(SimpleTestCase):
+    def test_empty_curve_is_zero(self):
+        curve = EffortCurve([])
+        self.assertEqual(curve.evaluate(5e7), 0)
+        self.assertEqual(curve.evaluate_many([1, 2]).tolist(), [0, 0])
+
+    def test_single_bracket_scales_below_and_stays_flat_above(self):
+        curve = EffortCurve([(100, 50)])
+        self.assertEqual(curve.evaluate(50), 25)
+        self.assertEqual(curve.evaluate(400), 50)
+
+    def test_interpolates_and_extrapolates_along_the_top_brackets(self):
+        curve = EffortCurve([(300, 90), (100, 50), (200, 60)])
+        self.assertEqual(curve.evaluate(150), 55)
+        self.assertEqual(curve.evaluate(400), 120)
+
+    def test_evaluate_many_matches_evaluate(self):
+        for points in ([(100, 50), (200, 60), (300, 90)], [(0, 10), (100, 20)], [(100, 50), (100, 70)], [(100, 50)]):
+            curve = EffortCurve(points)
+            values = [0, 1, 50, 100, 150, 199.5, 300, 1000]
+            for value, many in zip(values, curve.evaluate_many(values).tolist()):
+                self.assertAlmostEqual(curve.evaluate(value), many)
+
+
+# --- Capacity engine ---
+
+class CapacityEngineTests(PlannerTestCase):
+    def setUp(self):
+        super().setUp()
+        for day in (date(2026, 12, 25), date(2027, 1, 1), date(2027, 3, 6)):
+            Holiday.objects.create(date=day, description='Holiday')
+        Leave.objects.create(employee=self.engineers[0], start_date=date(2026, 11, 9), end_date=date(2026, 11, 20))
+        for i in range(12):
+            self.activity(f'A{i}', TODAY + timedelta(days=11 * i - 20), 5 + 3 * i, self.engineers[i % 3])
+        self.activity('Review', TODAY + timedelta(days=30), 15, self.lead)
+        self.activity('Unassigned', TODAY, 10)
+
+    def reference_plan(self, view_type):
+        """Day-by-day walk of the live workload and the peak weekly headcount requirement."""
+        calendar = WorkingCalendar(Holiday.objects.values_list('date', flat=True))
+        bookings = list(Activity.objects.filter(assignee__isnull=False)
+                        .values_list('assignee__designation', 'start_date', 'end_date'))
+        efficiency = {c.designation: 1 - c.efficiency_loss_factor / 100 for c in CapacitySettings.objects.all()}
+        plan = []
+        for period in build_periods(view_type, TODAY):
+            live, weeks = 0.0, {}
+            day = period['start']
+            while day <= period['end']:
+                week = weeks.setdefault(day.isocalendar()[:2], {'days': 0, **dict.fromkeys(DESIGNATIONS, 0.0)})
+                if calendar.is_working_day(day):
+                    week['days'] += 1
+                    for designation, start, end in bookings:
+                        if start <= day <= end:
+                            live += 8
+                            week[designation] += 8
+                day += timedelta(days=1)
+            required = {
+                des: max([w[des] / (w['days'] * 8 * efficiency[des]) for w in weeks.values() if w['days']], default=0.0)
+                for des in DESIGNATIONS
+            }
+            plan.append((live, required))
+        return plan
+
+    def test_rollups_match_a_day_walk(self):
+        for view_type in VIEW_TYPES:
+            rollup = compute_capacity_plan(view_type, TODAY)
+            for i, (live, required) in enumerate(self.reference_plan(view_type)):
+                self.assertAlmostEqual(rollup.live_workload()[i], live)
+                self.assertAlmostEqual(rollup.forecasted_workload()[i], 0)
+                for des in DESIGNATIONS:
+                    self.assertAlmostEqual(rollup.required_headcount(des)[i], required[des])
+
+    def test_leave_reduces_available_hours(self):
+        month = compute_capacity_plan('month', TODAY)
+        november = next(i for i, p in enumerate(month.periods) if p['start'] == date(2026, 11, 1))
+        settings_row = CapacitySettings.objects.get(designation='ENGINEER')
+        working_days = month.working_days[november]
+        gross = (3 * working_days - 10) * 8
+        non_project = 3 * 6 * 30 / 30.44
+        expected = (gross - non_project) * (1 - settings_row.efficiency_loss_factor / 100)
+        self.assertAlmostEqual(month.available_hours('ENGINEER')[november], expected)
+
+    def test_engine_is_built_once_per_version(self):
+        with mock.patch.object(capacity_engine, 'build_capacity_engine', wraps=capacity_engine.build_capacity_engine) as build:
+            for view_type in VIEW_TYPES:
+                build_capacity_report(view_type, TODAY)
+            self.assertEqual(build.call_count, 1)
+            self.activity('Late addition', TODAY, 3, self.engineers[1])
+            get_capacity_engine(TODAY)
+            self.assertEqual(build.call_count, 2)
+
+
+# --- Forecast ingestion ---
+
+class ForecastMetricsTests(PlannerTestCase):
+    def setUp(self):
+        super().setUp()
+        ProjectType.objects.create(segment=self.segment, category=Category.objects.create(name='Signalling'))
+        self.november = SalesForecast.objects.create(opportunity='NOV', total_amount=1e7, probability=50, segment='Rail',
+                                                     category='Signalling', start_date=date(2026, 11, 2),
+                                                     end_date=date(2026, 11, 13))
+        self.december = SalesForecast.objects.create(opportunity='DEC', total_amount=1e7, probability=50, segment='Rail',
+                                                     category='Signalling', start_date=date(2026, 12, 1),
+                                                     end_date=date(2026, 12, 14))
+
+    def window_working_days(self):
+        return tuple(SalesForecast.objects.filter(pk__in=[self.november.pk, self.december.pk])
+                     .order_by('start_date').values_list('window_working_days', flat=True))
+
+    def test_holiday_changes_refresh_forecasts_around_old_and_new_dates(self):
+        self.assertEqual(self.window_working_days(), (10, 10))
+        holiday = Holiday.objects.create(date=date(2026, 11, 4), description='Holiday')
+        self.assertEqual(self.window_working_days(), (9, 10))
+        holiday.date = date(2026, 12, 2)
+        holiday.save()
+        self.assertEqual(self.window_working_days(), (10, 9))
+        holiday.delete()
+        self.assertEqual(self.window_working_days(), (10, 10))
+
+
+class ForecastUploadTests(PlannerTestCase):
+    def setUp(self):
+        super().setUp()
+        SalesForecast.objects.create(opportunity='KEEP', total_amount=1e7, probability=50)
+
+    def test_upload_requires_the_token(self):
+        url = '/api/sales-forecast/upload/'
+
+        def csv_file():
+            return SimpleUploadedFile('forecast.csv', b'Opportunity,Total Amount\n')
+
+        self.assertEqual(self.client.post(url, {'file': csv_file()}).status_code, 403)
+        with override_settings(FORECAST_UPLOAD_TOKEN='secret'):
+            self.assertEqual(self.client.post(url, {'file': csv_file()}, HTTP_X_FORECAST_UPLOAD_TOKEN='wrong').status_code, 403)
+            response = self.client.post(url, {'file': csv_file()}, HTTP_X_FORECAST_UPLOAD_TOKEN='secret')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(SalesForecast.objects.filter(opportunity='KEEP').exists())
+            response = self.client.post(url, {'file': csv_file(), 'mode': 'wipe'}, HTTP_X_FORECAST_UPLOAD_TOKEN='secret')
+            self.assertEqual(response.status_code, 400)
+
+    def test_command_merges_unless_told_to_replace(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'forecast.csv')
+            with open(path, 'w') as f:
+                f.write('Opportunity,Total Amount (in Cr),Probability(%)\nNEW,2,40\n')
+            call_command('import_sales_forecast', path, stdout=io.StringIO())
+            self.assertEqual(set(SalesForecast.objects.values_list('opportunity', flat=True)), {'KEEP', 'NEW'})
+            call_command('import_sales_forecast', path, '--replace', stdout=io.StringIO())
+            self.assertEqual(set(SalesForecast.objects.values_list('opportunity', flat=True)), {'NEW'})
+
+
+# --- Conditional GET ---
+
+class ConditionalGetTests(TestCase):
+    def test_fresh_database_has_a_version(self):
+        self.assertFalse(PlanningDataVersion.objects.exists())
+        response = self.client.get('/api/gantt/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get('/api/gantt/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+
+# --- Snapshots ---
+
+class SnapshotRefresherTests(SimpleTestCase):
+    def serves(self, argv, run_main=None):
+        environ = {'RUN_MAIN': run_main} if run_main else {}
+        with mock.patch.object(sys, 'argv', argv), mock.patch.dict(os.environ, environ, clear=False):
+            if not run_main:
+                os.environ.pop('RUN_MAIN', None)
+            return apps._serves_requests()
+
+    def test_only_serving_processes_refresh(self):
+        self.assertFalse(self.serves(['manage.py', 'migrate']))
+        self.assertFalse(self.serves(['manage.py', 'shell']))
+        self.assertFalse(self.serves(['manage.py', 'runserver']))
+        self.assertTrue(self.serves(['manage.py', 'runserver'], run_main='true'))
+        self.assertTrue(self.serves(['manage.py', 'runserver', '--noreload']))
+        self.assertTrue(self.serves(['gunicorn', 'core.wsgi']))
+
+
+# --- Utilization and conflicts ---
+
+class UtilizationTests(PlannerTestCase):
+    def test_utilization_bounds(self):
+        for params in ({'mode': 'day', 'count': 3000000}, {'mode': 'week', 'count': 200}, {'start': '9999-12-01'},
+                       {'count': 'many'}, {'mode': 'year'}):
+            self.assertEqual(self.client.get('/api/utilization/', params).status_code, 400, params)
+            self.assertEqual(self.client.get('/utilization/', params).status_code, 200, params)
+        self.assertEqual(self.client.get('/api/utilization/', {'mode': 'day', 'count': 30}).status_code, 200)
+
+    def test_leave_inside_an_activity_is_not_booked(self):
+        Leave.objects.create(employee=self.engineers[0], start_date=date(2026, 11, 3), end_date=date(2026, 11, 4))
+        self.activity('Spans leave', date(2026, 11, 2), 5, self.engineers[0])
+        for mode, count in (('day', 14), ('week', 2)):
+            report = build_utilization_report({'mode': mode, 'start': '2026-11-02', 'count': count}, TODAY)
+            row = next(r for r in report['rows'] if r['employee_id'] == self.engineers[0].pk)
+            self.assertEqual(sum(c['booked_hours'] for c in row['cells']), 5 * 8)
+            self.assertTrue(all(c['booked_hours'] <= c['available_hours'] for c in row['cells']), mode)
+
+
+class OverAllocationWarningTests(PlannerTestCase):
+    def test_pages_with_pending_messages_are_not_revalidated(self):
+        def request(with_message):
+            request = RequestFactory().get('/')
+            request.session = SessionStore()
+            request._messages = FallbackStorage(request)
+            if with_message:
+                request._messages.add(30, 'Over-allocated.')
+            request.META['HTTP_IF_NONE_MATCH'] = f'"{planning_etag(request)}"'
+            return request
+
+        self.assertEqual(consolidated_planner_view(request(False)).status_code, 304)
+        pending = request(True)
+        response = consolidated_planner_view(pending)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertFalse(response.has_header('ETag'))
+        self.assertIn(b'Over-allocated.', response.content)
+
+
+# --- Dependencies and scheduling ---
+
+class DependencyTests(PlannerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.design = self.activity('Design', date(2026, 11, 2), 5, self.engineers[0])
+        self.build = self.activity('Build', date(2026, 11, 2), 3, self.engineers[1])
+        self.test = self.activity('Test', date(2026, 11, 2), 2, self.engineers[2])
+        self.build.predecessors.add(self.design)
+        self.test.predecessors.add(self.build)
+
+    def test_links_push_successors(self):
+        self.build.refresh_from_db()
+        self.test.refresh_from_db()
+        self.assertEqual(self.build.start_date, date(2026, 11, 9))
+        self.assertEqual(self.test.start_date, date(2026, 11, 12))
+
+    def test_saving_a_predecessor_propagates(self):
+        self.design.duration = 10
+        self.design.save()
+        self.test.refresh_from_db()
+        self.assertEqual(self.test.start_date, date(2026, 11, 19))
+
+    def test_propagation_never_moves_successors_earlier(self):
+        self.assertEqual(propagate_dependencies([self.design.pk]), [])
+
+    def test_loops_are_rejected(self):
+        self.assertTrue(would_create_cycle(self.test.pk, self.design.pk))
+        self.assertFalse(would_create_cycle(self.design.pk, self.test.pk))
+        # m2m add() opens no savepoint of its own, so each rejected add gets one here.
+        with self.assertRaises(ValidationError), transaction.atomic():
+            self.design.predecessors.add(self.test)
+        with self.assertRaises(ValidationError), transaction.atomic():
+            self.test.successors.add(self.design)
+        self.assertFalse(self.design.predecessors.exists())
+
+    def test_admin_form_rejects_loops(self):
+        data = {'project': self.project.pk, 'activity_name': 'Design', 'start_date': '2026-11-02', 'duration': 5,
+                'end_date': '2026-11-06', 'predecessors': [self.test.pk]}
+        form = ActivityAdminForm(data, instance=self.design)
+        self.assertFalse(form.is_valid())
+        self.assertIn('predecessors', form.errors)
+
+    def test_predecessors_come_from_the_same_project(self):
+        other = self.activity('Elsewhere', date(2026, 11, 2), 2,
+                              project=Project.objects.create(project_id='P-2', customer_name='Other'))
+        response = self.client.post(f'/api/activities/{self.design.pk}/dependencies/', json.dumps({'predecessor': other.pk}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        data = {'project': self.project.pk, 'activity_name': 'Design', 'start_date': '2026-11-02', 'duration': 5,
+                'end_date': '2026-11-06', 'predecessors': [other.pk]}
+        form = ActivityAdminForm(data, instance=self.design)
+        self.assertFalse(form.is_valid())
+        self.assertIn('predecessors', form.errors)
+        self.assertFalse(self.design.predecessors.exists())
+
+    def test_critical_path(self):
+        result = critical_path(self.project)
+        self.assertEqual(result['critical_path'], [self.design.pk, self.build.pk, self.test.pk])
+        self.assertEqual(result['loop'], [])
+
+    def test_critical_path_reports_stored_loops(self):
+        # Written around the validation, as older data could be.
+        Dependency.objects.create(from_activity=self.design, to_activity=self.test)
+        response = self.client.get(f'/api/projects/{self.project.pk}/critical-path/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['loop'], sorted([self.design.pk, self.build.pk, self.test.pk]))
+        self.assertTrue(all(a['slack_days'] is None for a in response.json()['activities']))
+
+    def test_auto_schedule_respects_predecessors(self):
+        first = self.activity('Unassigned 1', date(2026, 11, 2), 4)
+        second = self.activity('Unassigned 2', date(2026, 11, 2), 2)
+        second.predecessors.add(first, self.test)
+        booked_successor = self.activity('Handover', date(2026, 11, 2), 1, self.lead)
+        booked_successor.predecessors.add(second)
+
+        result = auto_schedule_activities(Activity.objects.filter(pk__in=[first.pk, second.pk]), today=date(2026, 10, 1))
+        self.assertEqual(result['scheduled'], 2)
+        for activity in Activity.objects.all():
+            for predecessor in activity.predecessors.all():
+                self.assertGreater(activity.start_date, predecessor.end_date, activity.activity_name)
+
+    def test_api_bodies(self):
+        first = self.activity('First', date(2026, 11, 2), 3)
+        second = self.activity('Second', date(2026, 11, 2), 3)
+        url = f'/api/activities/{second.pk}/dependencies/'
+        for body in ('not json', '[1]', '{"predecessor": "x"}', '{"predecessor": 1e400}',
+                     json.dumps({'predecessor': first.pk, 'action': 'swap'})):
+            self.assertEqual(self.client.post(url, body, content_type='application/json').status_code, 400, body)
+        response = self.client.post(url, json.dumps({'predecessor': first.pk}), content_type='application/json')
+        self.assertEqual(response.json()['predecessors'], [first.pk])
+        response = self.client.post(f'/api/activities/{first.pk}/dependencies/', json.dumps({'predecessor': second.pk}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+
+
+class SchedulerTests(SimpleTestCase):
+    def test_improve_never_delays_the_end_of_a_pinned_activity(self):
+        monday = date(2026, 11, 2)
+        # Employee 1 is busy all week; employee 2 is on leave from Tuesday to the following Friday.
+        timelines = build_timelines([1, 2], [(1, monday, monday + timedelta(days=4))],
+                                    [(2, monday + timedelta(days=1), monday + timedelta(days=11))], [])
+        scheduler = ActivityScheduler(timelines, monday)
+        start, end = timelines[1].earliest_slot(2, monday.toordinal())
+        scheduler._place('predecessor', 1, start, end, monday.toordinal(), 2)
+        scheduler.pinned.add('predecessor')
+        scheduler.improve()
+        self.assertEqual(scheduler.placements['predecessor'][1:3], (start, end))
+        # Unpinned, the earlier start on employee 2 is taken even though it finishes later.
+        scheduler.pinned.clear()
+        self.assertEqual(scheduler.improve(), 1)
+        self.assertEqual(scheduler.placements['predecessor'][:2], (2, monday.toordinal()))
+
+# --- Bulk import and batch edit ---
+
+class ActivityImportTests(PlannerTestCase):
+    def rows(self, *items):
+        return enumerate(({'project': 'P-1', 'activity_name': 'Imported', **item} for item in items), start=1)
+
+    def test_valid_rows_get_end_dates(self):
+        Leave.objects.create(employee=self.engineers[0], start_date=date(2026, 11, 3), end_date=date(2026, 11, 3))
+        result = import_activity_rows(self.rows({'assignee': 'engineer 0', 'start_date': '2026-11-02', 'duration': '3'}))
+        self.assertEqual(result['inserted'], 1)
+        self.assertEqual(Activity.objects.get(activity_name='Imported').end_date, date(2026, 11, 5))
+
+    def test_invalid_rows_are_reported_and_the_rest_imported(self):
+        result = import_activity_rows(self.rows(
+            {'start_date': '2026-11-02', 'duration': 'inf'},
+            {'start_date': '2026-11-02', 'duration': '1e300'},
+            {'start_date': '2026-11-02', 'duration': str(MAX_DURATION + 1)},
+            {'start_date': '2026-11-02', 'duration': '2.7'},
+            {'start_date': '9999-12-30', 'duration': '2'},
+            {'start_date': '2026-11-02', 'duration': '2', 'assignee': 'Nobody'},
+            {'project': 'P-404', 'start_date': '2026-11-02', 'duration': '2'},
+            {'start_date': '2026-11-02', 'duration': '2.0'},
+        ))
+        self.assertEqual((result['inserted'], result['rejected']), (1, 7))
+        self.assertEqual([e['row'] for e in result['errors']], [1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(result['errors'][3]['error'], "Duration must be a whole number of working days.")
+
+    def test_json_api(self):
+        body = [{'project': 'P-1', 'activity': 'Via API', 'start': '02-11-2026', 'duration': 2}]
+        response = self.client.post('/api/activities/import/', json.dumps(body), content_type='application/json')
+        self.assertEqual(response.json()['inserted'], 1)
+
+
+class BatchEditTests(PlannerTestCase):
+    def setUp(self):
+        super().setUp()
+        self.first = self.activity('First', date(2026, 11, 2), 3, self.engineers[0])
+        self.second = self.activity('Second', date(2026, 11, 2), 2, self.engineers[1])
+        self.second.predecessors.add(self.first)
+
+    def post(self, body):
+        return self.client.post('/api/activities/batch/', json.dumps(body), content_type='application/json')
+
+    def test_changes_recompute_end_dates_and_propagate(self):
+        result = batch_edit_activities({'activities': [{'id': self.first.pk, 'shift_days': 2, 'duration': 5}]})
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.start_date, self.first.end_date), (date(2026, 11, 4), date(2026, 11, 10)))
+        self.assertEqual(self.second.start_date, date(2026, 11, 11))
+        self.assertEqual(result['propagated'], [self.second.pk])
+
+    def test_project_shift_and_dry_run(self):
+        result = batch_edit_activities({'projects': [{'project': self.project.pk, 'shift_days': -1}], 'dry_run': True})
+        self.assertEqual(result['updated'], 2)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.start_date, date(2026, 11, 2))
+
+    def test_one_invalid_change_saves_nothing(self):
+        with self.assertRaises(BatchEditError) as raised:
+            batch_edit_activities({'activities': [{'id': self.first.pk, 'duration': 4}, {'id': 999999, 'duration': 1}]})
+        self.assertEqual(raised.exception.errors, [{'activity_id': 999999, 'error': 'Unknown activity 999999.'}])
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.duration, 3)
+
+    def test_far_dates_are_rejected(self):
+        response = self.post({'activities': [{'id': self.first.pk, 'start_date': '9999-12-30', 'duration': 10}]})
+        self.assertEqual(response.status_code, 400)
+        Activity.objects.filter(pk=self.first.pk).update(start_date=date(2999, 12, 1))
+        response = self.post({'activities': [{'id': self.first.pk, 'shift_days': 5000}]})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['errors'][0]['activity_id'], self.first.pk)
+
+    def test_malformed_bodies(self):
+        self.assertEqual(self.client.post('/api/activities/batch/', 'nope', content_type='application/json').status_code, 400)
+        self.assertEqual(self.post([1, 2]).status_code, 400)
+        self.assertEqual(self.post({'activities': [{'id': self.first.pk, 'duration': True}]}).status_code, 400)
+
+
+# --- Scenarios ---
+
+class ScenarioTests(PlannerTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(6):
+            self.activity(f'A{i}', TODAY + timedelta(days=9 * i), 20, self.engineers[i % 3])
+        self.forecast = SalesForecast.objects.create(opportunity='OPP-1', total_amount=1e7, probability=50,
+                                                     start_date=TODAY, end_date=TODAY + timedelta(days=60))
+
+    def test_baseline_equals_the_capacity_plan(self):
+        for view_type in VIEW_TYPES:
+            baseline = compare_scenarios([], view_type, TODAY)['scenarios'][0]
+            report = build_capacity_report(view_type, TODAY)['report_data']
+            for scenario_des, report_des in zip(baseline['designations'], report):
+                for scenario_month, report_month in zip(scenario_des['months'], report_des['months']):
+                    for key in ('available_hours', 'required_hours', 'required_headcount', 'available_headcount'):
+                        self.assertAlmostEqual(scenario_month[key], report_month[key])
+
+    def test_hiring_adds_capacity(self):
+        scenario = save_scenario({'name': 'Hire', 'headcount': [
+            {'designation': 'ENGINEER', 'effective_date': TODAY.isoformat(), 'delta': 2},
+        ]})
+        baseline, hire = compare_scenarios([scenario.pk], 'month', TODAY)['scenarios']
+        self.assertGreater(hire['designations'][0]['months'][1]['available_hours'],
+                           baseline['designations'][0]['months'][1]['available_hours'])
+
+    def test_out_of_range_changes_are_rejected(self):
+        for changes in ({'forecasts': [{'opportunity': 'OPP-1', 'shift_days': 10 ** 6}]},
+                        {'forecasts': [{'opportunity': 'OPP-1', 'shift_days': 1.5}]},
+                        {'headcount': [{'designation': 'ENGINEER', 'effective_date': '2026-12-01', 'delta': 10 ** 20}]},
+                        {'capacity_settings': {'ENGINEER': {'efficiency_loss_factor': 'inf'}}}):
+            with self.assertRaises(ValueError):
+                save_scenario({'name': 'Bad', **changes})
+        self.assertFalse(Scenario.objects.exists())
+
+    def test_stored_out_of_range_changes_give_400(self):
+        scenario = Scenario.objects.create(name='Legacy')
+        ScenarioForecastChange.objects.create(scenario=scenario, forecast=self.forecast, shift_days=MAX_FORECAST_SHIFT_DAYS + 1)
+        response = self.client.get('/api/scenarios/compare/', {'scenario': scenario.pk})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/scenarios/', {'scenario': scenario.pk}).status_code, 200)
+
+
+class ParseIntTests(TestCase):
+    def test_whole_numbers_in_range(self):
+        self.assertEqual(parse_int('12', 'n', 0, 20), 12)
+        self.assertEqual(parse_int(3.0, 'n', 0, 20), 3)
+        for value in (True, 1.5, '1.5', 'x', None, float('inf'), 21, '-1'):
+            with self.assertRaises(ValueError):
+                parse_int(value, 'n', 0, 20)
+
+    def test_gantt_parameters_share_the_parser(self):
+        self.assertEqual(self.client.get('/api/gantt/', {'limit': 10 ** 6}).status_code, 400)
+        self.assertEqual(self.client.get('/api/gantt/', {'offset': '1.5'}).status_code, 400)
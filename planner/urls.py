@@ -7,6 +7,7 @@ urlpatterns = [
     path('', views.project_list_view, name='planner_project_list'),
     path('planner/all/', views.consolidated_planner_view, name='planner_consolidated_planner'),
     path('planner/<int:project_pk>/', views.activity_planner_view, name='planner_activity_planner'),
+    path('api/gantt/', views.gantt_data_view, name='planner_gantt_data'),
     path('workforce/', views.workforce_view, name='planner_workforce'),
     path('configuration/', views.configuration_view, name='planner_configuration'),
     path('employee/<int:pk>/delete/', views.delete_employee_view, name='planner_delete_employee'),
@@ -18,7 +19,22 @@ urlpatterns = [
     path('project-type/<int:pk>/edit/', views.edit_project_type_view, name='planner_edit_project_type'),
     path('project-type/<int:pk>/delete/', views.delete_project_type_view, name='planner_delete_project_type'),
     path('sales-forecast/', views.sales_forecast_view, name='planner_sales_forecast'),
+    path('api/sales-forecast/upload/', views.upload_sales_forecast_view, name='planner_upload_sales_forecast'),
     path('capacity-plan/', views.capacity_plan_view, name='planner_capacity_plan'),
+    path('api/capacity-plan/cache-stats/', views.capacity_cache_stats_view, name='planner_capacity_cache_stats'),
+    path('api/capacity-plan/simulation/', views.capacity_simulation_view, name='planner_capacity_simulation'),
+    path('api/activities/import/', views.import_activities_view, name='planner_import_activities'),
+    path('api/activities/auto-schedule/', views.auto_schedule_view, name='planner_auto_schedule'),
+    path('api/activities/batch/', views.batch_edit_view, name='planner_batch_edit'),
+    path('api/activities/<int:pk>/dependencies/', views.activity_dependency_view, name='planner_activity_dependency'),
+    path('api/projects/<int:project_pk>/critical-path/', views.critical_path_view, name='planner_critical_path'),
+    path('api/conflicts/', views.conflicts_report_view, name='planner_conflicts_report'),
+    path('api/availability/', views.available_candidates_view, name='planner_available_candidates'),
+    path('utilization/', views.utilization_view, name='planner_utilization'),
+    path('api/utilization/', views.utilization_data_view, name='planner_utilization_data'),
+    path('scenarios/', views.scenarios_view, name='planner_scenarios'),
+    path('api/scenarios/', views.save_scenario_view, name='planner_save_scenario'),
+    path('api/scenarios/compare/', views.scenario_comparison_view, name='planner_scenario_comparison'),
     path('help/', views.help_view, name='planner_help_page'),
     path('effort-bracket/<int:pk>/delete/', views.delete_effort_bracket_view, name='planner_delete_effort_bracket'),
     path('api/project-type/<int:pk>/brackets/', views.get_effort_brackets_for_project_type, name='planner_get_effort_brackets'),
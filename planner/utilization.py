@@ -0,0 +1,201 @@
+# planner/utilization.py
+
+from collections import defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+
+from .models import Activity, Employee, Holiday, GeneralSettings
+from .leave_engine import LeaveEngine
+from .utils import WorkingCalendar
+
+UTILIZATION_MODES = ('week', 'day')
+DEFAULT_WEEKS = 26
+DEFAULT_DAYS = 42
+MAX_DAYS = 3 * 366
+PAGE_SIZE = 50
+# Leaves room for a full report (and the page's earlier/later links) on either side.
+EARLIEST_START = date.min + timedelta(days=2 * MAX_DAYS)
+LATEST_START = date.max - timedelta(days=2 * MAX_DAYS)
+
+class UtilizationEngine:
+    """
+    Booked vs available hours per employee per day.
+
+    Bookings are kept sparse: per employee, a run-length encoded step function
+    (sorted day indexes where the number of concurrent activities changes, and
+    the count from that day on), so memory grows with the number of activities,
+    not with employees x days. Availability is the working-day calendar minus the
+    employee's coalesced leave from a LeaveEngine. Dense day arrays are only
+    materialised for the employees and days actually being reported.
+    """
+
+    def __init__(self, start_date, end_date, work_calendar, hours_per_day, leave_engine):
+        self.start_date = start_date
+        self.end_date = end_date
+        self.work_calendar = work_calendar
+        self.hours_per_day = hours_per_day
+        self.leave_engine = leave_engine
+        self.num_days = (end_date - start_date).days + 1
+        days = [start_date + timedelta(days=i) for i in range(self.num_days)]
+        self.working_mask = np.array([work_calendar.is_working_day(d) for d in days], dtype=bool)
+        self._events = defaultdict(list)
+        self.runs = {}
+
+    def add_activity(self, employee_id, start_date, end_date):
+        """Books the employee for every working day of an activity (hours_per_day each)."""
+        lo = max((start_date - self.start_date).days, 0)
+        hi = min((end_date - self.start_date).days, self.num_days - 1)
+        if lo > hi:
+            return
+        self._events[employee_id].append((lo, 1))
+        self._events[employee_id].append((hi + 1, -1))
+
+    def build(self):
+        """Turns the booking events into per-employee (day starts, concurrent counts) runs."""
+        for employee_id, events in self._events.items():
+            events.sort()
+            starts, counts = [], []
+            running = 0
+            for day, delta in events:
+                running += delta
+                if starts and starts[-1] == day:
+                    counts[-1] = running
+                else:
+                    starts.append(day)
+                    counts.append(running)
+            self.runs[employee_id] = (np.array(starts, dtype=np.int32), np.array(counts, dtype=np.int16))
+        self._events = None
+        return self
+
+    def _index(self, day):
+        return (day - self.start_date).days
+
+    def concurrent_activities(self, employee_id, start_date, end_date):
+        """Number of activities booked on each day of [start_date, end_date]."""
+        lo, hi = self._index(start_date), self._index(end_date)
+        starts, counts = self.runs.get(employee_id, (None, None))
+        if starts is None:
+            return np.zeros(hi - lo + 1, dtype=np.int16)
+        idx = np.searchsorted(starts, np.arange(lo, hi + 1), side='right') - 1
+        return np.where(idx >= 0, counts[np.maximum(idx, 0)], 0)
+
+    def daily_hours(self, employee_id, start_date, end_date):
+        """
+        Returns (booked, available) hour arrays for each day of [start_date, end_date].
+        Leave days book nothing: Activity.save already stretches activities across them.
+        """
+        lo, hi = self._index(start_date), self._index(end_date)
+        on_leave = np.zeros(hi - lo + 1, dtype=bool)
+        for leave_start, leave_end in self.leave_engine.employee_intervals(employee_id, start_date, end_date):
+            on_leave[max(self._index(leave_start), lo) - lo:min(self._index(leave_end), hi) - lo + 1] = True
+        available_days = self.working_mask[lo:hi + 1] & ~on_leave
+
+        booked = self.concurrent_activities(employee_id, start_date, end_date) * available_days * self.hours_per_day
+        available = available_days * float(self.hours_per_day)
+        return booked.astype(float), available
+
+    def period_hours(self, employee_id, periods):
+        """(booked, available) hours summed per contiguous period (dicts with 'start'/'end')."""
+        booked, available = self.daily_hours(employee_id, periods[0]['start'], periods[-1]['end'])
+        offsets = [(p['start'] - periods[0]['start']).days for p in periods]
+        return np.add.reduceat(booked, offsets), np.add.reduceat(available, offsets)
+
+def build_utilization_engine(start_date, end_date, employee_ids=None):
+    """Loads holidays, leave and activity bookings for [start_date, end_date]."""
+    work_calendar = WorkingCalendar(Holiday.objects.values_list('date', flat=True))
+    hours_per_day = GeneralSettings.objects.get_or_create(pk=1)[0].working_hours_per_day
+    leave_engine = LeaveEngine.load(work_calendar, start_date, end_date, employee_ids)
+    engine = UtilizationEngine(start_date, end_date, work_calendar, hours_per_day, leave_engine)
+
+    activities_qs = Activity.objects.filter(
+        assignee__isnull=False, start_date__lte=end_date, end_date__gte=start_date
+    )
+    if employee_ids is not None:
+        activities_qs = activities_qs.filter(assignee_id__in=employee_ids)
+    for employee_id, start, end in activities_qs.values_list('assignee_id', 'start_date', 'end_date').order_by().iterator():
+        engine.add_activity(employee_id, start, end)
+    return engine.build()
+
+def utilization_periods(mode, start_date, count):
+    """Columns of the heatmap: single days, or Monday-to-Sunday weeks starting at start_date's week."""
+    if mode == 'day':
+        return [
+            {'start': d, 'end': d, 'label': d.strftime('%d %b')}
+            for d in (start_date + timedelta(days=i) for i in range(count))
+        ]
+    monday = start_date - timedelta(days=start_date.weekday())
+    return [
+        {'start': w, 'end': w + timedelta(days=6), 'label': w.strftime('W%W %d %b')}
+        for w in (monday + timedelta(weeks=i) for i in range(count))
+    ]
+
+def _utilization(booked, available):
+    # None when there is no availability (weekends, holidays, leave).
+    return round(100 * booked / available, 1) if available > 0 else None
+
+def build_utilization_report(params, today):
+    """
+    One page of the utilization heatmap: active employees (optionally of one
+    designation) x days or weeks. Params: mode (week|day), start, count,
+    designation, sort (name|overbooked), page. Raises ValueError on bad input.
+    """
+    mode = params.get('mode', 'week')
+    if mode not in UTILIZATION_MODES:
+        raise ValueError("'mode' must be 'week' or 'day'.")
+    try:
+        start_date = date.fromisoformat(params['start']) if params.get('start') else today
+        count = int(params.get('count') or (DEFAULT_DAYS if mode == 'day' else DEFAULT_WEEKS))
+        page = max(int(params.get('page') or 1), 1)
+    except ValueError:
+        raise ValueError("'start' must be a YYYY-MM-DD date; 'count' and 'page' must be integers.")
+    if not EARLIEST_START <= start_date <= LATEST_START:
+        raise ValueError(f"'start' must be between {EARLIEST_START} and {LATEST_START}.")
+    max_count = MAX_DAYS if mode == 'day' else MAX_DAYS // 7
+    if count > max_count:
+        raise ValueError(f"The report may span at most {MAX_DAYS} days ('count' up to {max_count} for mode '{mode}').")
+    periods = utilization_periods(mode, start_date, max(count, 1))
+
+    employees_qs = Employee.objects.filter(is_active=True)
+    if params.get('designation'):
+        employees_qs = employees_qs.filter(designation=params['designation'])
+    employees = list(employees_qs.values_list('id', 'name', 'designation'))
+
+    sort = params.get('sort', 'name')
+    if sort == 'overbooked':
+        # Needs every employee's numbers, but the sparse engine makes that a cheap pass.
+        engine = build_utilization_engine(periods[0]['start'], periods[-1]['end'])
+        peak = {}
+        for employee_id, _, _ in employees:
+            booked, available = engine.period_hours(employee_id, periods)
+            peak[employee_id] = float(np.max(booked - available))
+        employees.sort(key=lambda e: (-peak[e[0]], e[1]))
+
+    total = len(employees)
+    page_employees = employees[(page - 1) * PAGE_SIZE:page * PAGE_SIZE]
+    if sort != 'overbooked':
+        engine = build_utilization_engine(periods[0]['start'], periods[-1]['end'], [e[0] for e in page_employees])
+
+    rows = []
+    for employee_id, name, designation in page_employees:
+        booked, available = engine.period_hours(employee_id, periods)
+        rows.append({
+            'employee_id': employee_id,
+            'name': name,
+            'designation': designation,
+            'cells': [
+                {'booked_hours': b, 'available_hours': a, 'utilization': _utilization(b, a)}
+                for b, a in zip(booked.tolist(), available.tolist())
+            ],
+        })
+
+    return {
+        'mode': mode,
+        'start': periods[0]['start'].isoformat(),
+        'end': periods[-1]['end'].isoformat(),
+        'periods': [{'start': p['start'].isoformat(), 'end': p['end'].isoformat(), 'label': p['label']} for p in periods],
+        'page': page,
+        'page_size': PAGE_SIZE,
+        'total': total,
+        'rows': rows,
+    }
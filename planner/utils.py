@@ -1,6 +1,95 @@
 # planner/utils.py
 
-from datetime import date, timedelta
+from datetime import date
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+# Define this constant at the top of the file to avoid "magic numbers"
+CR = 10_000_000
+
+# Activity start dates accepted from imports and bulk edits: far enough inside
+# the calendar that end dates and working-day shifts cannot overflow it.
+EARLIEST_ACTIVITY_DATE = date(1900, 1, 1)
+LATEST_ACTIVITY_DATE = date(2999, 12, 31)
+
+class WorkingCalendar:
+    """
+    Business-day index built once from a collection of non-working dates.
+
+    Every date is mapped to its weekday ordinal (the number of Mon-Fri days
+    before it), and the weekday holidays are kept as a sorted list of those
+    ordinals. Counting working days between two dates and finding the date
+    N working days after another are then a bisect into that list instead of
+    a day-by-day walk, and neither is bound to a fixed horizon.
+    """
+
+    def __init__(self, holidays=None):
+        off_days = {d.toordinal() for d in (holidays or []) if d.weekday() < 5}
+        self._holiday_ordinals = sorted(off_days)
+        self._holiday_set = set(self._holiday_ordinals)
+        # Weekday ordinals of holidays, sorted; rank lookups bisect into this.
+        self._holiday_weekday_index = [self._weekday_ordinal(o) for o in self._holiday_ordinals]
+        # H[k] - k is non-decreasing, which lets nth_working_day invert the rank.
+        self._shifted_index = [w - k for k, w in enumerate(self._holiday_weekday_index)]
+
+    @staticmethod
+    def _weekday_ordinal(ordinal):
+        # date(1, 1, 1) is a Monday, so (ordinal - 1) counts days since a Monday.
+        weeks, day = divmod(ordinal - 1, 7)
+        return weeks * 5 + min(day, 5)
+
+    def with_days_off(self, days_off):
+        """Returns a new calendar that also treats the given dates as non-working."""
+        if not days_off:
+            return self
+        combined = [date.fromordinal(o) for o in self._holiday_ordinals]
+        combined.extend(days_off)
+        return WorkingCalendar(combined)
+
+    def is_working_day(self, day):
+        return day.weekday() < 5 and day.toordinal() not in self._holiday_set
+
+    def working_days_before(self, day):
+        """Number of working days strictly before the given date (its rank)."""
+        weekday_ord = self._weekday_ordinal(day.toordinal())
+        return weekday_ord - bisect_left(self._holiday_weekday_index, weekday_ord)
+
+    def working_days_between(self, start_date, end_date):
+        """Counts working days between two dates, inclusive."""
+        if start_date > end_date:
+            return 0
+        end_rank = self._weekday_ordinal(end_date.toordinal() + 1)
+        end_rank -= bisect_left(self._holiday_weekday_index, end_rank)
+        return end_rank - self.working_days_before(start_date)
+
+    def nth_working_day(self, start_date, n):
+        """
+        Returns the date of the n-th working day counting from start_date
+        (start_date itself counts if it is a working day).
+        """
+        if n <= 0:
+            return start_date
+        target_rank = self.working_days_before(start_date) + n - 1
+        skipped = bisect_right(self._shifted_index, target_rank)
+        weeks, day = divmod(target_rank + skipped, 5)
+        return date.fromordinal(weeks * 7 + day + 1)
+
+    def shift_working_days(self, day, n):
+        """
+        Moves a date by n working days (backwards if n is negative). A date that
+        is not a working day first snaps to the next working day, so a shift of 0
+        returns the first working day on or after it.
+        """
+        target_rank = max(self.working_days_before(day) + n, 0)
+        skipped = bisect_right(self._shifted_index, target_rank)
+        weeks, weekday = divmod(target_rank + skipped, 5)
+        return date.fromordinal(weeks * 7 + weekday + 1)
+
+def _as_calendar(holidays):
+    if isinstance(holidays, WorkingCalendar):
+        return holidays
+    return WorkingCalendar(holidays)
 
 def calculate_end_date(start_date, duration_days, holidays, assignee_leaves=None):
     """
@@ -10,108 +99,95 @@ def calculate_end_date(start_date, duration_days, holidays, assignee_leaves=None
     Args:
         start_date (date): The starting date.
         duration_days (int): Number of working days required.
-        holidays (list): List of company holiday dates.
+        holidays (list | WorkingCalendar): Company holiday dates, or a prebuilt calendar.
         assignee_leaves (list, optional): List of dates where the assignee is on leave.
     """
     if duration_days <= 0:
         return start_date
 
-    # Convert to sets for faster lookup
-    holidays_set = set(holidays) if holidays else set()
-    leaves_set = set(assignee_leaves) if assignee_leaves else set()
-
-    work_days_counted = 0
-    current_date = start_date
-    
-    while work_days_counted < duration_days:
-        # Check conditions: Weekend (Sat=5, Sun=6) OR Holiday OR Leave
-        is_weekend = current_date.weekday() >= 5
-        is_holiday = current_date in holidays_set
-        is_leave = current_date in leaves_set
-        
-        # Only count as a "working day" if none of the above are true
-        if not is_weekend and not is_holiday and not is_leave:
-            work_days_counted += 1
-        
-        # If we haven't reached the duration yet, move to next day
-        if work_days_counted < duration_days:
-            current_date += timedelta(days=1)
-            
-    return current_date
+    work_calendar = _as_calendar(holidays)
+    if assignee_leaves:
+        work_calendar = work_calendar.with_days_off(assignee_leaves)
+    return work_calendar.nth_working_day(start_date, duration_days)
 
 def count_working_days(start_date, end_date, holidays):
     """Counts the number of working days between two dates, inclusive."""
-    if start_date > end_date:
-        return 0
-    
-    working_days = 0
-    current_date = start_date
-    holidays_set = set(holidays)
-    
-    while current_date <= end_date:
-        if current_date.weekday() < 5 and current_date not in holidays_set:
-            working_days += 1
-        current_date += timedelta(days=1)
-    return working_days
+    return _as_calendar(holidays).working_days_between(start_date, end_date)
 
-def calculate_effort_from_value(value, brackets):
+class EffortCurve:
     """
-    Calculates the estimated effort in days based on a project's value,
-    using linear interpolation between configured brackets.
+    Piecewise-linear project value -> effort days curve compiled from a
+    ProjectType's effort brackets. Points are sorted once; single lookups
+    bisect, and evaluate_many() uses numpy.interp. Outside the brackets the
+    curve keeps the original rules: scale from (0, 0) below the first
+    bracket, extrapolate along the top two brackets above the last one.
     """
-    if not brackets or len(brackets) < 1:
-        return 0
 
-    # Sort brackets by project_value to be safe
-    sorted_brackets = sorted(brackets, key=lambda b: b.project_value)
-    
-    # Case 1: Value is below the lowest bracket
-    if value <= sorted_brackets[0].project_value:
-        first_bracket = sorted_brackets[0]
-        # Scale proportionally from (0, 0) to the first bracket
-        if first_bracket.project_value == 0: return first_bracket.effort_days
-        return (value / first_bracket.project_value) * first_bracket.effort_days
-
-    # Case 2: Value is above the highest bracket
-    if value >= sorted_brackets[-1].project_value:
-        # Extrapolate using the top two brackets
-        if len(sorted_brackets) < 2:
-            return sorted_brackets[-1].effort_days
-            
-        last_bracket = sorted_brackets[-1]
-        second_last_bracket = sorted_brackets[-2]
-        
-        x1, y1 = second_last_bracket.project_value, second_last_bracket.effort_days
-        x2, y2 = last_bracket.project_value, last_bracket.effort_days
+    def __init__(self, points):
+        points = sorted(points, key=lambda p: p[0])
+        self.values = [v for v, _ in points]
+        self.efforts = [e for _, e in points]
+        self._values_arr = np.array(self.values, dtype=float)
+        self._efforts_arr = np.array(self.efforts, dtype=float)
+
+    @classmethod
+    def from_brackets(cls, brackets):
+        return cls((b.project_value, b.effort_days) for b in brackets)
+
+    def __len__(self):
+        return len(self.values)
+
+    def evaluate(self, value):
+        """Estimated effort in days for a single project value."""
+        values, efforts = self.values, self.efforts
+        if not values:
+            return 0
+
+        # Case 1: Value is below the lowest bracket, scale proportionally from (0, 0)
+        if value <= values[0]:
+            if values[0] == 0: return efforts[0]
+            return (value / values[0]) * efforts[0]
+
+        # Case 2: Value is above the highest bracket, extrapolate using the top two brackets
+        if value >= values[-1]:
+            if len(values) < 2:
+                return efforts[-1]
+            x1, y1, x2, y2 = values[-2], efforts[-2], values[-1], efforts[-1]
+        else:
+            # Case 3: Value is between two brackets (Interpolation)
+            upper = bisect_right(values, value)
+            x1, y1, x2, y2 = values[upper - 1], efforts[upper - 1], values[upper], efforts[upper]
 
         if (x2 - x1) == 0: return y2
-        
-        # Extrapolation formula
-        effort = y1 + ((value - x1) * (y2 - y1)) / (x2 - x1)
-        return effort
-
-    # Case 3: Value is between two brackets (Interpolation)
-    lower_bracket = None
-    upper_bracket = None
-    for bracket in sorted_brackets:
-        if bracket.project_value <= value:
-            lower_bracket = bracket
-        if bracket.project_value > value:
-            upper_bracket = bracket
-            break
-
-    if lower_bracket and upper_bracket:
-        x1, y1 = lower_bracket.project_value, lower_bracket.effort_days
-        x2, y2 = upper_bracket.project_value, upper_bracket.effort_days
-        
-        if (x2 - x1) == 0: return y2
-        
-        # Interpolation formula
-        effort = y1 + ((value - x1) * (y2 - y1)) / (x2 - x1)
-        return effort
-    
-    # Fallback if something goes wrong
-    return 0
+        return y1 + ((value - x1) * (y2 - y1)) / (x2 - x1)
+
+    def evaluate_many(self, values):
+        """Vectorised evaluate() over an array of project values."""
+        v = np.asarray(values, dtype=float)
+        xs, ys = self._values_arr, self._efforts_arr
+        if not len(xs):
+            return np.zeros(v.shape)
+
+        result = np.interp(v, xs, ys)
+
+        above = v >= xs[-1]
+        if len(xs) < 2:
+            result[above] = ys[-1]
+        elif xs[-1] == xs[-2]:
+            result[above] = ys[-1]
+        else:
+            result[above] = ys[-2] + (v[above] - xs[-2]) * (ys[-1] - ys[-2]) / (xs[-1] - xs[-2])
+
+        below = v <= xs[0]
+        result[below] = ys[0] if xs[0] == 0 else (v[below] / xs[0]) * ys[0]
+        return result
+
+def calculate_effort_from_value(value, brackets):
+    """
+    Calculates the estimated effort in days based on a project's value,
+    using linear interpolation between configured brackets.
+    """
+    return EffortCurve.from_brackets(brackets or []).evaluate(value)
 
 def calculate_overlap_working_days(leave_start, leave_end, period_start, period_end, holidays):
     """
@@ -121,4 +197,22 @@ def calculate_overlap_working_days(leave_start, leave_end, period_start, period_
     actual_start = max(leave_start, period_start)
     actual_end = min(leave_end, period_end)
     
-    return count_working_days(actual_start, actual_end, holidays)
\ No newline at end of file
+    return count_working_days(actual_start, actual_end, holidays)
+
+def parse_int(value, name, minimum, maximum):
+    """
+    Parses a whole number from JSON or a query string, rejecting booleans and
+    fractions. Raises ValueError naming the field if it is not an integer in
+    [minimum, maximum].
+    """
+    if isinstance(value, bool):
+        raise ValueError(f"'{name}' must be an integer.")
+    try:
+        number = int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError(f"'{name}' must be an integer.")
+    if number != value and str(number) != str(value).strip():
+        raise ValueError(f"'{name}' must be an integer.")
+    if not minimum <= number <= maximum:
+        raise ValueError(f"'{name}' must be between {minimum} and {maximum}.")
+    return number
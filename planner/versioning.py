@@ -0,0 +1,79 @@
+# planner/versioning.py
+
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, time, timezone as dt_timezone
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import add_never_cache_headers
+from django.views.decorators.http import condition
+
+from .models import PlanningDataVersion
+
+_state = threading.local()
+
+def bump_planning_version():
+    """Marks planning data as changed: one UPDATE, so it is cheap enough to run per saved row."""
+    if getattr(_state, 'depth', 0):
+        _state.pending = True
+        return
+    updated = PlanningDataVersion.objects.filter(pk=1).update(version=F('version') + 1, updated_at=timezone.now())
+    if not updated:
+        PlanningDataVersion.objects.get_or_create(pk=1, defaults={'version': 1})
+
+@contextmanager
+def coalesced_version_bumps():
+    """Collapses every bump made inside the block (e.g. one per deleted row) into a single one at the end."""
+    depth = getattr(_state, 'depth', 0)
+    _state.depth = depth + 1
+    try:
+        yield
+    finally:
+        _state.depth = depth
+        if depth == 0 and getattr(_state, 'pending', False):
+            _state.pending = False
+            bump_planning_version()
+
+def get_planning_version():
+    """Returns (version, updated_at) of the planning data."""
+    row = PlanningDataVersion.objects.filter(pk=1).values_list('version', 'updated_at').first()
+    return row or (0, datetime(2000, 1, 1, tzinfo=dt_timezone.utc))
+
+def _request_version(request):
+    # Looked up once per request; both the ETag and the Last-Modified callbacks need it.
+    if not hasattr(request, '_planning_version'):
+        request._planning_version = get_planning_version()
+    return request._planning_version
+
+def planning_etag(request, *args, **kwargs):
+    # Pages also depend on today's date (periods, the 'today' marker), so it is part of the tag.
+    version, _ = _request_version(request)
+    return f"{version}-{date.today().isoformat()}"
+
+def planning_last_modified(request, *args, **kwargs):
+    _, updated_at = _request_version(request)
+    start_of_today = timezone.make_aware(datetime.combine(date.today(), time.min))
+    return max(updated_at, start_of_today)
+
+_planning_condition = condition(etag_func=planning_etag, last_modified_func=planning_last_modified)
+
+def planning_data_condition(view_func):
+    """
+    Answers GET/HEAD with 304 Not Modified while the planning data and the date
+    are unchanged. A response rendered with pending flash messages (e.g. the
+    over-allocation warnings after a save) is never revalidated or stored, so
+    the messages are shown once and a later 304 cannot bring them back.
+    """
+    conditional_view = _planning_condition(view_func)
+
+    @wraps(view_func)
+    def inner(request, *args, **kwargs):
+        if len(get_messages(request)):
+            response = view_func(request, *args, **kwargs)
+            add_never_cache_headers(response)
+            return response
+        return conditional_view(request, *args, **kwargs)
+    return inner
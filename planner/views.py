@@ -3,139 +3,90 @@
 from django.shortcuts import render, redirect, get_object_or_404
 from .models import (Employee, ProjectType, Segment, Category, Holiday, 
                      Project, Activity, GeneralSettings, CapacitySettings, 
-                     SalesForecast, EffortBracket, Leave)
-from datetime import date, timedelta, datetime
-from collections import OrderedDict, defaultdict
+                     SalesForecast, EffortBracket, Leave, Scenario)
+from datetime import date, timedelta
 from django.db.models import Min, Max
 from .forms import ActivityForm, ProjectForm, LeaveForm
 from django.urls import reverse
 from urllib.parse import urlencode
 from django.http import JsonResponse
+from django.contrib import messages
+from django.conf import settings
 import json
-from .utils import calculate_end_date, count_working_days, calculate_effort_from_value, calculate_overlap_working_days
-import calendar
+import csv
+import hmac
+import io
+from .availability import find_available_candidates
+from .activity_import import import_activity_file, import_activity_rows, iter_json_rows
+from .batch_edit import batch_edit_activities, BatchEditError
+from .capacity_cache import capacity_cache_stats, get_simulation_report
+from .dependencies import critical_path, would_create_cycle
+from .scheduler import auto_schedule_activities
+from .scenarios import compare_scenarios, save_scenario
+from .conflicts import activity_conflicts, describe_conflict, build_conflicts_report
+from .capacity_snapshots import get_capacity_page_report
+from .demand_simulation import DEFAULT_TRIALS, DEFAULT_SEED
 from django.views.decorators.http import require_POST
-from itertools import groupby
-
-# Define this constant at the top of the file to avoid "magic numbers"
-CR = 10_000_000
-
-# --- Helper to prepare leaves map for Gantt ---
-def _get_leaves_map():
+from django.views.decorators.csrf import csrf_exempt
+from .forecast_import import sync_sales_forecasts, import_forecast_file
+from .gantt import build_gantt_payload, chart_bounds, DEFAULT_PAGE_SIZE, WINDOW_DAYS
+from .utilization import build_utilization_report, PAGE_SIZE as UTILIZATION_PAGE_SIZE
+from .utils import CR
+from .versioning import planning_data_condition, coalesced_version_bumps
+
+# --- Over-allocation warnings ---
+def _warn_about_conflicts(request, activity):
+    """Flashes a warning for every booking or leave the saved activity clashes with."""
+    for clash in activity_conflicts(activity):
+        messages.warning(request, f"{activity.activity_name}: {describe_conflict(clash)}")
+
+# --- Gantt chart ---
+def _gantt_config(activities_qs, project=None, grouping_method='none', sort_order='asc'):
     """
-    Returns a dictionary mapping employee names to a list of ISO date strings
-    representing their leave days.
-    Structure: {'John Doe': ['2023-01-01', '2023-01-02'], ...}
+    Settings for the lazily loaded Gantt: the page only renders the chart frame,
+    rows and date windows are fetched from the Gantt API as the user scrolls.
     """
-    leaves_qs = Leave.objects.select_related('employee').all()
-    leaves_map = defaultdict(set) # Use set for faster lookup, convert to list for JSON
-    
-    for leave in leaves_qs:
-        current = leave.start_date
-        while current <= leave.end_date:
-            leaves_map[leave.employee.name].add(current.isoformat())
-            current += timedelta(days=1)
-            
-    # Convert sets to lists for JSON serialization
-    return {k: list(v) for k, v in leaves_map.items()}
-
-def _prepare_gantt_context(activities_qs):
-    activities_list = list(activities_qs)
     today = date.today()
-    
-    holidays_map = {h.date: h.description for h in Holiday.objects.all()}
-
-    min_start_dates = [a.start_date for a in activities_list if a.start_date]
-    max_end_dates = [a.end_date for a in activities_list if a.end_date]
-    gantt_start_date = min(min_start_dates) - timedelta(days=7) if min_start_dates else today - timedelta(days=7)
-    gantt_end_date = max(max_end_dates) + timedelta(days=60) if max_end_dates else today + timedelta(days=60)
-            
-    gantt_data = {'start_date': gantt_start_date, 'end_date': gantt_end_date, 'months': OrderedDict()}
-    header_dates = [gantt_start_date + timedelta(days=i) for i in range((gantt_end_date - gantt_start_date).days + 1)]
-    for d in header_dates:
-        month_year = d.strftime("%B %Y")
-        gantt_data['months'][month_year] = gantt_data['months'].get(month_year, 0) + 1
-    gantt_data['header_dates'] = header_dates
-    
+    start_date, end_date = chart_bounds(activities_qs, today)
     return {
-        'activities': activities_list,
-        'gantt_data': gantt_data,
-        'today': today,
-        'holidays_map': holidays_map,
+        'api_url': reverse('planner_gantt_data'),
+        'batch_url': reverse('planner_batch_edit'),
+        'project': project.pk if project else None,
+        'group_by': grouping_method,
+        'sort': sort_order,
+        'today': today.isoformat(),
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'days': (end_date - start_date).days + 1,
+        'page_size': DEFAULT_PAGE_SIZE,
+        'window_days': WINDOW_DAYS,
     }
 
+@planning_data_condition
+def gantt_data_view(request):
+    """JSON rows, holidays and leaves for one page of Gantt rows and one date window."""
+    try:
+        payload = build_gantt_payload(request.GET, date.today())
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse(payload)
+
 def sales_forecast_view(request):
     if request.method == 'POST':
         if 'save_data' in request.POST:
             data = json.loads(request.POST.get('data', '[]'))
-            SalesForecast.objects.all().delete()
-            
-            for item in data:
-                opportunity_id = item.get('Opportunity', '')
-                if not opportunity_id: 
-                    continue
-                    
-                try:
-                    amount_str = str(item.get('Total Amount (in Cr)', item.get('Total Amount', '0'))).replace(',', '')
-                    total_amount = float(amount_str) * CR if amount_str else 0.0
-                    prob_str = str(item.get('Probability(%)', '0')).replace('%', '')
-                    probability = float(prob_str) if prob_str else 0.0
-                    
-                    start_date_val = None
-                    end_date_val = None
-                    
-                    start_date_str = item.get('Start Date', '')
-                    if start_date_str:
-                        try:
-                            start_date_val = datetime.strptime(start_date_str, '%Y-%m-%d').date()
-                        except ValueError:
-                            try:
-                                start_date_val = datetime.strptime(start_date_str, '%d-%m-%Y').date()
-                            except ValueError:
-                                pass
-                    
-                    end_date_str = item.get('End date', '')
-                    if end_date_str:
-                        try:
-                            end_date_val = datetime.strptime(end_date_str, '%Y-%m-%d').date()
-                        except ValueError:
-                            try:
-                                end_date_val = datetime.strptime(end_date_str, '%d-%m-%Y').date()
-                            except ValueError:
-                                pass
-                    
-                    SalesForecast.objects.update_or_create(
-                        opportunity=opportunity_id,
-                        defaults={
-                            'total_amount': total_amount,
-                            'probability': probability,
-                            'segment': item.get('Segment', ''),
-                            'category': item.get('Category', ''),
-                            'solution': item.get('Solution', ''),
-                            'start_date': start_date_val,
-                            'end_date': end_date_val
-                        }
-                    )
-                except (ValueError, TypeError):
-                    continue
-                    
-            return JsonResponse({'status': 'success'})
+            result = sync_sales_forecasts(data)
+            return JsonResponse({'status': 'success', **result})
             
         if 'delete_all' in request.POST:
-            SalesForecast.objects.all().delete()
+            with coalesced_version_bumps():
+                SalesForecast.objects.all().delete()
             return redirect('planner_sales_forecast')
 
-    project_types_with_brackets = ProjectType.objects.prefetch_related('effort_brackets')
-    pt_bracket_map = {pt.id: list(pt.effort_brackets.all()) for pt in project_types_with_brackets}
-    pt_map = {(pt.segment.name, pt.category.name): pt.id for pt in ProjectType.objects.select_related('segment', 'category')}
-    
     forecast_data = list(SalesForecast.objects.all())
     total_forecasted_effort = 0
     for item in forecast_data:
-        pt_id = pt_map.get((item.segment, item.category))
-        brackets = pt_bracket_map.get(pt_id, [])
-        item.calculated_effort = calculate_effort_from_value(item.total_amount, brackets)
-        total_forecasted_effort += item.calculated_effort
+        total_forecasted_effort += item.effort_days
         item.total_amount = item.total_amount / CR
 
     context = {
@@ -145,6 +96,53 @@ def sales_forecast_view(request):
     }
     return render(request, 'planner/sales_forecast.html', context)
 
+def _has_forecast_upload_token(request):
+    expected = settings.FORECAST_UPLOAD_TOKEN
+    supplied = request.headers.get('X-Forecast-Upload-Token', '')
+    return bool(expected) and hmac.compare_digest(supplied.encode(), expected.encode())
+
+@csrf_exempt  # Called by the nightly CRM export job, which has no browser session; it sends a shared token instead.
+@require_POST
+def upload_sales_forecast_view(request):
+    """
+    Streams an uploaded CSV/XLSX forecast file into the database in batches.
+    Requires the X-Forecast-Upload-Token header (settings.FORECAST_UPLOAD_TOKEN).
+    POST 'file'; forecasts missing from the file are kept unless 'mode=replace' is sent.
+    """
+    if not _has_forecast_upload_token(request):
+        return JsonResponse({'status': 'error', 'message': "Invalid or missing upload token."}, status=403)
+    upload = request.FILES.get('file')
+    if upload is None:
+        return JsonResponse({'status': 'error', 'message': "No file uploaded."}, status=400)
+    mode = request.POST.get('mode', 'merge')
+    if mode not in ('merge', 'replace'):
+        return JsonResponse({'status': 'error', 'message': "'mode' must be 'merge' or 'replace'."}, status=400)
+    delete_missing = mode == 'replace'
+    try:
+        result = import_forecast_file(upload, upload.name, delete_missing=delete_missing)
+    except (ValueError, csv.Error) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'status': 'success', **result})
+
+@require_POST
+def import_activities_view(request):
+    """
+    Bulk-imports activities: an uploaded .csv/.json 'file', or a JSON body (a list,
+    or {'activities': [...]}). Columns: project code, activity name, assignee name,
+    start date, duration, remark. Valid rows are created, invalid ones reported.
+    """
+    upload = request.FILES.get('file')
+    try:
+        if upload is not None:
+            result = import_activity_file(upload, upload.name)
+        elif request.content_type == 'application/json':
+            result = import_activity_rows(iter_json_rows(io.BytesIO(request.body)))
+        else:
+            return JsonResponse({'status': 'error', 'message': "Upload a file or POST a JSON body."}, status=400)
+    except (ValueError, csv.Error) as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'status': 'success', **result})
+
 def project_list_view(request):
     form = ProjectForm()
     if request.method == 'POST':
@@ -181,6 +179,7 @@ def project_list_view(request):
     }
     return render(request, 'planner/project_list.html', context)
 
+@planning_data_condition
 def consolidated_planner_view(request):
     form = ActivityForm()
     grouping_method = request.GET.get('group_by', 'project')
@@ -189,13 +188,13 @@ def consolidated_planner_view(request):
     if request.method == 'POST' and 'add_activity' in request.POST:
         form = ActivityForm(request.POST)
         if form.is_valid():
-            form.save()
+            _warn_about_conflicts(request, form.save())
             query_params = {'group_by': grouping_method}
             if sort_order: query_params['sort'] = sort_order
             return redirect(f"{reverse('planner_consolidated_planner')}?{urlencode(query_params)}")
 
-    all_activities_qs = Activity.objects.select_related('project__segment', 'project__team_lead', 'project_type__category', 'assignee').all()
-    context = _prepare_gantt_context(all_activities_qs)
+    if grouping_method not in ('engineer', 'none'):
+        grouping_method = 'project'
 
     # Fetch filter options
     all_projects = Project.objects.all()
@@ -203,96 +202,34 @@ def consolidated_planner_view(request):
     team_leads = Employee.objects.filter(led_projects__in=all_projects).distinct().order_by('name')
     assignees = Employee.objects.filter(is_active=True).order_by('name')
 
-    display_data = defaultdict(list)
-    if grouping_method == 'engineer':
-        sorted_activities = sorted(context['activities'], key=lambda a: (a.assignee.name if a.assignee else "Unassigned", a.start_date))
-        for act in sorted_activities:
-            display_data[act.assignee.name if act.assignee else "Unassigned"].append(act)
-            
-    elif grouping_method == 'none':
-        # Ungrouped mode with sorting
-        reverse_sort = True if sort_order == 'desc' else False
-        # Use a safe key for sorting: if start_date is None, use min or max date to avoid comparison errors
-        sorted_activities = sorted(
-            context['activities'], 
-            key=lambda a: a.start_date if a.start_date else (date.max if reverse_sort else date.min), 
-            reverse=reverse_sort
-        )
-        display_data['All Activities'] = sorted_activities
-        
-    else: 
-        # Default fallback to 'project'
-        grouping_method = 'project'
-        activities_by_project = defaultdict(list)
-        for act in context['activities']:
-            activities_by_project[act.project_id].append(act)
-        for project in Project.objects.order_by('project_id'):
-            display_data[project.project_id] = sorted(activities_by_project.get(project.id, []), key=lambda a: a.start_date)
-
-    gantt_init_data = {
-        'activities': [
-            {
-                'pk': act.pk,
-                'name': act.activity_name,
-                'assignee': act.assignee.name if act.assignee else None,
-                'start_date': act.start_date.isoformat() if act.start_date else None,
-                'end_date': act.end_date.isoformat() if act.end_date else None,
-            } for act in context['activities']
-        ],
-        'holidays': [h.isoformat() for h in context['holidays_map'].keys()],
-        'leaves': _get_leaves_map(),  # NEW: Inject leaves
-        'today': context['today'].isoformat()
-    }
-
-    context.update({
+    context = {
         'form': form,
         'active_nav': 'projects',
-        'display_data': dict(display_data),
         'grouping_method': grouping_method,
         'sort_order': sort_order,
-        'gantt_init_data': gantt_init_data,
+        'gantt_config': _gantt_config(Activity.objects.all(), None, grouping_method, sort_order),
         'segments': segments,
         'team_leads': team_leads,
         'assignees': assignees
-    })
+    }
     return render(request, 'planner/activity_planner.html', context)
 
+@planning_data_condition
 def activity_planner_view(request, project_pk):
     project = get_object_or_404(Project, pk=project_pk)
     form = ActivityForm(initial={'project': project})
     if request.method == 'POST' and 'add_activity' in request.POST:
         form = ActivityForm(request.POST)
         if form.is_valid():
-            form.save()
+            _warn_about_conflicts(request, form.save())
             return redirect('planner_activity_planner', project_pk=project.pk)
 
-    activities_qs = Activity.objects.filter(project=project).select_related(
-        'project', 'project_type__category', 'assignee'
-    ).order_by('start_date')
-
-    context = _prepare_gantt_context(activities_qs)
-    
-    gantt_init_data = {
-        'activities': [
-            {
-                'pk': act.pk,
-                'name': act.activity_name,
-                'assignee': act.assignee.name if act.assignee else None,
-                'start_date': act.start_date.isoformat() if act.start_date else None,
-                'end_date': act.end_date.isoformat() if act.end_date else None,
-            } for act in context['activities']
-        ],
-        'holidays': [h.isoformat() for h in context['holidays_map'].keys()],
-        'leaves': _get_leaves_map(),  # NEW: Inject leaves
-        'today': context['today'].isoformat()
-    }
-
-    context.update({
+    context = {
         'project': project,
         'form': form,
         'active_nav': 'projects',
-        'gantt_init_data': gantt_init_data
-    })
+        'gantt_config': _gantt_config(Activity.objects.filter(project=project), project),
+    }
     return render(request, 'planner/activity_planner.html', context)
 
 # ... (rest of the views remain unchanged) ...
@@ -440,7 +377,7 @@ def edit_activity_view(request, pk):
     if request.method == 'POST':
         form = ActivityForm(request.POST, instance=activity)
         if form.is_valid():
-            form.save()
+            _warn_about_conflicts(request, form.save())
             return redirect(next_url or default_redirect_url)
     else:
         form = ActivityForm(instance=activity)
@@ -449,6 +386,7 @@ def edit_activity_view(request, pk):
         'activity': activity, 
         'form': form, 
         'project': activity.project,
+        'conflicts': [describe_conflict(clash) for clash in activity_conflicts(activity)],
         'next_url': next_url or default_redirect_url
     }
     return render(request, 'planner/edit_activity.html', context)
@@ -489,327 +427,140 @@ def delete_project_type_view(request, pk):
     get_object_or_404(ProjectType, pk=pk).delete()
     return redirect(f"{reverse('planner_configuration')}#project-types")
 
+@planning_data_condition
 def capacity_plan_view(request):
     view_type = request.GET.get('view_type', 'month')
-    today = date.today()
-    holidays = list(Holiday.objects.values_list('date', flat=True))
-    general_settings, _ = GeneralSettings.objects.get_or_create(pk=1)
-    capacity_settings = {c: CapacitySettings.objects.get_or_create(designation=c)[0] for c, _ in Employee.DESIGNATION_CHOICES}
-    
-    workforce_counts = {
-        'ENGINEER': Employee.objects.filter(designation='ENGINEER', is_active=True).count(),
-        'TEAM_LEAD': Employee.objects.filter(designation='TEAM_LEAD', is_active=True).count(),
-        'MANAGER': Employee.objects.filter(designation='MANAGER', is_active=True).count()
+    report, snapshot, stale = get_capacity_page_report(view_type, date.today())
+    simulation = get_simulation_report(view_type, date.today()) if request.GET.get('mode') == 'simulation' else None
+    context = {
+        'active_nav': 'capacity_plan', 
+        'view_type': view_type,
+        'snapshot_computed_at': snapshot.computed_at if snapshot else None,
+        'snapshot_is_stale': stale,
+        'simulation': simulation,
+        **report,
     }
-    
-    periods = []
-    if view_type == 'week':
-        start_date = today - timedelta(days=today.weekday())
-        for i in range(24): 
-            p_start = start_date + timedelta(weeks=i)
-            p_end = p_start + timedelta(days=6)
-            periods.append({
-                'start': p_start,
-                'end': p_end,
-                'key': p_start.strftime('%Y-W%W'),
-                'label': p_start.strftime('W%W %d %b')
-            })
-    elif view_type == 'quarter':
-        q_month = (today.month - 1) // 3 * 3 + 1
-        start_date = date(today.year, q_month, 1)
-        for i in range(8):
-            year_offset = (start_date.month + (i*3) - 1) // 12
-            month = (start_date.month + (i*3) - 1) % 12 + 1
-            year = start_date.year + year_offset
-            p_start = date(year, month, 1)
-            
-            if month >= 10:
-                p_end = date(year + 1, 1, 1) - timedelta(days=1)
-            else:
-                p_end = date(year, month + 3, 1) - timedelta(days=1)
-            
-            q_label = f"Q{(month-1)//3 + 1} {year}"
-            periods.append({'start': p_start, 'end': p_end, 'key': q_label, 'label': q_label})
-    else: 
-        start_date = today.replace(day=1)
-        for i in range(12):
-            year_offset = (start_date.month + i - 1) // 12
-            month = (start_date.month + i - 1) % 12 + 1
-            year = start_date.year + year_offset
-            p_start = date(year, month, 1)
-            _, last_day = calendar.monthrange(year, month)
-            p_end = date(year, month, last_day)
-            periods.append({
-                'start': p_start, 
-                'end': p_end, 
-                'key': p_start.strftime('%Y-%m'), 
-                'label': p_start.strftime('%b %Y')
-            })
+    response = render(request, 'planner/capacity_plan.html', context)
+    if stale:
+        # Tag the stale copy with its own version so the next poll does not get a 304 for it.
+        response['ETag'] = f'"{snapshot.data_version}-{snapshot.report_date.isoformat()}"'
+        response['Cache-Control'] = 'no-cache'
+    return response
+
+@planning_data_condition
+def capacity_simulation_view(request):
+    """JSON Monte Carlo headcount percentiles. Params: view_type, trials, seed."""
+    try:
+        trials = int(request.GET.get('trials') or DEFAULT_TRIALS)
+        seed = int(request.GET.get('seed') or DEFAULT_SEED)
+        result = get_simulation_report(request.GET.get('view_type', 'month'), date.today(), trials, seed)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'status': 'success', **result})
 
-    date_to_key = {}
-    if periods:
-        min_date = periods[0]['start']
-        max_date = periods[-1]['end']
-        curr = min_date
-        while curr <= max_date:
-            for p in periods:
-                if p['start'] <= curr <= p['end']:
-                    date_to_key[curr] = p['key']
-                    break
-            curr += timedelta(days=1)
-
-    all_leaves = Leave.objects.select_related('employee').filter(end_date__gte=min_date, start_date__lte=max_date)
-    leaves_by_designation = defaultdict(list)
-    for leave in all_leaves:
-        leaves_by_designation[leave.employee.designation].append(leave)
-
-    supply_data = defaultdict(dict)
-    for p in periods:
-        working_days = count_working_days(p['start'], p['end'], holidays)
-        period_days = (p['end'] - p['start']).days + 1
-        month_factor = period_days / 30.44 
-
-        for designation, count in workforce_counts.items():
-            settings = capacity_settings[designation]
-            
-            total_leave_man_days = 0
-            for leave in leaves_by_designation[designation]:
-                total_leave_man_days += calculate_overlap_working_days(
-                    leave.start_date, leave.end_date, 
-                    p['start'], p['end'], holidays
-                )
-            
-            gross_hours = ((count * working_days) - total_leave_man_days) * general_settings.working_hours_per_day
-            non_project_hours = count * (settings.monthly_meeting_hours + settings.monthly_leave_hours) * month_factor
-            efficiency_loss = (gross_hours - non_project_hours) * (settings.efficiency_loss_factor / 100)
-            net_hours = gross_hours - non_project_hours - efficiency_loss
-            
-            supply_data[designation][p['key']] = {
-                'available_hours': net_hours, 
-                'headcount': count
-            }
+# --- Utilization heatmap ---
+def _utilization_page_url(params, **changes):
+    query = params.copy()
+    for name, value in changes.items():
+        query[name] = value
+    return f"?{query.urlencode()}"
 
-    # -- TRACK DAILY DEMAND FOR WEEKLY MAX CALCULATION --
-    daily_demand = defaultdict(lambda: defaultdict(float)) # {designation: {date: hours}}
-    
-    live_workload_by_segment = defaultdict(lambda: defaultdict(float))
-    forecasted_workload_by_segment = defaultdict(lambda: defaultdict(float))
-    
-    for activity in Activity.objects.select_related('assignee', 'project__segment').filter(
-        assignee__isnull=False, start_date__isnull=False, end_date__isnull=False
-    ):
-        daily_hours = general_settings.working_hours_per_day
-        current_date = activity.start_date
-        while current_date <= activity.end_date:
-            if current_date.weekday() < 5 and current_date not in holidays:
-                # Track daily demand
-                daily_demand[activity.assignee.designation][current_date] += daily_hours
-                
-                # Keep tracking sum for segment charts
-                if current_date in date_to_key:
-                    m_key = date_to_key[current_date]
-                    if activity.project.segment:
-                        live_workload_by_segment[activity.project.segment.name][m_key] += daily_hours
-            current_date += timedelta(days=1)
-
-    project_types_with_brackets = ProjectType.objects.prefetch_related('effort_brackets')
-    pt_bracket_map = {pt.id: list(pt.effort_brackets.all()) for pt in project_types_with_brackets}
-    pt_map = {(pt.segment.name, pt.category.name): pt.id for pt in ProjectType.objects.select_related('segment', 'category')}
-    project_type_map = {pt.id: pt for pt in project_types_with_brackets}
-
-    for forecast in SalesForecast.objects.filter(start_date__isnull=False, end_date__isnull=False):
-        pt_id = pt_map.get((forecast.segment, forecast.category))
-        if not pt_id: continue
-        
-        brackets = pt_bracket_map.get(pt_id, [])
-        calculated_effort_days = calculate_effort_from_value(forecast.total_amount, brackets)
-        if calculated_effort_days <= 0: continue
-        
-        total_window_days = count_working_days(forecast.start_date, forecast.end_date, holidays)
-        if total_window_days <= 0: continue
-        
-        daily_effort_factor = calculated_effort_days / total_window_days
-        p_type = project_type_map.get(pt_id)
-        if not p_type: continue
-        
-        daily_eng_hours = general_settings.working_hours_per_day * (p_type.engineer_involvement / 100) * daily_effort_factor
-        daily_tl_hours = general_settings.working_hours_per_day * (p_type.team_lead_involvement / 100) * daily_effort_factor
-        daily_mgr_hours = general_settings.working_hours_per_day * (p_type.manager_involvement / 100) * daily_effort_factor
-        
-        total_daily_hours = daily_eng_hours + daily_tl_hours + daily_mgr_hours
-        
-        current_date = forecast.start_date
-        while current_date <= forecast.end_date:
-            if current_date.weekday() < 5 and current_date not in holidays:
-                # Track daily demand
-                daily_demand['ENGINEER'][current_date] += daily_eng_hours
-                daily_demand['TEAM_LEAD'][current_date] += daily_tl_hours
-                daily_demand['MANAGER'][current_date] += daily_mgr_hours
-
-                # Keep tracking sum for segment charts
-                if current_date in date_to_key:
-                    month_key = date_to_key[current_date]
-                    if forecast.segment:
-                        forecasted_workload_by_segment[forecast.segment][month_key] += total_daily_hours
-            current_date += timedelta(days=1)
-    
-    global_live_workload = defaultdict(float)
-    global_forecast_workload = defaultdict(float)
-    
-    # Calculate global sums for Charts (Workload Volume)
-    for activity in Activity.objects.filter(assignee__isnull=False, start_date__isnull=False, end_date__isnull=False):
-        current_date = activity.start_date
-        while current_date <= activity.end_date:
-            if current_date.weekday() < 5 and current_date not in holidays:
-                if current_date in date_to_key:
-                    m_key = date_to_key[current_date]
-                    global_live_workload[m_key] += general_settings.working_hours_per_day
-            current_date += timedelta(days=1)
-            
-    for forecast in SalesForecast.objects.filter(start_date__isnull=False, end_date__isnull=False):
-        pt_id = pt_map.get((forecast.segment, forecast.category))
-        if not pt_id: continue
-        brackets = pt_bracket_map.get(pt_id, [])
-        calculated_effort_days = calculate_effort_from_value(forecast.total_amount, brackets)
-        if calculated_effort_days <= 0: continue
-        total_window_days = count_working_days(forecast.start_date, forecast.end_date, holidays)
-        if total_window_days <= 0: continue
-        daily_effort_factor = calculated_effort_days / total_window_days
-        p_type = project_type_map.get(pt_id)
-        if not p_type: continue
-        
-        total_daily_hours = general_settings.working_hours_per_day * daily_effort_factor * (
-            (p_type.engineer_involvement + p_type.team_lead_involvement + p_type.manager_involvement) / 100
-        )
-        current_date = forecast.start_date
-        while current_date <= forecast.end_date:
-            if current_date.weekday() < 5 and current_date not in holidays:
-                if current_date in date_to_key:
-                    m_key = date_to_key[current_date]
-                    global_forecast_workload[m_key] += total_daily_hours
-            current_date += timedelta(days=1)
-
-    chart_data = []
-    for p in periods:
-        live = global_live_workload.get(p['key'], 0)
-        forecast = global_forecast_workload.get(p['key'], 0)
-        chart_data.append({
-            'month': p['label'], 
-            'live_workload': round(live, 1),
-            'forecasted_workload': round(forecast, 1),
-            'total': round(live + forecast, 1)
-        })
-    
-    segment_charts = []
-    all_segments = Segment.objects.all().order_by('name')
-    for segment in all_segments:
-        seg_data = {'name': segment.name, 'data': []}
-        for p in periods:
-            live = live_workload_by_segment[segment.name].get(p['key'], 0)
-            forecast = forecasted_workload_by_segment[segment.name].get(p['key'], 0)
-            seg_data['data'].append({
-                'month': p['label'],
-                'live_workload': round(live, 1),
-                'forecasted_workload': round(forecast, 1),
-                'total': round(live + forecast, 1)
-            })
-        segment_charts.append(seg_data)
+@planning_data_condition
+def utilization_view(request):
+    try:
+        report = build_utilization_report(request.GET, date.today())
+        error = None
+    except ValueError as e:
+        report, error = build_utilization_report({}, date.today()), str(e)
+    page, total = report['page'], report['total']
+    periods = report['periods']
+    step = date.fromisoformat(periods[-1]['end']) - date.fromisoformat(periods[0]['start'])
+    step_days = step.days + 1
+    context = {
+        'active_nav': 'utilization',
+        'report': report,
+        'error': error,
+        'designation': request.GET.get('designation', ''),
+        'sort': request.GET.get('sort', 'name'),
+        'designations': Employee.DESIGNATION_CHOICES,
+        'first_row': (page - 1) * UTILIZATION_PAGE_SIZE + 1 if total else 0,
+        'last_row': min(page * UTILIZATION_PAGE_SIZE, total),
+        'prev_page_url': _utilization_page_url(request.GET, page=page - 1) if page > 1 else None,
+        'next_page_url': _utilization_page_url(request.GET, page=page + 1) if page * UTILIZATION_PAGE_SIZE < total else None,
+        'earlier_url': _utilization_page_url(request.GET, start=(date.fromisoformat(report['start']) - timedelta(days=step_days)).isoformat()),
+        'later_url': _utilization_page_url(request.GET, start=(date.fromisoformat(report['end']) + timedelta(days=1)).isoformat()),
+    }
+    return render(request, 'planner/utilization.html', context)
 
-    report = []
-    for des_value, des_display in Employee.DESIGNATION_CHOICES:
-        des_data = {'designation': des_display, 'months': []}
-        settings = capacity_settings[des_value]
-        
-        for p in periods:
-            supply = supply_data[des_value].get(p['key'], {})
-            available_hours = supply.get('available_hours', 0)
-            headcount = supply.get('headcount', 0)
-            
-            # --- WEEKLY MAX REQUIREMENT LOGIC ---
-            # 1. Identify all dates in this period
-            dates_in_period = []
-            curr = p['start']
-            while curr <= p['end']:
-                dates_in_period.append(curr)
-                curr += timedelta(days=1)
-            
-            # 2. Group dates by ISO Week (Year, WeekNum)
-            # This buckets days into their respective weeks.
-            # groupby requires sorted input, but dates are already sorted.
-            week_groups = groupby(dates_in_period, key=lambda d: d.isocalendar()[:2])
-            
-            weekly_headcount_reqs = []
-            
-            for week_key, days_iter in week_groups:
-                days_in_week_chunk = list(days_iter)
-                
-                # Filter for working days only for capacity calc
-                working_days_in_chunk = [d for d in days_in_week_chunk if d.weekday() < 5 and d not in holidays]
-                count_working_days_week = len(working_days_in_chunk)
-                
-                if count_working_days_week == 0:
-                    continue
-                
-                # Calculate Weekly Demand (Sum of daily demands for these days)
-                weekly_demand = sum(daily_demand[des_value].get(d, 0.0) for d in days_in_week_chunk)
-                
-                # Calculate Effective Capacity Per Person for this week chunk
-                # Formula: WorkingDays * HoursPerDay * EfficiencyFactor
-                effective_weekly_capacity_per_person = (
-                    count_working_days_week * general_settings.working_hours_per_day * (1 - settings.efficiency_loss_factor / 100)
-                )
-                
-                # Calculate Headcount Req for this week
-                if effective_weekly_capacity_per_person > 0:
-                    req_hc = weekly_demand / effective_weekly_capacity_per_person
-                    weekly_headcount_reqs.append(req_hc)
-                else:
-                    weekly_headcount_reqs.append(0)
+@planning_data_condition
+def utilization_data_view(request):
+    """JSON booked/available hours per employee for one page of the utilization heatmap."""
+    try:
+        report = build_utilization_report(request.GET, date.today())
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse(report)
 
-            # 3. Determine Period Requirement (Max of Weekly Reqs)
-            required_headcount = max(weekly_headcount_reqs) if weekly_headcount_reqs else 0.0
-            
-            # 4. Calculate Required Hours for Display
-            # To make the table consistent, we back-calculate Required Hours 
-            # based on the Max Headcount and the Period's average capacity per person.
-            # This ensures (Available - Required) Variance reflects the headcount gap.
-            
-            period_avg_hours_per_person = (available_hours / headcount) if headcount > 0 else 0
-            
-            # Fallback if no headcount exists to determine period hours
-            if period_avg_hours_per_person == 0:
-                total_w_days = count_working_days(p['start'], p['end'], holidays)
-                period_days = (p['end'] - p['start']).days + 1
-                month_factor = period_days / 30.44
-                gross = total_w_days * general_settings.working_hours_per_day
-                deductions = (settings.monthly_meeting_hours + settings.monthly_leave_hours) * month_factor
-                net = gross - deductions
-                period_avg_hours_per_person = net * (1 - settings.efficiency_loss_factor / 100)
-                
-            required_hours = required_headcount * period_avg_hours_per_person
-
-            des_data['months'].append({
-                'month': p['label'], 
-                'available_hours': available_hours, 
-                'required_hours': required_hours, 
-                'variance_hours': available_hours - required_hours, 
-                'available_headcount': headcount, 
-                'required_headcount': required_headcount
-            })
-        report.append(des_data)
-    
+# --- What-if scenarios ---
+# Scenario edits do not bump the planning version, so these views are not conditional.
+def _compared_scenario_ids(params):
+    try:
+        return [int(pk) for pk in params.getlist('scenario')]
+    except ValueError:
+        raise ValueError("'scenario' must be integer ids.")
+
+def _comparison_by_designation(comparison):
+    """Regroups a comparison for the page: one block per designation with a row per scenario."""
+    blocks = []
+    for i, designation in enumerate(comparison['scenarios'][0]['designations']):
+        blocks.append({
+            'designation': designation['designation'],
+            'scenarios': [{'name': s['name'], **s['designations'][i]} for s in comparison['scenarios']],
+        })
+    return blocks
+
+def scenarios_view(request):
+    view_type = request.GET.get('view_type', 'month')
+    error = None
+    try:
+        selected = _compared_scenario_ids(request.GET)
+        comparison = compare_scenarios(selected, view_type, date.today(), settings.SCENARIO_WORKERS)
+    except ValueError as e:
+        selected, error = [], str(e)
+        comparison = compare_scenarios([], view_type, date.today())
     context = {
-        'active_nav': 'capacity_plan', 
-        'report_data': report,
-        'chart_data': chart_data,
-        'segment_charts': segment_charts,
-        'view_type': view_type
+        'active_nav': 'scenarios',
+        'view_type': comparison['view_type'],
+        'scenarios': Scenario.objects.all(),
+        'selected': selected,
+        'periods': comparison['periods'],
+        'comparison': _comparison_by_designation(comparison),
+        'error': error,
     }
-    return render(request, 'planner/capacity_plan.html', context)
+    return render(request, 'planner/scenarios.html', context)
+
+def scenario_comparison_view(request):
+    """JSON side-by-side capacity plans of the baseline and the 'scenario' ids. Params: view_type, scenario."""
+    try:
+        result = compare_scenarios(_compared_scenario_ids(request.GET), request.GET.get('view_type', 'month'),
+                                   date.today(), settings.SCENARIO_WORKERS)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'status': 'success', **result})
+
+@require_POST
+def save_scenario_view(request):
+    """Creates or replaces a scenario by name from a JSON body (see scenarios.save_scenario)."""
+    try:
+        scenario = save_scenario(json.loads(request.body))
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse({'status': 'success', 'id': scenario.pk, 'name': scenario.name})
 
 def help_view(request):
     context = {'active_nav': 'help'}; return render(request, 'planner/help_page.html', context)
 
+@planning_data_condition
 def get_effort_brackets_for_project_type(request, pk):
     project_type = get_object_or_404(ProjectType, pk=pk)
     brackets_data = []
@@ -821,6 +572,105 @@ def get_effort_brackets_for_project_type(request, pk):
         })
     return JsonResponse({'brackets': brackets_data})
 
+@planning_data_condition
+def conflicts_report_view(request):
+    """JSON list of every over-allocation: overlapping bookings and bookings during leave."""
+    try:
+        report = build_conflicts_report(request.GET)
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse(report)
+
+def available_candidates_view(request):
+    """JSON top-k employees who can start a job of `duration` working days the earliest."""
+    try:
+        result = find_available_candidates(request.GET, date.today())
+    except ValueError as e:
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    return JsonResponse(result)
+
+@require_POST
+def auto_schedule_view(request):
+    """
+    Assigns the unassigned activities (optionally of the POSTed 'project' pks) to
+    engineers on their earliest free dates. 'dry_run=1' returns the plan without saving.
+    """
+    activities_qs = Activity.objects.all()
+    try:
+        project_ids = [int(pk) for pk in request.POST.getlist('project')]
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': "'project' must be integer ids."}, status=400)
+    if project_ids:
+        activities_qs = activities_qs.filter(project_id__in=project_ids)
+    result = auto_schedule_activities(activities_qs, dry_run=request.POST.get('dry_run') in ('1', 'true'))
+    result['plan'] = [
+        {'activity_id': activity_id, 'assignee_id': employee_id, 'start_date': start.isoformat(), 'end_date': end.isoformat()}
+        for activity_id, employee_id, start, end in result['plan']
+    ]
+    return JsonResponse({'status': 'success', **result})
+
+@require_POST
+def batch_edit_view(request):
+    """
+    Applies many activity edits in one round trip. JSON body:
+    {'activities': [{'id', 'shift_days' | 'start_date', 'assignee', 'duration'}],
+     'projects': [{'project' | 'projects', 'shift_days'}], 'dry_run': false}.
+    Shifts are in working days. Nothing is saved unless every entry is valid.
+    """
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': "Expected a JSON body."}, status=400)
+    try:
+        result = batch_edit_activities(data)
+    except BatchEditError as e:
+        return JsonResponse({'status': 'error', 'message': str(e), 'errors': e.errors}, status=400)
+    return JsonResponse({'status': 'success', **result})
+
+@planning_data_condition
+def critical_path_view(request, project_pk):
+    """JSON critical path of a project: slack and latest start per activity."""
+    project = get_object_or_404(Project, pk=project_pk)
+    return JsonResponse(critical_path(project))
+
+@require_POST
+def activity_dependency_view(request, pk):
+    """Adds or removes one finish-to-start link. JSON body: {'predecessor': id, 'action': 'add'|'remove'}."""
+    activity = get_object_or_404(Activity, pk=pk)
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'status': 'error', 'message': "Expected a JSON body."}, status=400)
+    if not isinstance(data, dict):
+        return JsonResponse({'status': 'error', 'message': "Expected a JSON object."}, status=400)
+    action = data.get('action', 'add')
+    if action not in ('add', 'remove'):
+        return JsonResponse({'status': 'error', 'message': "'action' must be 'add' or 'remove'."}, status=400)
+    try:
+        predecessor = Activity.objects.get(pk=int(data.get('predecessor')))
+    except (TypeError, ValueError, OverflowError, Activity.DoesNotExist):
+        return JsonResponse({'status': 'error', 'message': "Unknown predecessor activity."}, status=400)
+
+    if action == 'remove':
+        activity.predecessors.remove(predecessor)
+    else:
+        # Same rule as the activity forms: links stay within one project.
+        if predecessor.project_id != activity.project_id:
+            return JsonResponse({'status': 'error', 'message': "The predecessor belongs to another project."}, status=400)
+        if would_create_cycle(predecessor.pk, activity.pk):
+            return JsonResponse({'status': 'error', 'message': "That link would create a dependency loop."}, status=400)
+        activity.predecessors.add(predecessor)
+    activity.refresh_from_db()
+    return JsonResponse({
+        'status': 'success',
+        'predecessors': list(activity.predecessors.values_list('id', flat=True)),
+        'start_date': activity.start_date.isoformat(),
+        'end_date': activity.end_date.isoformat() if activity.end_date else None,
+    })
+
+def capacity_cache_stats_view(request):
+    return JsonResponse(capacity_cache_stats())
+
 @require_POST
 def add_effort_bracket_for_project_type(request, pk):
     project_type = get_object_or_404(ProjectType, pk=pk)